@@ -0,0 +1,91 @@
+"""Compare loopback HTTP callback delivery with the in-process transport.
+
+Run from the project root:
+
+    python benchmarks/bench_callback_transport.py --count 2000
+"""
+
+import argparse
+import logging
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from uuid import uuid4
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+os.environ.setdefault("QWIRE_V2_CALLBACK_LOG", os.path.join(tempfile.gettempdir(), "qwire-bench-callback.log"))
+
+import uvicorn  # noqa: E402
+
+from qwire_mock import callback_service  # noqa: E402
+from qwire_mock.callback_sender import CallbackSender  # noqa: E402
+from qwire_mock.config import load_config  # noqa: E402
+from qwire_mock.schemas import OrderResponse, ProductResponse  # noqa: E402
+from qwire_mock.serialization import model_bytes  # noqa: E402
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _order() -> OrderResponse:
+    return OrderResponse.model_construct(
+        reference=uuid4(),
+        orderId="PX1",
+        name="Benchmark Order",
+        orderDate=datetime.now(timezone.utc),
+        amount=10.0,
+        currency="USD",
+        status="SUCCESS",
+        cardNumber="555555******4444",
+        products=[ProductResponse.model_construct(productId="B-1", count=1, spec="S", status="PROCESSING")],
+        fail_reason=None,
+    )
+
+
+def _run(sender: CallbackSender, url: str, count: int) -> float:
+    order = _order()
+    body = model_bytes(order, eventType="ORDER_SHIPPED")
+    started = time.perf_counter()
+    for _ in range(count):
+        sender.send(url, body, str(order.reference), "ORDER_SHIPPED", payload=order)
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=2000)
+    args = parser.parse_args()
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(callback_service.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+    config = load_config()["callback_sender"]
+    quiet = logging.getLogger("qwire_mock.bench")
+    quiet.setLevel(logging.WARNING)
+    url = f"http://127.0.0.1:{port}/callback"
+
+    http_seconds = _run(CallbackSender(config, quiet), url, args.count)
+
+    in_process = CallbackSender(config, quiet)
+    in_process.register_local_receiver(port, {"/callback": callback_service.handle_callback})
+    local_seconds = _run(in_process, url, args.count)
+
+    server.should_exit = True
+    for name, seconds in (("http", http_seconds), ("in-process", local_seconds)):
+        print(f"{name:>10}: {args.count / seconds:10.0f} callbacks/s  {seconds / args.count * 1e6:8.1f} us/callback")
+    print(f"   speedup: {http_seconds / local_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Order outcome rule evaluation: compiled trie/interval/hash lookups vs a linear rule scan.
+
+Run from the project root:
+
+    python benchmarks/bench_rule_engine.py --rules 10000 --count 100000
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from qwire_mock.rules import Rule, compile_rules  # noqa: E402
+
+CURRENCIES = ["USD", "EUR", "GBP", "JPY", "KRW", "AUD", "CAD", "CHF"]
+
+
+def _rule_configs(count: int, rng: random.Random) -> list[dict]:
+    configs = []
+    for index in range(count):
+        match = {"bin_prefix": str(rng.randrange(100000, 999999))[: rng.randint(4, 6)]}
+        if index % 3 == 0:
+            low = rng.randrange(0, 5000)
+            match["amount_gte"] = low
+            match["amount_lt"] = low + rng.randrange(10, 500)
+        if index % 4 == 0:
+            match["currency"] = rng.choice(CURRENCIES)
+        if index % 10 == 0:
+            match["product_id"] = f"P-{rng.randrange(1000)}"
+        action = {"fail_reason": f"rule {index}"} if index % 2 else {"suppress_callback": True}
+        configs.append({"name": f"rule-{index}", "match": match, "action": action})
+    return configs
+
+
+def _requests(count: int, rng: random.Random) -> list[tuple]:
+    return [
+        (
+            str(rng.randrange(10**15, 10**16)),
+            round(rng.uniform(0, 5500), 2),
+            rng.choice(CURRENCIES),
+            [f"P-{rng.randrange(1000)}"],
+        )
+        for _ in range(count)
+    ]
+
+
+def _linear_matches(rule: Rule, card: str, amount: float, currency: str, products: list[str]) -> bool:
+    return (
+        (not rule.bin_prefixes or any(card.startswith(prefix) for prefix in rule.bin_prefixes))
+        and (rule.amount_gte is None or amount >= rule.amount_gte)
+        and (rule.amount_lt is None or amount < rule.amount_lt)
+        and (not rule.currencies or currency in rule.currencies)
+        and (not rule.product_ids or any(product in rule.product_ids for product in products))
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rules", type=int, default=10000)
+    parser.add_argument("--count", type=int, default=100000)
+    parser.add_argument("--linear-count", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(44)
+    configs = _rule_configs(args.rules, rng)
+    requests = _requests(args.count, rng)
+
+    started = time.perf_counter()
+    ruleset = compile_rules(configs)
+    compile_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    matched = sum(bool(ruleset.evaluate(*request).rules) for request in requests)
+    compiled_us = (time.perf_counter() - started) / len(requests) * 1e6
+
+    sample = requests[: args.linear_count]
+    started = time.perf_counter()
+    linear = [[rule.name for rule in ruleset.rules if _linear_matches(rule, *request)] for request in sample]
+    linear_us = (time.perf_counter() - started) / len(sample) * 1e6
+
+    mismatches = sum(list(ruleset.evaluate(*request).rules) != names for request, names in zip(sample, linear))
+    print(f"  rules: {len(ruleset)}  compile: {compile_seconds * 1000:.0f} ms")
+    print(f"  compiled lookup: {compiled_us:8.1f} us/evaluation  ({matched}/{len(requests)} matched)")
+    print(f"  linear scan:     {linear_us:8.1f} us/evaluation  ({len(sample)} requests)")
+    print(f"  speedup: {linear_us / compiled_us:.0f}x  mismatches: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
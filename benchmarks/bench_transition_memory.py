@@ -0,0 +1,100 @@
+"""Bytes per in-flight scheduler transition: dict rows + dataclass + pydantic vs tuple records.
+
+Run from the project root:
+
+    python benchmarks/bench_transition_memory.py --count 100000
+"""
+
+import argparse
+import sys
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from uuid import UUID, uuid4
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from qwire_mock.order_db import OrderRecord, ProductRecord, TransitionTarget  # noqa: E402
+from qwire_mock.schemas import OrderResponse, ProductResponse  # noqa: E402
+
+
+@dataclass
+class LegacyTransitionTarget:
+    reference: UUID
+    callback_url: str
+    target_status: str
+
+
+def _rows(count: int) -> list[tuple[str, str]]:
+    return [(str(uuid4()), f"http://receiver-{index % 16}:8100/callback") for index in range(count)]
+
+
+def _legacy(rows: list[tuple[str, str]]) -> list:
+    now = datetime.now()
+    items = []
+    for reference, callback_url in rows:
+        row = {"reference": reference, "callback_url": callback_url}
+        target = LegacyTransitionTarget(UUID(row["reference"]), row["callback_url"], "SHIPPED")
+        order = OrderResponse(
+            reference=target.reference,
+            orderId="PX1",
+            name="Memory Order",
+            orderDate=now,
+            amount=10.0,
+            currency="USD",
+            status="SUCCESS",
+            cardNumber="555555******4444",
+            products=[ProductResponse(productId="M-1", count=1, spec="S", status="SHIPPED")],
+        )
+        items.append((row, target, order))
+    return items
+
+
+def _compact(rows: list[tuple[str, str]]) -> list:
+    now = datetime.now()
+    product = ("M-1", 1, "S", "SHIPPED")
+    items = []
+    for reference, callback_url in rows:
+        target = TransitionTarget(UUID(reference), callback_url, "SHIPPED")
+        order = OrderRecord(
+            target.reference,
+            "PX1",
+            "Memory Order",
+            now,
+            10.0,
+            "USD",
+            "SUCCESS",
+            "555555******4444",
+            (ProductRecord(*product),),
+        )
+        items.append((target, order))
+    return items
+
+
+def _measure(build, rows) -> float:
+    tracemalloc.start()
+    baseline = tracemalloc.take_snapshot()
+    items = build(rows)
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in snapshot.compare_to(baseline, "filename"))
+    del items
+    return allocated / len(rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=100000)
+    args = parser.parse_args()
+
+    rows = _rows(args.count)
+    legacy = _measure(_legacy, rows)
+    compact = _measure(_compact, rows)
+    print(f"  legacy (dict row + dataclass + pydantic): {legacy:8.0f} bytes/transition")
+    print(f"  compact (tuple row + NamedTuple records): {compact:8.0f} bytes/transition")
+    print(f"  reduction: {legacy / compact:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
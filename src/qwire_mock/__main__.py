@@ -5,6 +5,7 @@ import threading
 import uvicorn
 
 from qwire_mock import __version__
+from qwire_mock.callback_sender import LOOPBACK_HOSTS
 from qwire_mock.config import load_config
 
 
@@ -24,12 +25,149 @@ def main() -> None:
         default="all",
         help=f"Run callback ({callback_port}), order ({order_port}), or both",
     )
+    subparsers = parser.add_subparsers(dest="command")
+    migrate_parser = subparsers.add_parser(
+        "migrate-schema",
+        help="Convert v2 tables to the compact layout (BINARY(16) reference, ENUM status)",
+    )
+    migrate_parser.add_argument("--batch-size", type=int, default=5000, help="Rows converted per transaction")
+    seed_parser = subparsers.add_parser("seed", help="Bulk-load synthetic orders for scale testing")
+    seed_parser.add_argument("--orders", type=int, default=100000, help="Number of orders to generate")
+    seed_parser.add_argument("--products-per-order", type=int, default=2)
+    seed_parser.add_argument(
+        "--mix",
+        default="SUCCESS=0.7,COMPLETED=0.2,FAIL=0.1",
+        help="Order status weights, e.g. SUCCESS=0.7,COMPLETED=0.2,FAIL=0.1",
+    )
+    seed_parser.add_argument(
+        "--max-age-seconds",
+        type=int,
+        default=120,
+        help="created_at is spread uniformly over this many seconds in the past",
+    )
+    seed_parser.add_argument("--batch-size", type=int, default=2000, help="Orders per INSERT / LOAD DATA chunk")
+    seed_parser.add_argument("--method", choices=("insert", "load-data"), default="insert")
+    seed_parser.add_argument(
+        "--keep-indexes",
+        action="store_true",
+        help="Keep secondary status indexes during the load instead of rebuilding them afterwards",
+    )
+    seed_parser.add_argument("--random-seed", type=int, default=None)
+    dump_parser = subparsers.add_parser(
+        "dump-snapshot",
+        help="Write orders, products and callback dead letters to a gzip snapshot file",
+    )
+    dump_parser.add_argument("path", help="Snapshot file to write, e.g. state.jsonl.gz")
+    restore_parser = subparsers.add_parser("restore-snapshot", help="Bulk-load a snapshot written by dump-snapshot")
+    restore_parser.add_argument("path", help="Snapshot file to read")
+    restore_parser.add_argument("--batch-size", type=int, default=5000, help="Rows per multi-row INSERT")
+    restore_parser.add_argument(
+        "--append",
+        action="store_true",
+        help="Keep existing orders and dead letters instead of truncating them first",
+    )
+    replay_parser = subparsers.add_parser("replay", help="Replay captured traffic against a running service")
+    replay_parser.add_argument("paths", nargs="+", help="Capture files (*.jsonl) written by the capture middleware")
+    replay_parser.add_argument(
+        "--order-target",
+        default=f"http://127.0.0.1:{order_port}",
+        help="Base URL for requests captured by the order service",
+    )
+    replay_parser.add_argument(
+        "--callback-target",
+        default=f"http://127.0.0.1:{callback_port}",
+        help="Base URL for requests captured by the callback service",
+    )
+    replay_parser.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="Multiplier on the captured inter-arrival timing; 0 sends as fast as possible",
+    )
+    replay_parser.add_argument(
+        "--only-service",
+        choices=("callback", "order"),
+        default=None,
+        help="Only replay records captured by this service",
+    )
+    replay_parser.add_argument("--concurrency", type=int, default=64, help="Maximum in-flight requests")
+    replay_parser.add_argument(
+        "--keep-references",
+        action="store_true",
+        help="Send captured references unchanged instead of mapping each to a fresh UUID",
+    )
     args = parser.parse_args()
 
+    if args.command == "migrate-schema":
+        from qwire_mock import order_db
+
+        converted = order_db.migrate_to_compact(batch_size=args.batch_size)
+        logging.info("compact schema migration finished: converted=%s", converted)
+        logging.info("set mysql.schema_mode: compact in config.yaml before starting the order service")
+        return
+
+    if args.command == "seed":
+        from qwire_mock import seeder
+
+        seeder.seed_orders(
+            count=args.orders,
+            products_per_order=args.products_per_order,
+            mix=seeder.parse_mix(args.mix),
+            max_age_seconds=args.max_age_seconds,
+            batch_size=args.batch_size,
+            method=args.method,
+            defer_indexes=not args.keep_indexes,
+            random_seed=args.random_seed,
+        )
+        return
+
+    if args.command == "dump-snapshot":
+        from qwire_mock import snapshot
+
+        snapshot.dump_snapshot(args.path)
+        return
+
+    if args.command == "restore-snapshot":
+        from qwire_mock import snapshot
+
+        snapshot.restore_snapshot(args.path, batch_size=args.batch_size, replace=not args.append)
+        return
+
+    if args.command == "replay":
+        import json
+
+        from qwire_mock import replay
+
+        summary = replay.replay(
+            replay.load_records(args.paths, service=args.only_service),
+            targets={"order": args.order_target, "callback": args.callback_target},
+            speed=args.speed,
+            rewrite_references=not args.keep_references,
+            concurrency=args.concurrency,
+        )
+        print(json.dumps(summary, indent=2))
+        return
+
     if args.service == "all":
+        from qwire_mock import callback_service, order_service
         from qwire_mock.callback_service import app as callback_app
         from qwire_mock.order_service import app as order_app
 
+        sender_config = config["callback_sender"]
+        if sender_config["in_process"]:
+            hosts = LOOPBACK_HOSTS if args.host in ("0.0.0.0", "::") else LOOPBACK_HOSTS + (args.host,)
+            # Receiver behaviors act on HTTP requests, so callbacks go over the wire
+            # whenever any are set, including ones set later via PUT /admin/behavior.
+            order_service.use_in_process_callbacks(
+                callback_port,
+                {
+                    "/callback": callback_service.handle_callback,
+                    sender_config["delivery"]["batch_path"]: callback_service.handle_callback_batch,
+                },
+                hosts,
+                enabled=lambda: not callback_service.receiver_behavior.active,
+            )
+
         def run_callback() -> None:
             uvicorn.run(callback_app, host=args.host, port=callback_port)
 
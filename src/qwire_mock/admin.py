@@ -0,0 +1,21 @@
+import hmac
+from typing import Any, Callable
+
+from fastapi import Depends, Header, HTTPException
+
+
+def require_token(config: dict[str, Any]) -> Callable:
+    # The token is read per request so it can change with the config. Without
+    # one the admin endpoints are disabled rather than open.
+    async def check(x_admin_token: str | None = Header(None)) -> None:
+        expected = str(config.get("token") or "").encode("utf-8")
+        if not expected:
+            raise HTTPException(status_code=403, detail="Admin endpoints are disabled: set admin.token")
+        if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode("utf-8"), expected):
+            raise HTTPException(status_code=401, detail="Admin token required")
+
+    return check
+
+
+def dependencies(config: dict[str, Any]) -> list:
+    return [Depends(require_token(config))]
@@ -0,0 +1,247 @@
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+
+from qwire_mock.metrics import REGISTRY
+from qwire_mock.serialization import dumps
+
+EXEMPT_PATHS = ("/metrics",)
+
+REGISTRY.describe("qwire_admission_admitted_total", "counter", "Requests admitted by admission control")
+REGISTRY.describe("qwire_admission_rejected_total", "counter", "Requests rejected with 429, by limit")
+REGISTRY.describe("qwire_admission_limit", "gauge", "Configured admission limits")
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(burst or rate))
+        self.tokens = self.capacity
+        self.updated_at = clock()
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait(self) -> float:
+        # Seconds until a token is available, without taking it.
+        with self._lock:
+            self._refill()
+            return 0.0 if self.tokens >= 1.0 else (1.0 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        with self._lock:
+            self._refill()
+            self.tokens = max(0.0, self.tokens - 1.0)
+
+    def acquire(self) -> float:
+        # Returns 0 when a token was taken, else seconds until one is available.
+        with self._lock:
+            self._refill()
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return 0.0
+            return (1.0 - self.tokens) / self.rate
+
+
+def _bucket(limit: dict[str, Any] | None, clock: Callable[[], float]) -> TokenBucket | None:
+    if not limit or float(limit.get("rate", 0)) <= 0:
+        return None
+    return TokenBucket(limit["rate"], limit.get("burst", 0), clock)
+
+
+class ConcurrencyLimiter:
+    def __init__(self, max_in_flight: int, max_queue: int, queue_timeout: float) -> None:
+        self.max_in_flight = int(max_in_flight)
+        self.max_queue = max(0, int(max_queue))
+        self.queue_timeout = float(queue_timeout)
+        self.in_flight = 0
+        self.queued = 0
+        self._waiters: list[asyncio.Future] = []
+
+    async def acquire(self) -> str | None:
+        # Returns None once a slot is held, else the rejection reason.
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            return None
+        if self.queued >= self.max_queue:
+            return "queue_full"
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+            return None
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # Slot was handed over just as the wait timed out; keep it.
+                return None
+            waiter.cancel()
+            return "queue_timeout"
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Slot was handed over but the request went away before using it.
+                self.release()
+            waiter.cancel()
+            raise
+        finally:
+            self.queued -= 1
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def release(self) -> None:
+        # Hand the slot straight to the oldest waiter instead of freeing it.
+        while self._waiters:
+            waiter = self._waiters.pop(0)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+
+class AdmissionController:
+    def __init__(self, config: dict[str, Any], clock: Callable[[], float] = time.monotonic) -> None:
+        self._clock = clock
+        self.global_bucket = _bucket(config.get("global"), clock)
+        self.route_buckets = {
+            route: bucket
+            for route, limit in (config.get("routes") or {}).items()
+            if (bucket := _bucket(limit, clock)) is not None
+        }
+        client = config.get("client") or {}
+        self.client_header = str(client.get("header", "X-Client-Id")).lower().encode("latin-1")
+        self.client_limit = client if float(client.get("rate", 0)) > 0 else None
+        self.max_clients = max(1, int(client.get("max_clients", 10000)))
+        self._client_buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+        self._clients_lock = threading.Lock()
+
+        concurrency = config.get("concurrency") or {}
+        self.limiter = None
+        if int(concurrency.get("max_in_flight", 0)) > 0:
+            self.limiter = ConcurrencyLimiter(
+                concurrency["max_in_flight"],
+                concurrency.get("max_queue", 0),
+                concurrency.get("queue_timeout_seconds", 1),
+            )
+            REGISTRY.gauge_callback(
+                "qwire_admission_in_flight",
+                "Admitted requests currently being handled",
+                lambda: self.limiter.in_flight,
+            )
+            REGISTRY.gauge_callback(
+                "qwire_admission_queued",
+                "Requests waiting for a concurrency slot",
+                lambda: self.limiter.queued,
+            )
+        self._publish_limits()
+
+    def _publish_limits(self) -> None:
+        buckets = [("global", self.global_bucket), *self.route_buckets.items()]
+        for scope, bucket in buckets:
+            if bucket is not None:
+                REGISTRY.set("qwire_admission_limit", bucket.rate, scope=scope, setting="rate")
+                REGISTRY.set("qwire_admission_limit", bucket.capacity, scope=scope, setting="burst")
+        if self.client_limit is not None:
+            REGISTRY.set("qwire_admission_limit", self.client_limit["rate"], scope="client", setting="rate")
+        if self.limiter is not None:
+            for setting in ("max_in_flight", "max_queue", "queue_timeout"):
+                REGISTRY.set("qwire_admission_limit", getattr(self.limiter, setting), scope="concurrency", setting=setting)
+
+    def client_key(self, scope: dict[str, Any]) -> str:
+        for key, value in scope.get("headers", []):
+            if key.lower() == self.client_header:
+                return value.decode("latin-1")
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    def _client_bucket(self, key: str) -> TokenBucket:
+        with self._clients_lock:
+            bucket = self._client_buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(self.client_limit["rate"], self.client_limit.get("burst", 0), self._clock)
+                self._client_buckets[key] = bucket
+                while len(self._client_buckets) > self.max_clients:
+                    self._client_buckets.popitem(last=False)
+            else:
+                self._client_buckets.move_to_end(key)
+            return bucket
+
+    def check_rate(self, route: str, scope: dict[str, Any]) -> tuple[str, float] | None:
+        checks = [
+            ("global", self.global_bucket),
+            ("route", self.route_buckets.get(route)),
+            ("client", self._client_bucket(self.client_key(scope)) if self.client_limit else None),
+        ]
+        checks = [(reason, bucket) for reason, bucket in checks if bucket is not None]
+        # Check every bucket before taking from any, so a request rejected by
+        # its route or client limit does not spend a global token.
+        for reason, bucket in checks:
+            wait = bucket.wait()
+            if wait > 0:
+                return reason, wait
+        for _, bucket in checks:
+            bucket.take()
+        return None
+
+
+async def _reject(send, reason: str, retry_after: float) -> None:
+    REGISTRY.inc("qwire_admission_rejected_total", reason=reason)
+    body = dumps({"status": "FAIL", "fail_reason": "Too many requests", "limit": reason})
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("ascii")),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode("ascii")),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    def __init__(self, app, controller: AdmissionController) -> None:
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        route = f"{scope['method']} {scope['path']}"
+        limited = self.controller.check_rate(route, scope)
+        if limited is not None:
+            await _reject(send, *limited)
+            return
+
+        limiter = self.controller.limiter
+        if limiter is None:
+            REGISTRY.inc("qwire_admission_admitted_total", route=route)
+            await self.app(scope, receive, send)
+            return
+
+        reason = await limiter.acquire()
+        if reason is not None:
+            await _reject(send, reason, limiter.queue_timeout)
+            return
+        REGISTRY.inc("qwire_admission_admitted_total", route=route)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+
+
+def install(app, config: dict[str, Any]) -> None:
+    if not config["enabled"]:
+        return
+    app.add_middleware(AdmissionMiddleware, controller=AdmissionController(config))
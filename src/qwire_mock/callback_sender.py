@@ -0,0 +1,408 @@
+import heapq
+import itertools
+import json
+import logging
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable
+from urllib.parse import urlsplit
+
+from qwire_mock import compression, tracing
+from qwire_mock.serialization import log_text
+
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "0.0.0.0", "::1")
+
+CLOSED = "CLOSED"
+OPEN = "OPEN"
+HALF_OPEN = "HALF_OPEN"
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        window: int,
+        min_requests: int,
+        failure_rate: float,
+        open_seconds: float,
+        half_open_probes: int,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.min_requests = max(1, int(min_requests))
+        self.failure_rate = float(failure_rate)
+        self.open_seconds = float(open_seconds)
+        self.half_open_probes = max(1, int(half_open_probes))
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._outcomes: deque[bool] = deque(maxlen=max(1, int(window)))
+        self._probes_in_flight = 0
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == OPEN:
+                if self._clock() - self.opened_at < self.open_seconds:
+                    return False
+                self.state = HALF_OPEN
+                self._probes_in_flight = 0
+            if self.state == HALF_OPEN:
+                if self._probes_in_flight >= self.half_open_probes:
+                    return False
+                self._probes_in_flight += 1
+            return True
+
+    def retry_after(self) -> float:
+        with self._lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(0.0, self.open_seconds - (self._clock() - self.opened_at))
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.state = CLOSED
+                self._outcomes.clear()
+            self._outcomes.append(True)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._trip()
+                return
+            self._outcomes.append(False)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_requests and failures / len(self._outcomes) >= self.failure_rate:
+                self._trip()
+
+    def _trip(self) -> None:
+        self.state = OPEN
+        self.opened_at = self._clock()
+        self._outcomes.clear()
+
+
+class DeadLetterStore:
+    def __init__(self, max_entries: int, path: str | None = None) -> None:
+        self.path = path or None
+        self._records: deque[dict[str, Any]] = deque(maxlen=max(1, int(max_entries)))
+        self._lock = threading.Lock()
+
+    def add(self, record: dict[str, Any]) -> None:
+        with self._lock:
+            self._records.append(record)
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+    def records(self) -> list[dict[str, Any]]:
+        with self._lock:
+            return list(self._records)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+
+@dataclass
+class Delivery:
+    url: str
+    body: bytes
+    reference: str
+    event_type: str
+    attempts: int = 0
+    last_error: str = ""
+    headers: dict[str, str] = field(default_factory=dict)
+    payload: Any = None
+    content_encoding: str | None = None
+    # Trace context of the code that queued the callback; retries continue it.
+    trace: tracing.SpanContext | None = None
+
+    @property
+    def host(self) -> str:
+        return urlsplit(self.url).netloc
+
+
+class CallbackSender:
+    def __init__(
+        self,
+        config: dict[str, Any],
+        logger: logging.Logger,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        retry = config["retry"]
+        self.timeout = float(config["timeout_seconds"])
+        self.max_attempts = max(1, int(retry["max_attempts"]))
+        self.backoff_base = float(retry["backoff_base_seconds"])
+        self.backoff_max = float(retry["backoff_max_seconds"])
+        self.jitter = bool(retry["jitter"])
+        self.max_pending = int(retry["max_pending"])
+        self.breaker_config = config["circuit_breaker"]
+        self.dead_letters = DeadLetterStore(
+            int(config["dead_letter"]["max_entries"]),
+            config["dead_letter"].get("file"),
+        )
+        self.logger = logger
+        self._clock = clock
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._pending: list[tuple[float, int, Delivery]] = []
+        self._sequence = itertools.count()
+        # (host, port) -> (handlers by path, enabled check)
+        self._local_routes: dict[tuple[str, int], tuple[dict, Callable[[], bool] | None]] = {}
+        self._lock = threading.Lock()
+        body_compression = config.get("compression") or {}
+        self.compress_enabled = bool(body_compression.get("enabled", False))
+        self.compress_min_bytes = int(body_compression.get("min_bytes", 1024))
+        # Request encodings each receiver advertised via Accept-Encoding on a response.
+        self._host_encodings: dict[str, str] = {}
+
+    def register_local_receiver(
+        self,
+        port: int,
+        handlers: dict[str, Callable[[Any], Any]],
+        hosts: tuple[str, ...] = LOOPBACK_HOSTS,
+        enabled: Callable[[], bool] | None = None,
+    ) -> None:
+        # enabled() is checked on every delivery; while it returns False the
+        # callback goes over HTTP instead.
+        for host in hosts:
+            self._local_routes[(host, int(port))] = (dict(handlers), enabled)
+
+    def _local_handler(self, url: str) -> Callable[[Any], Any] | None:
+        if not self._local_routes:
+            return None
+        parts = urlsplit(url)
+        route = self._local_routes.get((parts.hostname or "", parts.port or 80))
+        if route is None:
+            return None
+        handlers, enabled = route
+        if enabled is not None and not enabled():
+            return None
+        return handlers.get(parts.path)
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = CircuitBreaker(
+                    window=self.breaker_config["window"],
+                    min_requests=self.breaker_config["min_requests"],
+                    failure_rate=self.breaker_config["failure_rate"],
+                    open_seconds=self.breaker_config["open_seconds"],
+                    half_open_probes=self.breaker_config["half_open_probes"],
+                    clock=self._clock,
+                )
+                self._breakers[host] = breaker
+            return breaker
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def send(
+        self,
+        url: str,
+        body: bytes,
+        reference: str,
+        event_type: str,
+        payload: Any = None,
+        delay: float = 0.0,
+    ) -> bool:
+        delivery = Delivery(
+            url=url,
+            body=body,
+            reference=reference,
+            event_type=event_type,
+            payload=payload,
+            trace=tracing.current_context(),
+        )
+        if delay > 0:
+            # Held back on the retry queue without counting an attempt.
+            self._defer(delivery, delay)
+            return False
+        return self._attempt(delivery)
+
+    def backoff_delay(self, attempts: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * (2 ** max(0, attempts - 1)))
+        if self.jitter:
+            delay = random.uniform(delay / 2, delay)
+        return delay
+
+    def _attempt(self, delivery: Delivery) -> bool:
+        attributes = {
+            "http.url": delivery.url,
+            "callback.event": delivery.event_type,
+            "callback.attempt": delivery.attempts + 1,
+            "order.reference": delivery.reference,
+        }
+        with tracing.span(
+            "callback.send",
+            tracing.CLIENT,
+            parent=delivery.trace,
+            attributes=attributes,
+            links=tracing.linked(delivery.reference),
+        ) as span:
+            delivered = self._attempt_once(delivery)
+            if not delivered:
+                span.set_error(delivery.last_error or "not delivered")
+            return delivered
+
+    def _attempt_once(self, delivery: Delivery) -> bool:
+        handler = None if delivery.payload is None else self._local_handler(delivery.url)
+        if handler is not None:
+            return self._deliver_local(delivery, handler)
+
+        breaker = self.breaker(delivery.host)
+        if not breaker.allow():
+            delivery.last_error = f"circuit open for {delivery.host}"
+            self.logger.info(
+                "callback deferred, circuit open: host=%s reference=%s event=%s",
+                delivery.host,
+                delivery.reference,
+                delivery.event_type,
+            )
+            self._schedule_retry(delivery, min_delay=breaker.retry_after(), count_attempt=False)
+            return False
+
+        delivery.attempts += 1
+        retryable = True
+        try:
+            status = self._post_with_fallback(delivery)
+            breaker.record_success()
+            return 200 <= status < 300
+        except urllib.error.HTTPError as exc:
+            self.logger.warning("callback http error: %s", exc)
+            delivery.last_error = f"HTTP {exc.code}"
+            if self.compress_enabled:
+                self._learn_encoding(delivery.host, exc.headers)
+            retryable = exc.code >= 500 or exc.code == 429
+            if retryable:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+        except Exception as exc:
+            self.logger.warning("callback request failed: %s", exc)
+            delivery.last_error = str(exc)
+            breaker.record_failure()
+
+        if retryable:
+            self._schedule_retry(delivery)
+        else:
+            self._dead_letter(delivery)
+        return False
+
+    def _deliver_local(self, delivery: Delivery, handler: Callable[[Any], Any]) -> bool:
+        delivery.attempts += 1
+        try:
+            handler(delivery.payload)
+        except Exception as exc:
+            self.logger.warning("callback in-process delivery failed: %s", exc)
+            delivery.last_error = str(exc)
+            self._schedule_retry(delivery)
+            return False
+        self.logger.info("callback response status=200 (in-process)")
+        return True
+
+    def _learn_encoding(self, host: str, headers: Any) -> None:
+        advertised = None if headers is None else headers.get("Accept-Encoding")
+        if advertised is None:
+            return
+        encoding = compression.negotiate(advertised, compression.available_encodings())
+        with self._lock:
+            if encoding is None:
+                self._host_encodings.pop(host, None)
+            else:
+                self._host_encodings[host] = encoding
+
+    def _post_with_fallback(self, delivery: Delivery) -> int:
+        try:
+            return self._post(delivery)
+        except urllib.error.HTTPError as exc:
+            if exc.code != 415 or delivery.content_encoding is None:
+                raise
+        # The receiver cannot decode the compressed body. That says nothing
+        # about its health, so stop compressing for this host and resend plain
+        # within the same attempt instead of counting a failure.
+        self.logger.info("callback %s rejected with 415, resending uncompressed", delivery.content_encoding)
+        with self._lock:
+            self._host_encodings.pop(delivery.host, None)
+        return self._post(delivery)
+
+    def _post(self, delivery: Delivery) -> int:
+        body = delivery.body
+        headers = tracing.inject({"Content-Type": "application/json", **delivery.headers})
+        delivery.content_encoding = None
+        encoding = self._host_encodings.get(delivery.host)
+        if encoding is not None and len(body) >= self.compress_min_bytes:
+            body = compression.compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            delivery.content_encoding = encoding
+        request = urllib.request.Request(delivery.url, data=body, headers=headers, method="POST")
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            self.logger.info("callback response status=%s", response.status)
+            if self.compress_enabled:
+                self._learn_encoding(delivery.host, response.headers)
+            raw_body = response.read().strip()
+            if raw_body:
+                self.logger.info("callback response body:\n%s", log_text(raw_body))
+            return response.status
+
+    def _schedule_retry(self, delivery: Delivery, min_delay: float = 0.0, count_attempt: bool = True) -> None:
+        if count_attempt and delivery.attempts >= self.max_attempts:
+            self._dead_letter(delivery)
+            return
+        delay = max(min_delay, self.backoff_delay(max(1, delivery.attempts)))
+        if self._defer(delivery, delay):
+            self.logger.info(
+                "callback retry scheduled: reference=%s event=%s attempts=%s delay=%.2fs",
+                delivery.reference,
+                delivery.event_type,
+                delivery.attempts,
+                delay,
+            )
+
+    def _defer(self, delivery: Delivery, delay: float) -> bool:
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                delivery.last_error = f"retry queue full: {delivery.last_error}"
+                overflow = True
+            else:
+                overflow = False
+                heapq.heappush(self._pending, (self._clock() + delay, next(self._sequence), delivery))
+        if overflow:
+            self._dead_letter(delivery)
+            return False
+        return True
+
+    def _dead_letter(self, delivery: Delivery) -> None:
+        self.logger.warning(
+            "callback dead-lettered: reference=%s event=%s attempts=%s error=%s",
+            delivery.reference,
+            delivery.event_type,
+            delivery.attempts,
+            delivery.last_error,
+        )
+        self.dead_letters.add(
+            {
+                "reference": delivery.reference,
+                "eventType": delivery.event_type,
+                "url": delivery.url,
+                "attempts": delivery.attempts,
+                "error": delivery.last_error,
+                "failedAt": datetime.now(timezone.utc).isoformat(),
+                "body": delivery.body.decode("utf-8", errors="replace"),
+            }
+        )
+
+    def run_due_retries(self) -> int:
+        due: list[Delivery] = []
+        now = self._clock()
+        with self._lock:
+            while self._pending and self._pending[0][0] <= now:
+                due.append(heapq.heappop(self._pending)[2])
+        for delivery in due:
+            self._attempt(delivery)
+        return len(due)
@@ -1,19 +1,26 @@
-import json
 import logging
 import os
 from contextlib import asynccontextmanager
+from typing import Any
 from uuid import UUID
 
-from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi import Body, FastAPI, HTTPException, Query, Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 
+from qwire_mock import admin, capture, compression, msgpack_codec, tracing
 from qwire_mock.config import load_config
-from qwire_mock.schemas import OrderResponse, Received
+from qwire_mock.metrics import metrics_response
+from qwire_mock.receiver_behavior import ReceiverBehavior, ReceiverBehaviorMiddleware
+from qwire_mock.schemas import BatchReceived, OrderResponse, Received
+from qwire_mock.serialization import log_text, model_bytes
 
 logger = logging.getLogger(__name__)
+SERVICE_NAME = "qwire-callback"
 CONFIG = load_config()
 LOGGING_CONFIG = CONFIG["logging"]
+receiver_behavior = ReceiverBehavior(CONFIG["callback_receiver"])
+ADMIN = admin.dependencies(CONFIG["admin"])
 
 
 def _ensure_file_logger() -> None:
@@ -43,13 +50,17 @@ async def lifespan(_: FastAPI):
     try:
         yield
     finally:
+        capture.flush()
+        tracing.flush()
         logger.info("callback service shutdown")
 
-app = FastAPI(title="QWire Callback API v2", version="2.0.0", lifespan=lifespan)
-
 
-def _json(payload: dict) -> str:
-    return json.dumps(payload, ensure_ascii=False, indent=2, default=str)
+app = FastAPI(title="QWire Callback API v2", version="2.0.0", lifespan=lifespan)
+app.add_middleware(ReceiverBehaviorMiddleware, behavior=receiver_behavior)
+capture.install(app, "callback", CONFIG["capture"])
+msgpack_codec.install(app, CONFIG["msgpack"], paths=("/callback", "/callbacks/batch"))
+compression.install(app, CONFIG["compression"])
+tracing.install(app, CONFIG["tracing"], service=SERVICE_NAME)
 
 
 @app.exception_handler(RequestValidationError)
@@ -58,17 +69,73 @@ async def validation_error_handler(request: Request, exc: RequestValidationError
     return JSONResponse(status_code=400, content={"message": "Invalid order payload", "errors": exc.errors()})
 
 
-@app.post("/callback", response_model=Received)
-def callback(body: OrderResponse) -> Received:
-    payload = body.model_dump(mode="json")
-    logger.info("POST /callback request:\n%s", _json(payload))
+def handle_callback(body: OrderResponse) -> Received:
+    tracing.set_attribute("order.reference", str(body.reference))
+    logger.info("POST /callback request:\n%s", log_text(model_bytes(body)))
 
     response = Received(message="OK")
-    logger.info("POST /callback response:\n%s", _json(response.model_dump(mode="json")))
+    logger.info("POST /callback response:\n%s", log_text(model_bytes(response)))
     return response
 
 
+def handle_callback_batch(body: list[OrderResponse]) -> BatchReceived:
+    tracing.set_attribute("callback.batch_size", len(body))
+    for item in body:
+        logger.info("POST /callbacks/batch item:\n%s", log_text(model_bytes(item)))
+
+    response = BatchReceived(message="OK", count=len(body))
+    logger.info("POST /callbacks/batch response:\n%s", log_text(model_bytes(response)))
+    return response
+
+
+@app.post("/callback", response_model=Received)
+def callback(body: OrderResponse) -> Received:
+    return handle_callback(body)
+
+
+@app.post("/callbacks/batch", response_model=BatchReceived)
+def callback_batch(body: list[OrderResponse]) -> BatchReceived:
+    return handle_callback_batch(body)
+
+
 @app.get("/check")
 def check(reference: UUID = Query(..., description="Order reference (UUID)")):
     logger.info("GET /check reference=%s -> callback records are log-only, no persisted query", reference)
     raise HTTPException(status_code=404, detail="Callback records are log-only and not queryable")
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return metrics_response()
+
+
+@app.get("/admin/behavior", dependencies=ADMIN)
+async def get_behavior() -> dict[str, Any]:
+    return receiver_behavior.describe()
+
+
+@app.put("/admin/behavior", dependencies=ADMIN)
+async def put_behavior(body: dict[str, Any] = Body(...)) -> dict[str, Any]:
+    try:
+        receiver_behavior.configure(body)
+    except (KeyError, TypeError, ValueError) as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid receiver behavior: {exc}") from exc
+    logger.info("receiver behavior replaced: %s", body)
+    return receiver_behavior.describe()
+
+
+@app.put("/admin/behavior/scripts/{reference}", dependencies=ADMIN)
+async def put_behavior_script(reference: UUID, steps: list[Any] = Body(...)) -> dict[str, Any]:
+    try:
+        receiver_behavior.set_script(str(reference), steps)
+    except (TypeError, ValueError) as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid receiver script: {exc}") from exc
+    logger.info("receiver script set: reference=%s steps=%s", reference, steps)
+    return receiver_behavior.describe()
+
+
+@app.delete("/admin/behavior", dependencies=ADMIN)
+async def reset_behavior() -> dict[str, Any]:
+    receiver_behavior.reset()
+    logger.info("receiver behavior reset to configured defaults")
+    return receiver_behavior.describe()
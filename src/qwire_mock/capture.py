@@ -0,0 +1,215 @@
+import base64
+import logging
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from qwire_mock.metrics import REGISTRY
+from qwire_mock.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+# An allowlist, so credentials such as X-Admin-Token, Authorization or Cookie
+# never reach capture files or get resent by replay.
+CAPTURED_HEADERS = (
+    "content-type",
+    "accept",
+    "traceparent",
+    "tracestate",
+    "x-request-id",
+    "x-client-id",
+    "x-qwire-profile",
+)
+
+REGISTRY.describe("qwire_capture_dropped_total", "counter", "Capture records dropped because the write queue was full")
+
+
+def _body_fields(prefix: str, body: bytes) -> dict[str, str]:
+    if not body:
+        return {}
+    try:
+        return {prefix: body.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {f"{prefix}B64": base64.b64encode(body).decode("ascii")}
+
+
+def body_bytes(record: dict[str, Any], prefix: str) -> bytes:
+    if prefix in record:
+        return record[prefix].encode("utf-8")
+    if f"{prefix}B64" in record:
+        return base64.b64decode(record[f"{prefix}B64"])
+    return b""
+
+
+class CaptureWriter:
+    # Records go on a bounded queue and are written from a background thread,
+    # so the event loop never blocks on file I/O.
+    def __init__(self, directory: str, prefix: str, max_bytes: int, max_files: int, queue_size: int = 10000) -> None:
+        self.directory = Path(directory)
+        self.prefix = prefix
+        self.max_bytes = max(1, int(max_bytes))
+        self.max_files = max(1, int(max_files))
+        self._file = None
+        self._size = 0
+        self._lock = threading.Lock()
+        self._queue: queue.Queue[dict[str, Any]] = queue.Queue(maxsize=max(1, int(queue_size)))
+        self._thread = threading.Thread(target=self._run, name=f"qwire-capture-{prefix}", daemon=True)
+        self._thread.start()
+
+    def _open(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if self._file is not None:
+            self._file.close()
+        name = f"{self.prefix}-{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 1_000_000_000:09d}.jsonl"
+        self._file = open(self.directory / name, "ab")
+        self._size = 0
+        files = sorted(self.directory.glob(f"{self.prefix}-*.jsonl"))
+        for old in files[: max(0, len(files) - self.max_files)]:
+            os.remove(old)
+
+    def write(self, record: dict[str, Any]) -> None:
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            REGISTRY.inc("qwire_capture_dropped_total", service=self.prefix)
+
+    def _write(self, record: dict[str, Any]) -> None:
+        line = dumps(record) + b"\n"
+        with self._lock:
+            if self._file is None or self._size + len(line) > self.max_bytes:
+                self._open()
+            self._file.write(line)
+            self._size += len(line)
+            if self._queue.empty():
+                self._file.flush()
+
+    def _run(self) -> None:
+        while True:
+            record = self._queue.get()
+            try:
+                self._write(record)
+            except Exception as exc:
+                logger.warning("capture write failed: %s", exc)
+            finally:
+                self._queue.task_done()
+
+    def flush(self) -> None:
+        self._queue.join()
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class _BoundedBody:
+    __slots__ = ("limit", "chunks", "size", "truncated")
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.chunks: list[bytes] = []
+        self.size = 0
+        self.truncated = False
+
+    def add(self, chunk: bytes) -> None:
+        room = self.limit - self.size
+        if len(chunk) > room:
+            self.truncated = True
+            chunk = chunk[: max(0, room)]
+        if chunk:
+            self.chunks.append(chunk)
+            self.size += len(chunk)
+
+    def fields(self, prefix: str) -> dict[str, Any]:
+        fields = _body_fields(prefix, b"".join(self.chunks))
+        if self.truncated:
+            fields[f"{prefix}Truncated"] = True
+        return fields
+
+
+class CaptureMiddleware:
+    def __init__(self, app, writer: CaptureWriter, service: str, max_body_bytes: int = 65536) -> None:
+        self.app = app
+        self.writer = writer
+        self.service = service
+        self.max_body_bytes = max(0, int(max_body_bytes))
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.time()
+        started = time.perf_counter()
+        # Bodies are kept up to max_body_bytes, so streamed exports stay out of memory.
+        request_body = _BoundedBody(self.max_body_bytes)
+        response_body = _BoundedBody(self.max_body_bytes)
+        response_status = [0]
+
+        async def capture_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                request_body.add(message.get("body", b""))
+            return message
+
+        async def capture_send(message) -> None:
+            if message["type"] == "http.response.start":
+                response_status[0] = message["status"]
+            elif message["type"] == "http.response.body":
+                response_body.add(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, capture_receive, capture_send)
+        finally:
+            headers = {
+                key.decode("latin-1").lower(): value.decode("latin-1")
+                for key, value in scope.get("headers", [])
+                if key.decode("latin-1").lower() in CAPTURED_HEADERS
+            }
+            self.writer.write(
+                {
+                    "ts": started_at,
+                    "service": self.service,
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "query": scope.get("query_string", b"").decode("latin-1"),
+                    "headers": headers,
+                    **request_body.fields("request"),
+                    "status": response_status[0],
+                    **response_body.fields("response"),
+                    "durationMs": round((time.perf_counter() - started) * 1000, 3),
+                }
+            )
+
+
+_writers: list[CaptureWriter] = []
+
+
+def flush() -> None:
+    for writer in _writers:
+        writer.flush()
+
+
+def install(app, service: str, config: dict[str, Any]) -> None:
+    if not config["enabled"]:
+        return
+    writer = CaptureWriter(
+        config["directory"],
+        service,
+        config["max_bytes"],
+        config["max_files"],
+        queue_size=config.get("queue_size", 10000),
+    )
+    _writers.append(writer)
+    app.add_middleware(
+        CaptureMiddleware, writer=writer, service=service, max_body_bytes=config.get("max_body_bytes", 65536)
+    )
@@ -0,0 +1,195 @@
+import gzip
+import zlib
+from typing import Any
+
+from qwire_mock.fault_injection import body_receive, buffer_body, send_json
+from qwire_mock.metrics import REGISTRY
+
+try:
+    import zstandard
+except ImportError:  # optional: zstd is only offered when installed
+    zstandard = None
+
+EXEMPT_PATHS = ("/metrics",)
+COMPRESSIBLE_TYPES = (b"application/json", b"application/x-ndjson", b"application/msgpack", b"text/")
+
+REGISTRY.describe("qwire_http_compressed_total", "counter", "Responses compressed, by encoding")
+REGISTRY.describe("qwire_http_compressed_bytes_total", "counter", "Response bytes before/after compression")
+
+
+def available_encodings() -> tuple[str, ...]:
+    # Server preference order when the client weights several equally.
+    return ("zstd", "gzip") if zstandard is not None else ("gzip",)
+
+
+def negotiate(accept_encoding: str, available: tuple[str, ...]) -> str | None:
+    weights: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[name] = weight
+    wildcard = weights.get("*", 0.0)
+    best = None
+    best_weight = 0.0
+    for encoding in available:
+        weight = weights.get(encoding, wildcard)
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def compress(body: bytes, encoding: str, levels: dict[str, int] | None = None) -> bytes:
+    levels = levels or {}
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=int(levels.get("zstd", 3))).compress(body)
+    return gzip.compress(body, compresslevel=int(levels.get("gzip", 6)), mtime=0)
+
+
+def decompress(body: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd is not available")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(body)
+    if encoding in ("gzip", "x-gzip"):
+        return gzip.decompress(body)
+    raise ValueError(f"unsupported content encoding: {encoding}")
+
+
+class _StreamCompressor:
+    # Flushes after every chunk so streamed responses (exports) still reach
+    # the client page by page.
+    def __init__(self, encoding: str, levels: dict[str, int]) -> None:
+        self.encoding = encoding
+        if encoding == "zstd":
+            self._zstd = zstandard.ZstdCompressor(level=int(levels.get("zstd", 3))).compressobj()
+        else:
+            self._zlib = zlib.compressobj(int(levels.get("gzip", 6)), zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes, last: bool) -> bytes:
+        if self.encoding == "zstd":
+            flush = zstandard.COMPRESSOBJ_FLUSH_FINISH if last else zstandard.COMPRESSOBJ_FLUSH_BLOCK
+            return self._zstd.compress(data) + self._zstd.flush(flush)
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+def _header(headers: list[tuple[bytes, bytes]], name: bytes) -> bytes | None:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _without(headers: list[tuple[bytes, bytes]], *names: bytes) -> list[tuple[bytes, bytes]]:
+    return [(key, value) for key, value in headers if key.lower() not in names]
+
+
+class CompressionMiddleware:
+    def __init__(self, app, config: dict[str, Any]) -> None:
+        self.app = app
+        self.min_bytes = int(config.get("min_bytes", 1024))
+        self.levels = dict(config.get("level") or {})
+        self.decode_requests = bool(config.get("decode_requests", True))
+        self.available = available_encodings()
+        # RFC 7694: Accept-Encoding on a response lists the request codings the
+        # server accepts; the callback sender uses it to compress callbacks.
+        self._advertised = ", ".join(self.available).encode("ascii")
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        headers = list(scope.get("headers", []))
+        request_encoding = _header(headers, b"content-encoding")
+        if request_encoding is not None and self.decode_requests:
+            body, _ = await buffer_body(receive)
+            try:
+                body = decompress(body, request_encoding.decode("latin-1").strip().lower())
+            except (ValueError, OSError, EOFError, zlib.error) as exc:
+                await send_json(send, 415, {"status": "FAIL", "fail_reason": f"Cannot decode request body: {exc}"})
+                return
+            scope = {
+                **scope,
+                "headers": [
+                    *_without(headers, b"content-encoding", b"content-length"),
+                    (b"content-length", str(len(body)).encode("ascii")),
+                ],
+            }
+            receive = body_receive(body, receive)
+
+        accept = _header(headers, b"accept-encoding")
+        encoding = negotiate(accept.decode("latin-1"), self.available) if accept else None
+        state: dict[str, Any] = {"start": None, "compressor": None}
+
+        async def compressing_send(message) -> None:
+            if message["type"] == "http.response.start":
+                state["start"] = message
+                return
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            compressor = state["compressor"]
+            if message["type"] == "http.response.body" and compressor is not None:
+                await send({**message, "body": compressor.chunk(body, not more_body)})
+                return
+            if message["type"] != "http.response.body" or state["start"] is None:
+                await send(message)
+                return
+
+            start = state["start"]
+            state["start"] = None
+            response_headers = list(start.get("headers", []))
+            if self.decode_requests:
+                response_headers.append((b"accept-encoding", self._advertised))
+            if not self._compressible(encoding, start["status"], response_headers, body, more_body):
+                await send({**start, "headers": response_headers})
+                await send(message)
+                return
+
+            REGISTRY.inc("qwire_http_compressed_total", encoding=encoding)
+            response_headers = _without(response_headers, b"content-length")
+            response_headers += [(b"content-encoding", encoding.encode("ascii")), (b"vary", b"Accept-Encoding")]
+            if more_body:
+                compressor = state["compressor"] = _StreamCompressor(encoding, self.levels)
+                await send({**start, "headers": response_headers})
+                await send({**message, "body": compressor.chunk(body, False)})
+                return
+            compressed = compress(body, encoding, self.levels)
+            REGISTRY.inc("qwire_http_compressed_bytes_total", len(body), stage="before")
+            REGISTRY.inc("qwire_http_compressed_bytes_total", len(compressed), stage="after")
+            response_headers.append((b"content-length", str(len(compressed)).encode("ascii")))
+            await send({**start, "headers": response_headers})
+            await send({**message, "body": compressed})
+
+        await self.app(scope, receive, compressing_send)
+
+    def _compressible(
+        self,
+        encoding: str | None,
+        status: int,
+        headers: list[tuple[bytes, bytes]],
+        body: bytes,
+        more_body: bool,
+    ) -> bool:
+        if encoding is None or status in (204, 304) or _header(headers, b"content-encoding") is not None:
+            return False
+        content_type = _header(headers, b"content-type") or b""
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return False
+        # A streamed body's total size is unknown, so it is always compressed.
+        return more_body or len(body) >= self.min_bytes
+
+
+def install(app, config: dict[str, Any]) -> None:
+    if not config["enabled"]:
+        return
+    app.add_middleware(CompressionMiddleware, config=config)
@@ -20,15 +20,175 @@ DEFAULT_CONFIG: dict[str, Any] = {
         "password": "Qwire2026",
         "database": "qwire",
         "charset": "utf8mb4",
+        "schema_mode": "standard",
+        "replicas": [],
+        "replica_pool": {
+            "failure_threshold": 3,
+            "eject_seconds": 30,
+            "connect_timeout_seconds": 2,
+        },
+        "instrumentation": {
+            "enabled": False,
+            "slow_query_ms": 200,
+            "slow_log_size": 200,
+            "slow_log_file": "",
+            "redact_params": True,
+            "rows_examined": "slow",
+        },
     },
     "order": {
         "poll_interval_seconds": 5,
         "callback_skip_amount_gte": 1000,
+        "rules": [
+            {
+                "name": "unsupported-card",
+                "match": {"bin_prefix": "4"},
+                "action": {"fail_reason": "Unsupported card type"},
+            },
+        ],
+        "idempotency_cache_size": 10000,
+        "scheduler": {
+            "mode": "thread",
+            "max_concurrency": 64,
+            "per_host_concurrency": 8,
+            "queue_size": 1000,
+            "shutdown_timeout_seconds": 10,
+            "chunk_size": 0,
+        },
+        "admission": {
+            "enabled": False,
+            "global": {"rate": 0, "burst": 0},
+            "routes": {
+                "POST /order": {"rate": 0, "burst": 0},
+                "GET /order": {"rate": 0, "burst": 0},
+            },
+            "client": {
+                "header": "X-Client-Id",
+                "rate": 0,
+                "burst": 0,
+                "max_clients": 10000,
+            },
+            "concurrency": {
+                "max_in_flight": 0,
+                "max_queue": 0,
+                "queue_timeout_seconds": 1,
+            },
+        },
+        "faults": {
+            "enabled": False,
+            "header": "X-QWire-Profile",
+            "default_profile": "",
+            "reference_prefixes": {},
+            "profiles": {
+                "slow-gateway": {
+                    "routes": ["POST /order", "GET /order"],
+                    "latency": {"distribution": "lognormal", "p50_ms": 200, "p99_ms": 2000, "cap_ms": 10000},
+                },
+                "flaky": {
+                    "latency": {"distribution": "uniform", "min_ms": 10, "max_ms": 100},
+                    "errors": [{"status": 503, "rate": 0.1}, {"status": 429, "rate": 0.05}],
+                    "timeout_rate": 0.02,
+                    "timeout_seconds": 30,
+                },
+                "slow-body": {
+                    "slow_body": {"chunk_bytes": 32, "interval_ms": 100},
+                },
+            },
+        },
+        "retention": {
+            "enabled": False,
+            "interval_seconds": 300,
+            "batch_size": 500,
+            "batch_pause_seconds": 0.2,
+            "max_age_seconds": {
+                "COMPLETED": 604800,
+                "FAIL": 604800,
+            },
+        },
+        "export": {
+            "page_size": 1000,
+        },
+    },
+    "callback_receiver": {
+        "latency": {"distribution": "none"},
+        "errors": [],
+        "drop_rate": 0,
+        "scripts": {},
+    },
+    "callback_sender": {
+        "timeout_seconds": 5,
+        "in_process": False,
+        "delivery": {
+            "mode": "single",
+            "batch_path": "/callbacks/batch",
+            "batch_max_size": 500,
+        },
+        "retry": {
+            "max_attempts": 5,
+            "backoff_base_seconds": 1,
+            "backoff_max_seconds": 60,
+            "jitter": True,
+            "max_pending": 10000,
+            "poll_seconds": 0.5,
+        },
+        "circuit_breaker": {
+            "window": 20,
+            "min_requests": 5,
+            "failure_rate": 0.5,
+            "open_seconds": 30,
+            "half_open_probes": 1,
+        },
+        "dead_letter": {
+            "max_entries": 1000,
+            "file": "",
+        },
+        "compression": {
+            "enabled": False,
+            "min_bytes": 1024,
+        },
+    },
+    "capture": {
+        "enabled": False,
+        "directory": "captures",
+        "max_bytes": 67108864,
+        "max_files": 10,
+        "max_body_bytes": 65536,
+        "queue_size": 10000,
+    },
+    "compression": {
+        "enabled": False,
+        "min_bytes": 1024,
+        "level": {"gzip": 6, "zstd": 3},
+        "decode_requests": True,
+    },
+    "msgpack": {
+        "enabled": False,
+    },
+    "admin": {
+        "token": "",
+    },
+    "tracing": {
+        "enabled": False,
+        "sample_ratio": 0.01,
+        "exporter": "file",
+        "file": "traces/traces.jsonl",
+        "otlp_endpoint": "http://127.0.0.1:4318/v1/traces",
+        "batch_size": 512,
+        "flush_seconds": 2,
+        "queue_size": 10000,
+        "link_cache_size": 10000,
+    },
+    "diagnostics": {
+        "slow_request_ms": 1000,
+        "ring_size": 200,
+        "profile_max_seconds": 120,
+        "profile_interval_ms": 10,
     },
     "logging": {
         "format": "%(asctime)s [%(levelname)s] %(name)s: %(message)s",
         "order_log": "order.log",
         "callback_log": "callback.log",
+        "pretty_json": True,
     },
 }
 
@@ -67,11 +227,51 @@ def _apply_env_overrides(config: dict[str, Any]) -> None:
         config["mysql"]["password"] = os.environ["QWIRE_MYSQL_PASSWORD"]
     if os.environ.get("QWIRE_MYSQL_DATABASE"):
         config["mysql"]["database"] = os.environ["QWIRE_MYSQL_DATABASE"]
+    if os.environ.get("QWIRE_MYSQL_SCHEMA_MODE"):
+        config["mysql"]["schema_mode"] = os.environ["QWIRE_MYSQL_SCHEMA_MODE"]
+    if os.environ.get("QWIRE_MYSQL_REPLICAS"):
+        config["mysql"]["replicas"] = [
+            {"host": host, "port": int(port or 3306)}
+            for host, _, port in (item.strip().partition(":") for item in os.environ["QWIRE_MYSQL_REPLICAS"].split(","))
+            if host
+        ]
+    if os.environ.get("QWIRE_QUERY_INSTRUMENTATION_ENABLED"):
+        config["mysql"]["instrumentation"]["enabled"] = os.environ["QWIRE_QUERY_INSTRUMENTATION_ENABLED"] == "1"
+    if os.environ.get("QWIRE_SLOW_QUERY_MS"):
+        config["mysql"]["instrumentation"]["slow_query_ms"] = float(os.environ["QWIRE_SLOW_QUERY_MS"])
 
     if os.environ.get("QWIRE_V2_POLL_INTERVAL_SECONDS"):
         config["order"]["poll_interval_seconds"] = int(os.environ["QWIRE_V2_POLL_INTERVAL_SECONDS"])
     if os.environ.get("QWIRE_V2_CALLBACK_SKIP_AMOUNT_GTE"):
         config["order"]["callback_skip_amount_gte"] = float(os.environ["QWIRE_V2_CALLBACK_SKIP_AMOUNT_GTE"])
+    if os.environ.get("QWIRE_V2_SCHEDULER_MODE"):
+        config["order"]["scheduler"]["mode"] = os.environ["QWIRE_V2_SCHEDULER_MODE"]
+    if os.environ.get("QWIRE_V2_ADMISSION_ENABLED"):
+        config["order"]["admission"]["enabled"] = os.environ["QWIRE_V2_ADMISSION_ENABLED"] == "1"
+    if os.environ.get("QWIRE_V2_FAULT_PROFILE"):
+        config["order"]["faults"]["enabled"] = True
+        config["order"]["faults"]["default_profile"] = os.environ["QWIRE_V2_FAULT_PROFILE"]
+    if os.environ.get("QWIRE_V2_RETENTION_ENABLED"):
+        config["order"]["retention"]["enabled"] = os.environ["QWIRE_V2_RETENTION_ENABLED"] == "1"
+
+    if os.environ.get("QWIRE_CAPTURE_ENABLED"):
+        config["capture"]["enabled"] = os.environ["QWIRE_CAPTURE_ENABLED"] == "1"
+    if os.environ.get("QWIRE_CALLBACK_IN_PROCESS"):
+        config["callback_sender"]["in_process"] = os.environ["QWIRE_CALLBACK_IN_PROCESS"] == "1"
+    if os.environ.get("QWIRE_COMPRESSION_ENABLED"):
+        enabled = os.environ["QWIRE_COMPRESSION_ENABLED"] == "1"
+        config["compression"]["enabled"] = enabled
+        config["callback_sender"]["compression"]["enabled"] = enabled
+    if os.environ.get("QWIRE_MSGPACK_ENABLED"):
+        config["msgpack"]["enabled"] = os.environ["QWIRE_MSGPACK_ENABLED"] == "1"
+    if os.environ.get("QWIRE_ADMIN_TOKEN"):
+        config["admin"]["token"] = os.environ["QWIRE_ADMIN_TOKEN"]
+    if os.environ.get("QWIRE_TRACING_ENABLED"):
+        config["tracing"]["enabled"] = os.environ["QWIRE_TRACING_ENABLED"] == "1"
+    if os.environ.get("QWIRE_TRACING_SAMPLE_RATIO"):
+        config["tracing"]["sample_ratio"] = float(os.environ["QWIRE_TRACING_SAMPLE_RATIO"])
+    if os.environ.get("QWIRE_SLOW_REQUEST_MS"):
+        config["diagnostics"]["slow_request_ms"] = float(os.environ["QWIRE_SLOW_REQUEST_MS"])
 
     if os.environ.get("QWIRE_V2_ORDER_LOG"):
         config["logging"]["order_log"] = os.environ["QWIRE_V2_ORDER_LOG"]
@@ -0,0 +1,71 @@
+import csv
+import io
+from typing import Iterable, Iterator
+
+from qwire_mock.metrics import REGISTRY
+from qwire_mock.order_db import OrderRecord
+from qwire_mock.serialization import record_bytes
+
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+CSV_COLUMNS = (
+    "reference",
+    "orderId",
+    "name",
+    "orderDate",
+    "amount",
+    "currency",
+    "status",
+    "cardNumber",
+    "fail_reason",
+    "productId",
+    "count",
+    "spec",
+    "productStatus",
+)
+
+REGISTRY.describe("qwire_export_orders_total", "counter", "Orders streamed by GET /orders/export, by format")
+
+
+def ndjson_chunks(pages: Iterable[list[OrderRecord]]) -> Iterator[bytes]:
+    # One chunk per page: the same JSON as GET /order, one order per line.
+    for page in pages:
+        REGISTRY.inc("qwire_export_orders_total", len(page), format="ndjson")
+        yield b"".join(record_bytes(order) + b"\n" for order in page)
+
+
+def _csv_rows(order: OrderRecord) -> Iterator[tuple]:
+    # One row per product; an order without products still gets one row.
+    head = (
+        str(order.reference),
+        order.orderId,
+        order.name,
+        order.orderDate.isoformat(),
+        order.amount,
+        order.currency,
+        order.status,
+        order.cardNumber,
+        order.fail_reason or "",
+    )
+    if not order.products:
+        yield (*head, "", "", "", "")
+    for product in order.products:
+        yield (*head, product.productId, product.count, product.spec, product.status)
+
+
+def csv_chunks(pages: Iterable[list[OrderRecord]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(CSV_COLUMNS)
+    for page in pages:
+        REGISTRY.inc("qwire_export_orders_total", len(page), format="csv")
+        for order in page:
+            writer.writerows(_csv_rows(order))
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def chunks(format: str, pages: Iterable[list[OrderRecord]]) -> Iterator[bytes]:
+    return ndjson_chunks(pages) if format == "ndjson" else csv_chunks(pages)
@@ -0,0 +1,249 @@
+import asyncio
+import json
+import math
+import random
+from typing import Any
+from urllib.parse import parse_qs
+
+from qwire_mock.metrics import REGISTRY
+from qwire_mock.serialization import dumps
+
+# z-score of the 99th percentile of a standard normal distribution.
+_Z99 = 2.3263478740408408
+EXEMPT_PATHS = ("/metrics",)
+
+REGISTRY.describe("qwire_fault_injected_total", "counter", "Injected faults, by profile and kind")
+
+
+class Latency:
+    def __init__(self, config: dict[str, Any] | None, rng: random.Random | None = None) -> None:
+        config = config or {}
+        self.distribution = config.get("distribution", "none")
+        self._rng = rng or random.Random()
+        self._cap = 0.0
+        if self.distribution == "fixed":
+            self._fixed = float(config["ms"]) / 1000
+        elif self.distribution == "uniform":
+            self._low = float(config["min_ms"]) / 1000
+            self._high = float(config["max_ms"]) / 1000
+        elif self.distribution == "lognormal":
+            # Parameterised by its median and 99th percentile.
+            p50 = float(config["p50_ms"]) / 1000
+            p99 = float(config["p99_ms"]) / 1000
+            if not 0 < p50 <= p99:
+                raise ValueError("lognormal latency needs 0 < p50_ms <= p99_ms")
+            self._mu = math.log(p50)
+            self._sigma = (math.log(p99) - self._mu) / _Z99
+            self._cap = float(config.get("cap_ms", 0)) / 1000
+        elif self.distribution != "none":
+            raise ValueError(f"Unsupported latency distribution: {self.distribution}")
+
+    def sample(self) -> float:
+        if self.distribution == "fixed":
+            return self._fixed
+        if self.distribution == "uniform":
+            return self._rng.uniform(self._low, self._high)
+        if self.distribution == "lognormal":
+            delay = self._rng.lognormvariate(self._mu, self._sigma)
+            return min(delay, self._cap) if self._cap else delay
+        return 0.0
+
+
+class Profile:
+    def __init__(self, name: str, config: dict[str, Any], rng: random.Random | None = None) -> None:
+        self.name = name
+        self._rng = rng or random.Random()
+        self.routes = set(config.get("routes") or ())
+        self.latency = Latency(config.get("latency"), self._rng)
+        self.errors = [(int(item["status"]), float(item["rate"])) for item in config.get("errors") or ()]
+        self.timeout_rate = float(config.get("timeout_rate", 0))
+        self.timeout_seconds = float(config.get("timeout_seconds", 30))
+        slow_body = config.get("slow_body") or {}
+        self.chunk_bytes = int(slow_body.get("chunk_bytes", 0))
+        self.chunk_interval = float(slow_body.get("interval_ms", 0)) / 1000
+
+    def applies_to(self, route: str) -> bool:
+        return not self.routes or route in self.routes
+
+    def pick_outcome(self) -> int | str | None:
+        # One draw decides between an injected timeout, an injected status or
+        # the real handler, so configured rates add up exactly.
+        roll = self._rng.random()
+        if roll < self.timeout_rate:
+            return "timeout"
+        roll -= self.timeout_rate
+        for status, rate in self.errors:
+            if roll < rate:
+                return status
+            roll -= rate
+        return None
+
+
+class FaultInjector:
+    def __init__(self, config: dict[str, Any], rng: random.Random | None = None) -> None:
+        rng = rng or random.Random(config.get("seed"))
+        self.header = str(config.get("header", "X-QWire-Profile")).lower().encode("latin-1")
+        self.profiles = {
+            name: Profile(name, profile, rng) for name, profile in (config.get("profiles") or {}).items()
+        }
+        self.default_profile = config.get("default_profile") or None
+        self.reference_prefixes = sorted(
+            (config.get("reference_prefixes") or {}).items(),
+            key=lambda item: len(item[0]),
+            reverse=True,
+        )
+        for name in [self.default_profile, *(profile for _, profile in self.reference_prefixes)]:
+            if name is not None and name not in self.profiles:
+                raise ValueError(f"Unknown fault profile: {name}")
+
+    def header_profile(self, scope: dict[str, Any]) -> str | None:
+        for key, value in scope.get("headers", []):
+            if key.lower() == self.header:
+                return value.decode("latin-1")
+        return None
+
+    def prefix_profile(self, reference: str | None) -> str | None:
+        if reference:
+            for prefix, name in self.reference_prefixes:
+                if reference.startswith(prefix):
+                    return name
+        return None
+
+
+async def buffer_body(receive) -> tuple[bytes, Any]:
+    # Read the whole request body, returning it with a receive callable that
+    # replays the same messages to the wrapped app.
+    messages = []
+    while True:
+        message = await receive()
+        messages.append(message)
+        if message["type"] != "http.request" or not message.get("more_body", False):
+            break
+
+    async def replay_receive():
+        return messages.pop(0) if messages else await receive()
+
+    body = b"".join(message.get("body", b"") for message in messages if message["type"] == "http.request")
+    return body, replay_receive
+
+
+def body_receive(body: bytes, receive):
+    # receive callable that delivers a (rewritten) body in one message, then
+    # defers to the original receive for the disconnect.
+    sent = False
+
+    async def replay_receive():
+        nonlocal sent
+        if sent:
+            return await receive()
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    return replay_receive
+
+
+def body_reference(body: bytes) -> str | None:
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return None
+    if isinstance(payload, list):
+        payload = payload[0] if payload else None
+    reference = payload.get("reference") if isinstance(payload, dict) else None
+    return str(reference) if reference is not None else None
+
+
+def _query_reference(scope: dict[str, Any]) -> str | None:
+    values = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("reference")
+    return values[0] if values else None
+
+
+async def send_json(
+    send,
+    status: int,
+    payload: dict[str, Any],
+    headers: tuple[tuple[bytes, bytes], ...] = (),
+) -> None:
+    body = dumps(payload)
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("ascii")),
+                *headers,
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+class FaultInjectionMiddleware:
+    def __init__(self, app, injector: FaultInjector) -> None:
+        self.app = app
+        self.injector = injector
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        injector = self.injector
+        name = injector.header_profile(scope)
+        if name is None and injector.reference_prefixes:
+            if scope["method"] == "POST":
+                body, receive = await buffer_body(receive)
+                name = injector.prefix_profile(body_reference(body))
+            else:
+                name = injector.prefix_profile(_query_reference(scope))
+        profile = injector.profiles.get(name or injector.default_profile or "")
+
+        route = f"{scope['method']} {scope['path']}"
+        if profile is None or not profile.applies_to(route):
+            await self.app(scope, receive, send)
+            return
+
+        delay = profile.latency.sample()
+        if delay > 0:
+            REGISTRY.inc("qwire_fault_injected_total", profile=profile.name, kind="latency")
+            await asyncio.sleep(delay)
+
+        outcome = profile.pick_outcome()
+        if outcome == "timeout":
+            REGISTRY.inc("qwire_fault_injected_total", profile=profile.name, kind="timeout")
+            await asyncio.sleep(profile.timeout_seconds)
+            await send_json(send, 504, {"status": "FAIL", "fail_reason": "Injected timeout"})
+            return
+        if outcome is not None:
+            REGISTRY.inc("qwire_fault_injected_total", profile=profile.name, kind=f"status_{outcome}")
+            await send_json(send, outcome, {"status": "FAIL", "fail_reason": f"Injected {outcome} response"})
+            return
+
+        if profile.chunk_bytes <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        REGISTRY.inc("qwire_fault_injected_total", profile=profile.name, kind="slow_body")
+
+        async def slow_send(message) -> None:
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            step = profile.chunk_bytes
+            for offset in range(0, max(len(body), 1), step):
+                last = offset + step >= len(body)
+                chunk = body[offset : offset + step]
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body or not last})
+                if not last:
+                    await asyncio.sleep(profile.chunk_interval)
+
+        await self.app(scope, receive, slow_send)
+
+
+def install(app, config: dict[str, Any]) -> None:
+    if not config["enabled"]:
+        return
+    app.add_middleware(FaultInjectionMiddleware, injector=FaultInjector(config))
@@ -0,0 +1,50 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+from uuid import UUID
+
+from qwire_mock.schemas import OrderRequest, mask_card
+
+
+class CachedResponse(NamedTuple):
+    digest: bytes
+    status_code: int
+    body: bytes
+
+
+def request_digest(request: OrderRequest) -> bytes:
+    # Hashes the request as stored: masked card, no CVV or expiry. A hash of
+    # the raw card data could be brute-forced back to the PAN and CVV.
+    canonical = request.model_copy(update={"cardNumber": mask_card(request.cardNumber)})
+    return hashlib.sha256(canonical.__pydantic_serializer__.to_json(canonical, exclude={"cvv", "expiry"})).digest()
+
+
+class IdempotencyCache:
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max(0, int(max_entries))
+        self._entries: OrderedDict[UUID, CachedResponse] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, reference: UUID) -> CachedResponse | None:
+        with self._lock:
+            entry = self._entries.get(reference)
+            if entry is not None:
+                self._entries.move_to_end(reference)
+            return entry
+
+    def put(self, reference: UUID, entry: CachedResponse) -> None:
+        if self.max_entries == 0:
+            return
+        with self._lock:
+            self._entries[reference] = entry
+            self._entries.move_to_end(reference)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,130 @@
+import threading
+from bisect import bisect_left
+from typing import Callable
+
+from starlette.responses import Response
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelKey = tuple[tuple[str, str], ...]
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(labels: dict[str, object]) -> LabelKey:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: LabelKey) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._types: dict[str, str] = {}
+        self._help: dict[str, str] = {}
+        self._values: dict[str, dict[LabelKey, float]] = {}
+        self._callbacks: dict[str, Callable[[], dict[LabelKey, float]]] = {}
+        self._buckets: dict[str, tuple[float, ...]] = {}
+        # name -> labels -> per-bucket counts (last one is +Inf), then the sum
+        self._histograms: dict[str, dict[LabelKey, list[float]]] = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, kind: str, help_text: str) -> None:
+        with self._lock:
+            self._types[name] = kind
+            self._help[name] = help_text
+            self._values.setdefault(name, {})
+
+    def inc(self, name: str, value: float = 1.0, **labels: object) -> None:
+        key = _labels(labels)
+        with self._lock:
+            series = self._values.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def set(self, name: str, value: float, **labels: object) -> None:
+        with self._lock:
+            self._values.setdefault(name, {})[_labels(labels)] = float(value)
+
+    def gauge_callback(self, name: str, help_text: str, read: Callable[[], float]) -> None:
+        self.describe(name, "gauge", help_text)
+        with self._lock:
+            self._callbacks[name] = lambda: {(): float(read())}
+
+    def histogram(self, name: str, help_text: str, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.describe(name, "histogram", help_text)
+        with self._lock:
+            self._buckets[name] = tuple(sorted(buckets))
+            self._histograms.setdefault(name, {})
+
+    def observe(self, name: str, value: float, **labels: object) -> None:
+        key = _labels(labels)
+        buckets = self._buckets[name]
+        index = bisect_left(buckets, value)
+        with self._lock:
+            series = self._histograms[name].get(key)
+            if series is None:
+                series = self._histograms[name][key] = [0.0] * (len(buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def value(self, name: str, **labels: object) -> float:
+        with self._lock:
+            return self._values.get(name, {}).get(_labels(labels), 0.0)
+
+    def histogram_values(self, name: str) -> dict[LabelKey, tuple[list[tuple[float, float]], float, float]]:
+        # labels -> (cumulative (upper bound, count) pairs ending with +Inf, sum, count)
+        with self._lock:
+            buckets = self._buckets.get(name, ())
+            snapshot = {key: list(series) for key, series in self._histograms.get(name, {}).items()}
+        result = {}
+        for key, series in snapshot.items():
+            cumulative = []
+            total = 0.0
+            for bound, count in zip((*buckets, float("inf")), series[:-1]):
+                total += count
+                cumulative.append((bound, total))
+            result[key] = (cumulative, series[-1], total)
+        return result
+
+    def render(self) -> str:
+        with self._lock:
+            names = sorted((set(self._values) | set(self._callbacks)) - set(self._histograms))
+            histograms = sorted(self._histograms)
+            snapshot = {name: dict(self._values.get(name, {})) for name in names}
+            callbacks = dict(self._callbacks)
+            types = dict(self._types)
+            helps = dict(self._help)
+        lines: list[str] = []
+        for name in names:
+            series = snapshot[name]
+            if name in callbacks:
+                series.update(callbacks[name]())
+            if name in helps:
+                lines.append(f"# HELP {name} {helps[name]}")
+            lines.append(f"# TYPE {name} {types.get(name, 'untyped')}")
+            for labels, value in sorted(series.items()):
+                lines.append(f"{name}{_format_labels(labels)} {value:g}")
+        for name in histograms:
+            if name in helps:
+                lines.append(f"# HELP {name} {helps[name]}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, (cumulative, total, count) in sorted(self.histogram_values(name).items()):
+                for bound, bucket_count in cumulative:
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    lines.append(f"{name}_bucket{_format_labels((*labels, ('le', le)))} {bucket_count:g}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {total:g}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count:g}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def metrics_response() -> Response:
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
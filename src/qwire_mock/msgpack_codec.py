@@ -0,0 +1,111 @@
+import json
+from typing import Any
+
+from qwire_mock.fault_injection import body_receive, buffer_body, send_json
+from qwire_mock.serialization import dumps
+
+try:
+    import msgpack
+except ImportError:  # optional: MessagePack bodies are only negotiated when installed
+    msgpack = None
+
+MSGPACK_TYPES = (b"application/msgpack", b"application/x-msgpack", b"application/vnd.msgpack")
+MEDIA_TYPE = b"application/msgpack"
+
+
+def wants_msgpack(accept: bytes) -> bool:
+    # Only an explicit MessagePack type ranked at least as high as JSON counts;
+    # */* keeps JSON.
+    weights: dict[bytes, float] = {}
+    for item in accept.split(b","):
+        media_type, _, params = item.strip().partition(b";")
+        weight = 1.0
+        for param in params.split(b";"):
+            key, _, value = param.strip().partition(b"=")
+            if key.strip() == b"q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[media_type.strip().lower()] = weight
+    msgpack_weight = max((weights.get(media_type, 0.0) for media_type in MSGPACK_TYPES), default=0.0)
+    return msgpack_weight > 0 and msgpack_weight >= weights.get(b"application/json", 0.0)
+
+
+def _media_type(value: bytes | None) -> bytes:
+    return (value or b"").split(b";")[0].strip().lower()
+
+
+class MsgpackMiddleware:
+    # Transcodes MessagePack request bodies to JSON before the app sees them,
+    # and JSON responses to MessagePack when the client asks for it, so
+    # handlers, validation and capture keep working on JSON.
+    def __init__(self, app, paths: tuple[str, ...]) -> None:
+        self.app = app
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        headers = list(scope.get("headers", []))
+        values = {key.lower(): value for key, value in headers}
+        if _media_type(values.get(b"content-type")) in MSGPACK_TYPES:
+            body, _ = await buffer_body(receive)
+            try:
+                body = dumps(msgpack.unpackb(body, raw=False, timestamp=3))
+            except (ValueError, msgpack.UnpackException, TypeError) as exc:
+                await send_json(send, 400, {"status": "FAIL", "fail_reason": f"Invalid MessagePack body: {exc}"})
+                return
+            scope = {
+                **scope,
+                "headers": [
+                    (key, value)
+                    for key, value in headers
+                    if key.lower() not in (b"content-type", b"content-length")
+                ]
+                + [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode("ascii"))],
+            }
+            receive = body_receive(body, receive)
+
+        if not wants_msgpack(values.get(b"accept", b"")):
+            await self.app(scope, receive, send)
+            return
+
+        state: dict[str, Any] = {"start": None, "chunks": []}
+
+        async def msgpack_send(message) -> None:
+            if message["type"] == "http.response.start":
+                state["start"] = message
+                return
+            if message["type"] != "http.response.body" or state["start"] is None:
+                await send(message)
+                return
+            state["chunks"].append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+
+            start = state["start"]
+            body = b"".join(state["chunks"])
+            response_headers = list(start.get("headers", []))
+            content_type = _media_type({key.lower(): value for key, value in response_headers}.get(b"content-type"))
+            if content_type == b"application/json" and body:
+                body = msgpack.packb(json.loads(body), use_bin_type=True)
+                response_headers = [
+                    (key, value)
+                    for key, value in response_headers
+                    if key.lower() not in (b"content-type", b"content-length")
+                ] + [(b"content-type", MEDIA_TYPE), (b"content-length", str(len(body)).encode("ascii"))]
+            await send({**start, "headers": response_headers})
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, msgpack_send)
+
+
+def install(app, config: dict[str, Any], paths: tuple[str, ...]) -> None:
+    if not config["enabled"]:
+        return
+    if msgpack is None:
+        raise RuntimeError("msgpack.enabled needs the msgpack package (pip install qwire-mock[compress])")
+    app.add_middleware(MsgpackMiddleware, paths=paths)
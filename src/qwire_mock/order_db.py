@@ -1,21 +1,91 @@
-from dataclasses import dataclass
+import itertools
+import threading
+import time
+from contextlib import contextmanager, suppress
 from datetime import datetime, timezone
+from typing import Iterator, NamedTuple
 from uuid import UUID
 
 import pymysql
-from pymysql.cursors import DictCursor
+from pymysql.cursors import Cursor, DictCursor, SSCursor, SSDictCursor
 
+from qwire_mock import querylog
 from qwire_mock.config import load_config
-from qwire_mock.schemas import OrderRequest, OrderResponse, ProductResponse
-
-
-@dataclass
-class TransitionTarget:
+from qwire_mock.idempotency import request_digest
+from qwire_mock.metrics import REGISTRY
+from qwire_mock.replicas import ReplicaPool
+from qwire_mock.schemas import OrderRequest, OrderResponse, ProductResponse, mask_card
+from qwire_mock.serialization import model_bytes
+from qwire_mock.timings import timed
+
+_COLUMN_TYPES = {
+    "standard": {
+        "reference": "VARCHAR(36)",
+        "ascii": "",
+        "order_status": "VARCHAR(32)",
+        "product_status": "VARCHAR(32)",
+    },
+    "compact": {
+        "reference": "BINARY(16)",
+        "ascii": " CHARACTER SET ascii",
+        "order_status": "ENUM('SUCCESS', 'COMPLETED', 'FAIL')",
+        "product_status": "ENUM('PROCESSING', 'SHIPPED', 'DELIVERED', 'FAIL')",
+    },
+}
+
+
+class DuplicateOrderError(Exception):
+    pass
+
+
+class StoredResponse(NamedTuple):
+    request_hash: bytes | None
+    status_code: int | None
+    body: bytes | None
+
+
+class TransitionTarget(NamedTuple):
     reference: UUID
     callback_url: str
     target_status: str
 
 
+class ProductRecord(NamedTuple):
+    productId: str
+    count: int
+    spec: str
+    status: str
+
+
+class OrderRecord(NamedTuple):
+    # Tuple-backed order used between the scheduler and callback dispatch;
+    # field names match OrderResponse so it serializes to the same payload.
+    reference: UUID
+    orderId: str
+    name: str
+    orderDate: datetime
+    amount: float
+    currency: str
+    status: str
+    cardNumber: str
+    products: tuple[ProductRecord, ...]
+    fail_reason: str | None = None
+
+    def to_response(self) -> OrderResponse:
+        return OrderResponse.model_construct(
+            reference=self.reference,
+            orderId=self.orderId,
+            name=self.name,
+            orderDate=self.orderDate,
+            amount=self.amount,
+            currency=self.currency,
+            status=self.status,
+            cardNumber=self.cardNumber,
+            products=[ProductResponse.model_construct(**product._asdict()) for product in self.products],
+            fail_reason=self.fail_reason,
+        )
+
+
 def _mysql_config() -> dict:
     mysql = load_config()["mysql"]
     return {
@@ -29,25 +99,353 @@ def _mysql_config() -> dict:
     }
 
 
-def _conn(use_db: bool = True):
-    kwargs = {**_mysql_config()}
+def schema_mode() -> str:
+    mode = load_config()["mysql"].get("schema_mode", "standard")
+    if mode not in _COLUMN_TYPES:
+        raise ValueError(f"Unsupported mysql.schema_mode: {mode}")
+    return mode
+
+
+def reference_param(reference: UUID | str) -> str | bytes:
+    value = reference if isinstance(reference, UUID) else UUID(str(reference))
+    if schema_mode() == "compact":
+        return value.bytes
+    return str(value)
+
+
+def reference_value(value: str | bytes) -> UUID:
+    if isinstance(value, (bytes, bytearray)):
+        return UUID(bytes=bytes(value))
+    return UUID(value)
+
+
+def _connect(target: str, **kwargs):
+    started = time.perf_counter()
+    conn = pymysql.connect(**kwargs)
+    REGISTRY.observe(querylog.CONNECT_SECONDS, time.perf_counter() - started, target=target)
+    return conn
+
+
+def _raw_conn(use_db: bool = True, **options):
+    kwargs = {**_mysql_config(), **options}
     if not use_db:
         kwargs.pop("database", None)
-    return pymysql.connect(**kwargs)
+    return _connect("primary", **kwargs)
+
+
+def _conn(use_db: bool = True, **options):
+    if _isolation is not None and use_db and not options:
+        conn = _isolation.handle()
+    else:
+        conn = _raw_conn(use_db, **options)
+    log = query_log()
+    return conn if log is None else querylog.InstrumentedConnection(conn, log)
+
+
+_query_log: tuple[str, querylog.QueryLog] | None = None
+_query_log_lock = threading.Lock()
+
+
+def query_log() -> querylog.QueryLog | None:
+    # Built from mysql.instrumentation on first use, and rebuilt when the config changes.
+    global _query_log
+    config = load_config()["mysql"].get("instrumentation") or {}
+    if not config.get("enabled", False):
+        return None
+    key = repr(config)
+    with _query_log_lock:
+        if _query_log is None or _query_log[0] != key:
+            log = querylog.QueryLog(
+                slow_query_ms=config.get("slow_query_ms", 200),
+                size=config.get("slow_log_size", 200),
+                path=config.get("slow_log_file"),
+                redact=config.get("redact_params", True),
+                rows_examined=config.get("rows_examined", "slow"),
+            )
+            _query_log = (key, log)
+        return _query_log[1]
+
+
+_replica_pool: tuple[tuple, ReplicaPool] | None = None
+_replica_pool_lock = threading.Lock()
 
 
-def mask_card(card_number: str) -> str:
-    value = (card_number or "").strip()
-    if len(value) >= 10:
-        return f"{value[:6]}{'*' * (len(value) - 10)}{value[-4:]}"
-    if len(value) >= 4:
-        return f"{value[:2]}{'*' * (len(value) - 4)}{value[-2:]}"
-    return "*" * len(value)
+def _replicas() -> ReplicaPool | None:
+    # Built from mysql.replicas on first use, and rebuilt when the config changes.
+    global _replica_pool
+    mysql = load_config()["mysql"]
+    replicas = mysql.get("replicas") or []
+    if not replicas:
+        return None
+    pool_config = mysql.get("replica_pool") or {}
+    key = (repr(replicas), repr(pool_config))
+    with _replica_pool_lock:
+        if _replica_pool is None or _replica_pool[0] != key:
+            pool = ReplicaPool(
+                replicas,
+                failure_threshold=pool_config.get("failure_threshold", 3),
+                eject_seconds=pool_config.get("eject_seconds", 30),
+            )
+            _replica_pool = (key, pool)
+        return _replica_pool[1]
+
+
+def _replica_conn(pool: ReplicaPool, index: int):
+    # Replicas inherit credentials and database from the primary unless overridden.
+    timeout = (load_config()["mysql"].get("replica_pool") or {}).get("connect_timeout_seconds", 2)
+    kwargs = {**_mysql_config(), "connect_timeout": timeout, **pool.replicas[index]}
+    kwargs["port"] = int(kwargs["port"])
+    conn = _connect("replica", **kwargs)
+    log = query_log()
+    return conn if log is None else querylog.InstrumentedConnection(conn, log)
+
+
+def _read_stale_ok(read, *args):
+    # Run read(conn, *args) on a healthy replica, trying the next one on
+    # connection errors and falling back to the primary when none is left.
+    # A None result may just be replication lag, so it is re-read on the
+    # primary. Inside isolated_transaction() everything stays on the test
+    # connection.
+    pool = None if _isolation is not None else _replicas()
+    if pool is not None:
+        for index in pool.candidates():
+            try:
+                result = read(_replica_conn(pool, index), *args)
+            except pymysql.err.OperationalError as exc:
+                pool.record_failure(index, exc)
+                continue
+            pool.record_success(index)
+            if result is not None:
+                REGISTRY.inc("qwire_db_reads_total", target="replica")
+                return result
+            break
+    REGISTRY.inc("qwire_db_reads_total", target="primary")
+    return read(_conn(), *args)
+
+
+_BUFFERED_CURSORS = {SSCursor: Cursor, SSDictCursor: DictCursor}
+
+
+class _IsolatedCursor:
+    def __init__(self, cursor, lock: threading.RLock) -> None:
+        self._cursor = cursor
+        self._lock = lock
+
+    def execute(self, query, args=None):
+        with self._lock:
+            return self._cursor.execute(query, args)
+
+    def executemany(self, query, args):
+        with self._lock:
+            return self._cursor.executemany(query, args)
+
+    def __getattr__(self, name: str):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._cursor.close()
+
+
+class _IsolatedConnection:
+    # Handle returned by _conn() inside isolated_transaction(). All handles
+    # share one transaction: commit() keeps the work for the rest of the test
+    # and rollback() only undoes this handle's work via its savepoint.
+    def __init__(self, conn, lock: threading.RLock, savepoint: str) -> None:
+        self._conn = conn
+        self._lock = lock
+        self._savepoint = savepoint
+
+    def cursor(self, cursor=None) -> _IsolatedCursor:
+        # Results are buffered so concurrent callers can share the connection.
+        return _IsolatedCursor(self._conn.cursor(_BUFFERED_CURSORS.get(cursor, cursor)), self._lock)
+
+    def begin(self) -> None:
+        pass
+
+    def commit(self) -> None:
+        pass
+
+    def rollback(self) -> None:
+        with self._lock:
+            with self._conn.cursor() as cursor:
+                cursor.execute(f"ROLLBACK TO SAVEPOINT {self._savepoint}")
+
+    def close(self) -> None:
+        pass
+
+
+class _Isolation:
+    def __init__(self, conn) -> None:
+        self.conn = conn
+        self.lock = threading.RLock()
+        self._savepoints = itertools.count(1)
+
+    def handle(self) -> _IsolatedConnection:
+        savepoint = f"qwire_sp_{next(self._savepoints)}"
+        with self.lock:
+            with self.conn.cursor() as cursor:
+                cursor.execute(f"SAVEPOINT {savepoint}")
+        return _IsolatedConnection(self.conn, self.lock, savepoint)
+
+
+_isolation: _Isolation | None = None
+
+
+@contextmanager
+def isolated_transaction() -> Iterator[None]:
+    # Route every _conn() through one connection whose transaction is rolled
+    # back on exit. DDL and bulk loads (init_db, seeding, snapshots) still
+    # use their own connections since they commit implicitly.
+    global _isolation
+    if _isolation is not None:
+        raise RuntimeError("isolated_transaction() is already active")
+    conn = _raw_conn()
+    try:
+        conn.begin()
+        _isolation = _Isolation(conn)
+        yield
+    finally:
+        _isolation = None
+        try:
+            conn.rollback()
+        finally:
+            conn.close()
+
+
+def _ensure_index(cursor, table_name: str, index_name: str, columns: str) -> None:
+    cursor.execute(
+        """
+        SELECT 1 FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+        LIMIT 1
+        """,
+        (table_name, index_name),
+    )
+    if cursor.fetchone() is None:
+        cursor.execute(f"ALTER TABLE {table_name} ADD INDEX {index_name} ({columns})")
+
+
+def _ensure_indexes(cursor, table_name: str, indexes: dict[str, str]) -> None:
+    # Adds whichever are missing in one ALTER, so the table is rebuilt once.
+    cursor.execute(
+        """
+        SELECT DISTINCT index_name AS name FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s
+        """,
+        (table_name,),
+    )
+    existing = {row["name"] for row in cursor.fetchall()}
+    missing = [f"ADD INDEX {name} ({columns})" for name, columns in indexes.items() if name not in existing]
+    if missing:
+        cursor.execute(f"ALTER TABLE {table_name} " + ", ".join(missing))
+
+
+@contextmanager
+def bulk_load(deferred_indexes: dict[str, str] | None = None, **options) -> Iterator:
+    # A connection of its own for bulk loads, outside isolated_transaction()
+    # since DDL commits implicitly, with unique and foreign key checks off.
+    # deferred_indexes on v2_orders are dropped first and rebuilt on the way
+    # out, also when the load fails. Commit the loaded rows before leaving;
+    # on an error the open transaction is rolled back.
+    deferred = deferred_indexes or {}
+    conn = _raw_conn(**options)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SET SESSION unique_checks = 0, foreign_key_checks = 0")
+            for name in deferred:
+                cursor.execute(f"ALTER TABLE v2_orders DROP INDEX {name}")
+        yield conn
+    except BaseException:
+        with suppress(pymysql.err.Error):
+            conn.rollback()
+        raise
+    finally:
+        try:
+            with conn.cursor() as cursor:
+                if deferred:
+                    _ensure_indexes(cursor, "v2_orders", deferred)
+                cursor.execute("SET SESSION unique_checks = 1, foreign_key_checks = 1")
+            conn.commit()
+        finally:
+            conn.close()
+
+
+@contextmanager
+def consistent_read() -> Iterator:
+    # A connection of its own with one consistent read view across tables,
+    # for dumps that must not see commits made while they run.
+    conn = _raw_conn()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _reference_column_type(cursor) -> str | None:
+    cursor.execute(
+        """
+        SELECT DATA_TYPE AS data_type FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = 'v2_orders' AND column_name = 'reference'
+        """
+    )
+    row = cursor.fetchone()
+    return None if row is None else str(row["data_type"]).lower()
+
+
+def _check_reference_column(cursor) -> None:
+    is_binary = _reference_column_type(cursor) == "binary"
+    if is_binary != (schema_mode() == "compact"):
+        raise RuntimeError(
+            f"v2_orders layout does not match mysql.schema_mode={schema_mode()}; "
+            "run `python -m qwire_mock migrate-schema` before switching to compact mode"
+        )
+
+
+def _column_exists(cursor, table_name: str, column_name: str) -> bool:
+    cursor.execute(
+        """
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+        """,
+        (table_name, column_name),
+    )
+    return cursor.fetchone() is not None
+
+
+def _ensure_product_counters(cursor) -> None:
+    if _column_exists(cursor, "v2_orders", "product_pending"):
+        return
+    cursor.execute(
+        """
+        ALTER TABLE v2_orders
+            ADD COLUMN product_count INT NOT NULL DEFAULT 0 AFTER fail_reason,
+            ADD COLUMN product_pending INT NOT NULL DEFAULT 0 AFTER product_count,
+            ADD INDEX idx_v2_orders_status_pending (status, product_pending)
+        """
+    )
+    cursor.execute(
+        """
+        UPDATE v2_orders o
+        SET o.product_count = (SELECT COUNT(*) FROM v2_order_products p WHERE p.order_id = o.id),
+            o.product_pending = (
+                SELECT COUNT(*) FROM v2_order_products p WHERE p.order_id = o.id AND p.status != 'DELIVERED'
+            )
+        """
+    )
 
 
 def init_db() -> None:
     db_name = _mysql_config()["database"]
-    conn = _conn(use_db=False)
+    conn = _raw_conn(use_db=False)
     try:
         with conn.cursor() as cursor:
             cursor.execute(
@@ -57,68 +455,102 @@ def init_db() -> None:
     finally:
         conn.close()
 
-    conn = _conn(use_db=True)
+    conn = _raw_conn()
     try:
         with conn.cursor() as cursor:
+            types = _COLUMN_TYPES[schema_mode()]
             cursor.execute(
-                """
+                f"""
                 CREATE TABLE IF NOT EXISTS v2_orders (
                     id INT AUTO_INCREMENT PRIMARY KEY,
-                    reference VARCHAR(36) NOT NULL UNIQUE,
-                    order_id VARCHAR(64) UNIQUE,
+                    reference {types["reference"]} NOT NULL UNIQUE,
+                    order_id VARCHAR(64){types["ascii"]} UNIQUE,
                     name VARCHAR(255) NOT NULL,
                     callback_url VARCHAR(512) NOT NULL,
-                    card_number VARCHAR(64) NOT NULL,
+                    card_number VARCHAR(64){types["ascii"]} NOT NULL,
                     amount DOUBLE NOT NULL,
-                    currency VARCHAR(16) NOT NULL,
-                    status VARCHAR(32) NOT NULL,
+                    currency VARCHAR(16){types["ascii"]} NOT NULL,
+                    status {types["order_status"]} NOT NULL,
                     fail_reason VARCHAR(255) DEFAULT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    product_count INT NOT NULL DEFAULT 0,
+                    product_pending INT NOT NULL DEFAULT 0,
+                    request_hash BINARY(32) DEFAULT NULL,
+                    response_status SMALLINT DEFAULT NULL,
+                    response_body MEDIUMBLOB DEFAULT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    INDEX idx_v2_orders_status_created (status, created_at),
+                    INDEX idx_v2_orders_status_pending (status, product_pending)
                 )
                 """
             )
+            _check_reference_column(cursor)
+            _ensure_index(cursor, "v2_orders", "idx_v2_orders_status_created", "status, created_at")
             cursor.execute(
-                """
+                f"""
                 CREATE TABLE IF NOT EXISTS v2_order_products (
                     id INT AUTO_INCREMENT PRIMARY KEY,
                     order_id INT NOT NULL,
                     product_id VARCHAR(64) NOT NULL,
                     count INT NOT NULL,
                     spec VARCHAR(128) NOT NULL,
-                    status VARCHAR(32) NOT NULL,
+                    status {types["product_status"]} NOT NULL,
                     FOREIGN KEY (order_id) REFERENCES v2_orders(id) ON DELETE CASCADE,
                     INDEX idx_v2_order_id (order_id)
                 )
                 """
             )
+            _ensure_product_counters(cursor)
+            _ensure_index(cursor, "v2_orders", "idx_v2_orders_status_pending", "status, product_pending")
+            if not _column_exists(cursor, "v2_orders", "request_hash"):
+                cursor.execute("ALTER TABLE v2_orders ADD COLUMN request_hash BINARY(32) DEFAULT NULL AFTER product_pending")
+            if not _column_exists(cursor, "v2_orders", "response_body"):
+                cursor.execute(
+                    """
+                    ALTER TABLE v2_orders
+                        ADD COLUMN response_status SMALLINT DEFAULT NULL AFTER request_hash,
+                        ADD COLUMN response_body MEDIUMBLOB DEFAULT NULL AFTER response_status
+                    """
+                )
         conn.commit()
     finally:
         conn.close()
 
 
+@timed("db.exists")
 def exists(reference: UUID) -> bool:
     conn = _conn()
     try:
         with conn.cursor() as cursor:
-            cursor.execute("SELECT 1 FROM v2_orders WHERE reference = %s LIMIT 1", (str(reference),))
+            cursor.execute("SELECT 1 FROM v2_orders WHERE reference = %s LIMIT 1", (reference_param(reference),))
             return cursor.fetchone() is not None
     finally:
         conn.close()
 
-def create_order(request: OrderRequest, status: str, fail_reason: str | None = None) -> OrderResponse:
+
+@timed("db.create_order")
+def create_order(
+    request: OrderRequest,
+    status: str,
+    fail_reason: str | None = None,
+    response_status: int | None = None,
+) -> OrderResponse:
+    # With response_status set, the serialized response is stored next to the
+    # request hash so an identical resubmit can be replayed byte for byte.
     conn = _conn()
     now = datetime.now(timezone.utc)
     masked_card = mask_card(request.cardNumber)
+    product_status = "FAIL" if status == "FAIL" else "PROCESSING"
     try:
         with conn.cursor() as cursor:
             cursor.execute(
                 """
                 INSERT INTO v2_orders (
-                    reference, name, callback_url, card_number, amount, currency, status, fail_reason
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                    reference, name, callback_url, card_number, amount, currency, status, fail_reason,
+                    product_count, product_pending, request_hash
+                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
                 """,
                 (
-                    str(request.reference),
+                    reference_param(request.reference),
                     request.name,
                     request.callback,
                     masked_card,
@@ -126,13 +558,42 @@ def create_order(request: OrderRequest, status: str, fail_reason: str | None = N
                     request.currency,
                     status,
                     fail_reason,
+                    len(request.products),
+                    len(request.products),
+                    request_digest(request),
                 ),
             )
             row_id = cursor.lastrowid
-            order_id = f"PX{row_id}"
-            cursor.execute("UPDATE v2_orders SET order_id = %s WHERE id = %s", (order_id, row_id))
+            order = OrderResponse.model_construct(
+                reference=request.reference,
+                orderId=f"PX{row_id}",
+                name=request.name,
+                orderDate=now,
+                amount=float(request.amount),
+                currency=request.currency,
+                status=status,
+                cardNumber=masked_card,
+                products=[
+                    ProductResponse.model_construct(
+                        productId=product.productId,
+                        count=product.count,
+                        spec=product.spec,
+                        status=product_status,
+                    )
+                    for product in request.products
+                ],
+                fail_reason=fail_reason if status == "FAIL" else None,
+            )
+            cursor.execute(
+                "UPDATE v2_orders SET order_id = %s, response_status = %s, response_body = %s WHERE id = %s",
+                (
+                    order.orderId,
+                    response_status,
+                    None if response_status is None else model_bytes(order),
+                    row_id,
+                ),
+            )
 
-            product_status = "FAIL" if status == "FAIL" else "PROCESSING"
             for product in request.products:
                 cursor.execute(
                     """
@@ -143,77 +604,188 @@ def create_order(request: OrderRequest, status: str, fail_reason: str | None = N
                 )
 
         conn.commit()
+    except pymysql.err.IntegrityError as exc:
+        conn.rollback()
+        raise DuplicateOrderError(str(request.reference)) from exc
     finally:
         conn.close()
 
-    return OrderResponse(
-        reference=request.reference,
-        orderId=order_id,
-        name=request.name,
-        orderDate=now,
-        amount=float(request.amount),
-        currency=request.currency,
-        status=status,
-        cardNumber=masked_card,
-        products=[
-            ProductResponse(
-                productId=product.productId,
-                count=product.count,
-                spec=product.spec,
-                status="FAIL" if status == "FAIL" else "PROCESSING",
-            )
-            for product in request.products
-        ],
-        fail_reason=fail_reason if status == "FAIL" else None,
+    return order
+
+
+ORDER_RECORD_COLUMNS = "id, reference, order_id, name, created_at, amount, currency, status, card_number, fail_reason"
+
+
+def _order_record(row: tuple, products: tuple[ProductRecord, ...]) -> OrderRecord:
+    _, ref, order_id, name, created_at, amount, currency, status, card_number, fail_reason = row
+    return OrderRecord(
+        reference_value(ref),
+        order_id,
+        name,
+        created_at,
+        float(amount),
+        currency,
+        status,
+        card_number,
+        products,
+        fail_reason if status == "FAIL" else None,
     )
 
 
-def _map_row_to_order(order_row: dict, product_rows: list[dict]) -> OrderResponse:
-    return OrderResponse(
-        reference=UUID(order_row["reference"]),
-        orderId=order_row["order_id"],
-        name=order_row["name"],
-        orderDate=order_row["created_at"],
-        amount=float(order_row["amount"]),
-        currency=order_row["currency"],
-        status=order_row["status"],
-        cardNumber=order_row["card_number"],
-        products=[
-            ProductResponse(
-                productId=row["product_id"],
-                count=int(row["count"]),
-                spec=row["spec"],
-                status=row["status"],
+def _fetch_order_record(conn, reference: UUID) -> OrderRecord | None:
+    try:
+        with conn.cursor(Cursor) as cursor:
+            cursor.execute(
+                f"SELECT {ORDER_RECORD_COLUMNS} FROM v2_orders WHERE reference = %s",
+                (reference_param(reference),),
             )
-            for row in product_rows
-        ],
-        fail_reason=order_row["fail_reason"] if order_row["status"] == "FAIL" else None,
-    )
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            cursor.execute(
+                "SELECT product_id, count, spec, status FROM v2_order_products WHERE order_id = %s ORDER BY id",
+                (row[0],),
+            )
+            products = tuple(
+                ProductRecord(product_id, int(count), spec, product_status)
+                for product_id, count, spec, product_status in cursor.fetchall()
+            )
+            return _order_record(row, products)
+    finally:
+        conn.close()
 
 
-def get_order(reference: UUID) -> OrderResponse | None:
+@timed("db.get_order_record")
+def get_order_record(reference: UUID) -> OrderRecord | None:
+    return _fetch_order_record(_conn(), reference)
+
+
+@timed("db.get_order")
+def get_order(reference: UUID, replica: bool = False) -> OrderResponse | None:
+    # replica=True is for reads that tolerate replication lag (GET /order);
+    # the create flow and the scheduler read from the primary.
+    if replica:
+        record = _read_stale_ok(_fetch_order_record, reference)
+    else:
+        record = _fetch_order_record(_conn(), reference)
+    return None if record is None else record.to_response()
+
+
+def _epoch(value: datetime) -> float:
+    # Naive bounds are UTC.
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _fetch_order_page(
+    conn,
+    after_id: int,
+    page_size: int,
+    statuses: tuple[str, ...],
+    created_from: datetime | None,
+    created_to: datetime | None,
+) -> tuple[int, list[OrderRecord]]:
+    where = ["id > %s"]
+    params: list = [after_id]
+    if statuses:
+        where.append(f"status IN ({', '.join(['%s'] * len(statuses))})")
+        params.extend(statuses)
+    # Bounds go in as epoch seconds so the comparison does not depend on the
+    # session time zone; FROM_UNIXTIME keeps the created_at index usable.
+    if created_from is not None:
+        where.append("created_at >= FROM_UNIXTIME(%s)")
+        params.append(_epoch(created_from))
+    if created_to is not None:
+        where.append("created_at < FROM_UNIXTIME(%s)")
+        params.append(_epoch(created_to))
+    try:
+        with conn.cursor(SSCursor) as cursor:
+            cursor.execute(
+                f"SELECT {ORDER_RECORD_COLUMNS} FROM v2_orders WHERE {' AND '.join(where)} ORDER BY id LIMIT %s",
+                (*params, page_size),
+            )
+            rows = list(cursor)
+        if not rows:
+            return after_id, []
+        products: dict[int, list[ProductRecord]] = {row[0]: [] for row in rows}
+        with conn.cursor(SSCursor) as cursor:
+            cursor.execute(
+                f"""
+                SELECT order_id, product_id, count, spec, status FROM v2_order_products
+                WHERE order_id IN ({', '.join(['%s'] * len(products))}) ORDER BY order_id, id
+                """,
+                tuple(products),
+            )
+            for order_id, product_id, count, spec, product_status in cursor:
+                products[order_id].append(ProductRecord(product_id, int(count), spec, product_status))
+        conn.commit()
+        return rows[-1][0], [_order_record(row, tuple(products[row[0]])) for row in rows]
+    finally:
+        conn.close()
+
+
+def iter_order_pages(
+    page_size: int,
+    statuses: tuple[str, ...] = (),
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+) -> Iterator[list[OrderRecord]]:
+    # Keyset pages on id, each read on its own short-lived connection with
+    # products fetched in one IN query. Nothing stays open on the server while
+    # the caller consumes a page, however slowly.
+    after_id = 0
+    while True:
+        after_id, page = _fetch_order_page(_conn(), after_id, page_size, statuses, created_from, created_to)
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+
+
+@timed("db.get_request_hash")
+def get_request_hash(reference: UUID) -> bytes | None:
     conn = _conn()
     try:
         with conn.cursor() as cursor:
-            cursor.execute("SELECT * FROM v2_orders WHERE reference = %s", (str(reference),))
-            order_row = cursor.fetchone()
-            if not order_row:
+            cursor.execute("SELECT request_hash FROM v2_orders WHERE reference = %s", (reference_param(reference),))
+            row = cursor.fetchone()
+            if row is None or row["request_hash"] is None:
                 return None
+            return bytes(row["request_hash"])
+    finally:
+        conn.close()
+
+
+@timed("db.get_stored_response")
+def get_stored_response(reference: UUID) -> StoredResponse | None:
+    conn = _conn()
+    try:
+        with conn.cursor(Cursor) as cursor:
             cursor.execute(
-                "SELECT product_id, count, spec, status FROM v2_order_products WHERE order_id = %s ORDER BY id",
-                (order_row["id"],),
+                "SELECT request_hash, response_status, response_body FROM v2_orders WHERE reference = %s",
+                (reference_param(reference),),
+            )
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            request_hash, status_code, body = row
+            return StoredResponse(
+                None if request_hash is None else bytes(request_hash),
+                None if status_code is None else int(status_code),
+                None if body is None else bytes(body),
             )
-            product_rows = cursor.fetchall()
-            return _map_row_to_order(order_row, product_rows)
     finally:
         conn.close()
 
 
+@timed("db.get_callback_info")
 def get_callback_info(reference: UUID) -> tuple[str, float] | None:
     conn = _conn()
     try:
         with conn.cursor() as cursor:
-            cursor.execute("SELECT callback_url, amount FROM v2_orders WHERE reference = %s", (str(reference),))
+            cursor.execute("SELECT callback_url, amount FROM v2_orders WHERE reference = %s", (reference_param(reference),))
             row = cursor.fetchone()
             if row is None:
                 return None
@@ -222,91 +794,113 @@ def get_callback_info(reference: UUID) -> tuple[str, float] | None:
         conn.close()
 
 
+# (target status, select, update, keyset). Each select returns reference and
+# callback_url followed by its keyset columns, which match the index the
+# select's filter uses, so a chunk is an index range scan with no filesort.
+_TRANSITION_PHASES = (
+    (
+        "SHIPPED",
+        """
+        SELECT reference, callback_url, created_at, id
+        FROM v2_orders o
+        WHERE status = 'SUCCESS' AND created_at <= NOW() - INTERVAL 30 SECOND
+        AND EXISTS (SELECT 1 FROM v2_order_products p WHERE p.order_id = o.id AND p.status = 'PROCESSING')
+        """,
+        """
+        UPDATE v2_order_products p
+        JOIN v2_orders o ON p.order_id = o.id
+        SET p.status = 'SHIPPED'
+        WHERE o.reference = %s AND p.status = 'PROCESSING'
+        """,
+        ("created_at", "id"),
+    ),
+    (
+        "DELIVERED",
+        """
+        SELECT reference, callback_url, created_at, id
+        FROM v2_orders
+        WHERE status = 'SUCCESS' AND created_at <= NOW() - INTERVAL 60 SECOND
+        """,
+        """
+        UPDATE v2_orders o
+        LEFT JOIN v2_order_products p ON p.order_id = o.id AND p.status IN ('PROCESSING', 'SHIPPED')
+        SET p.status = 'DELIVERED', o.product_pending = 0
+        WHERE o.reference = %s
+        """,
+        ("created_at", "id"),
+    ),
+    (
+        "COMPLETED",
+        """
+        SELECT reference, callback_url, id
+        FROM v2_orders
+        WHERE status = 'SUCCESS' AND product_pending = 0 AND product_count > 0
+        """,
+        "UPDATE v2_orders SET status = 'COMPLETED' WHERE reference = %s",
+        ("id",),
+    ),
+)
+
+
+def _apply_phase(cursor, target_status: str, update_sql: str, rows: list[tuple]) -> list[TransitionTarget]:
+    if not rows:
+        return []
+    cursor.executemany(update_sql, [(row[0],) for row in rows])
+    return [TransitionTarget(reference_value(row[0]), row[1], target_status) for row in rows]
+
+
+@timed("db.apply_scheduled_transitions")
 def apply_scheduled_transitions() -> list[TransitionTarget]:
     transitions: list[TransitionTarget] = []
     conn = _conn()
     try:
-        with conn.cursor() as cursor:
-            cursor.execute(
-                """
-                SELECT reference, callback_url
-                FROM v2_orders
-                WHERE status = 'SUCCESS' AND created_at <= NOW() - INTERVAL 30 SECOND
-                """
-            )
-            to_shipped = cursor.fetchall()
-            if to_shipped:
-                refs = [row["reference"] for row in to_shipped]
-                cursor.executemany(
-                    """
-                    UPDATE v2_order_products p
-                    JOIN v2_orders o ON p.order_id = o.id
-                    SET p.status = 'SHIPPED'
-                    WHERE o.reference = %s AND p.status = 'PROCESSING'
-                    """,
-                    [(ref,) for ref in refs],
-                )
-                transitions.extend(
-                    [
-                        TransitionTarget(reference=UUID(row["reference"]), callback_url=row["callback_url"], target_status="SHIPPED")
-                        for row in to_shipped
-                    ]
-                )
+        with conn.cursor(Cursor) as cursor:
+            for target_status, select_sql, update_sql, _ in _TRANSITION_PHASES:
+                cursor.execute(select_sql)
+                transitions.extend(_apply_phase(cursor, target_status, update_sql, cursor.fetchall()))
 
-            cursor.execute(
-                """
-                SELECT reference, callback_url
-                FROM v2_orders
-                WHERE status = 'SUCCESS' AND created_at <= NOW() - INTERVAL 60 SECOND
-                """
-            )
-            to_delivered = cursor.fetchall()
-            if to_delivered:
-                refs = [row["reference"] for row in to_delivered]
-                cursor.executemany(
-                    """
-                    UPDATE v2_order_products p
-                    JOIN v2_orders o ON p.order_id = o.id
-                    SET p.status = 'DELIVERED'
-                    WHERE o.reference = %s AND p.status IN ('PROCESSING', 'SHIPPED')
-                    """,
-                    [(ref,) for ref in refs],
-                )
-                transitions.extend(
-                    [
-                        TransitionTarget(reference=UUID(row["reference"]), callback_url=row["callback_url"], target_status="DELIVERED")
-                        for row in to_delivered
-                    ]
-                )
+        conn.commit()
+    finally:
+        conn.close()
+    return transitions
 
-            cursor.execute(
-                """
-                SELECT o.reference, o.callback_url
-                FROM v2_orders o
-                WHERE o.status = 'SUCCESS'
-                  AND EXISTS (
-                    SELECT 1 FROM v2_order_products p WHERE p.order_id = o.id
-                  )
-                  AND NOT EXISTS (
-                    SELECT 1 FROM v2_order_products p WHERE p.order_id = o.id AND p.status != 'DELIVERED'
-                  )
-                """
-            )
-            to_completed = cursor.fetchall()
-            if to_completed:
-                refs = [row["reference"] for row in to_completed]
-                cursor.executemany("UPDATE v2_orders SET status = 'COMPLETED' WHERE reference = %s", [(ref,) for ref in refs])
-                transitions.extend(
-                    [
-                        TransitionTarget(reference=UUID(row["reference"]), callback_url=row["callback_url"], target_status="COMPLETED")
-                        for row in to_completed
-                    ]
-                )
 
+def _apply_transition_chunk(
+    conn,
+    phase: tuple[str, str, str, tuple[str, ...]],
+    after: tuple | None,
+    chunk_size: int,
+) -> tuple[tuple | None, list[TransitionTarget]]:
+    target_status, select_sql, update_sql, keyset = phase
+    columns = ", ".join(keyset)
+    sql, params = select_sql, []
+    if after is not None:
+        sql += f" AND ({columns}) > ({', '.join(['%s'] * len(keyset))})"
+        params.extend(after)
+    try:
+        with conn.cursor(Cursor) as cursor:
+            cursor.execute(f"{sql} ORDER BY {columns} LIMIT %s", (*params, chunk_size))
+            rows = cursor.fetchall()
+            chunk = _apply_phase(cursor, target_status, update_sql, rows)
         conn.commit()
+        return (tuple(rows[-1][-len(keyset):]) if rows else after), chunk
     finally:
         conn.close()
-    return transitions
+
+
+def iter_scheduled_transitions(chunk_size: int) -> Iterator[list[TransitionTarget]]:
+    # Keyset chunks on each phase's index order, each read, applied and
+    # committed on its own short-lived connection like iter_order_pages.
+    # Nothing stays open on the server while the caller dispatches a chunk's
+    # callbacks, and no chunk rereads the rows before its cursor.
+    for phase in _TRANSITION_PHASES:
+        after = None
+        while True:
+            after, chunk = _apply_transition_chunk(_conn(), phase, after, chunk_size)
+            if chunk:
+                yield chunk
+            if len(chunk) < chunk_size:
+                break
 
 
 def clear_orders(reference: UUID | None = None) -> int:
@@ -316,7 +910,32 @@ def clear_orders(reference: UUID | None = None) -> int:
             if reference is None:
                 cursor.execute("DELETE FROM v2_orders")
             else:
-                cursor.execute("DELETE FROM v2_orders WHERE reference = %s", (str(reference),))
+                cursor.execute("DELETE FROM v2_orders WHERE reference = %s", (reference_param(reference),))
+            affected = cursor.rowcount
+        conn.commit()
+        return affected
+    finally:
+        conn.close()
+
+
+def purge_orders_batch(status: str, max_age_seconds: int, batch_size: int) -> int:
+    conn = _conn()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT id FROM v2_orders
+                WHERE status = %s AND created_at <= NOW() - INTERVAL %s SECOND
+                ORDER BY status, created_at
+                LIMIT %s
+                """,
+                (status, int(max_age_seconds), int(batch_size)),
+            )
+            ids = [row["id"] for row in cursor.fetchall()]
+            if not ids:
+                return 0
+            placeholders = ", ".join(["%s"] * len(ids))
+            cursor.execute(f"DELETE FROM v2_orders WHERE id IN ({placeholders})", ids)
             affected = cursor.rowcount
         conn.commit()
         return affected
@@ -324,6 +943,50 @@ def clear_orders(reference: UUID | None = None) -> int:
         conn.close()
 
 
+def migrate_to_compact(batch_size: int = 5000) -> int:
+    conn = _raw_conn()
+    try:
+        with conn.cursor() as cursor:
+            if _reference_column_type(cursor) == "binary":
+                return 0
+            if not _column_exists(cursor, "v2_orders", "reference_bin"):
+                cursor.execute("ALTER TABLE v2_orders ADD COLUMN reference_bin BINARY(16) NULL AFTER reference")
+
+            converted = 0
+            while True:
+                cursor.execute(
+                    """
+                    UPDATE v2_orders SET reference_bin = UNHEX(REPLACE(reference, '-', ''))
+                    WHERE reference_bin IS NULL
+                    LIMIT %s
+                    """,
+                    (int(batch_size),),
+                )
+                conn.commit()
+                if cursor.rowcount <= 0:
+                    break
+                converted += cursor.rowcount
+
+            types = _COLUMN_TYPES["compact"]
+            cursor.execute("ALTER TABLE v2_orders DROP COLUMN reference")
+            cursor.execute(
+                f"""
+                ALTER TABLE v2_orders
+                    CHANGE COLUMN reference_bin reference {types["reference"]} NOT NULL,
+                    ADD UNIQUE INDEX reference (reference),
+                    MODIFY order_id VARCHAR(64){types["ascii"]},
+                    MODIFY card_number VARCHAR(64){types["ascii"]} NOT NULL,
+                    MODIFY currency VARCHAR(16){types["ascii"]} NOT NULL,
+                    MODIFY status {types["order_status"]} NOT NULL
+                """
+            )
+            cursor.execute(f"ALTER TABLE v2_order_products MODIFY status {types['product_status']} NOT NULL")
+        conn.commit()
+        return converted
+    finally:
+        conn.close()
+
+
 def count_rows(table_name: str) -> int:
     conn = _conn()
     try:
@@ -1,20 +1,44 @@
-import json
+import asyncio
+import contextvars
 import logging
 import os
 import threading
-import urllib.error
-import urllib.request
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
+from datetime import datetime
+from functools import partial
+from typing import Any, Callable, Iterator
+from urllib.parse import urlsplit, urlunsplit
 from uuid import UUID
 
-from fastapi import FastAPI, Query
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 
-from qwire_mock import order_db
+from qwire_mock import (
+    admin,
+    admission,
+    capture,
+    compression,
+    export,
+    fault_injection,
+    msgpack_codec,
+    order_db,
+    querylog,
+    rules,
+    timings,
+    tracing,
+)
+from qwire_mock.callback_sender import CallbackSender
 from qwire_mock.config import load_config
+from qwire_mock.idempotency import CachedResponse, IdempotencyCache, request_digest
+from qwire_mock.metrics import metrics_response
+from qwire_mock.profiler import ProfileSession
 from qwire_mock.schemas import OrderRequest, OrderResponse
+from qwire_mock.serialization import json_response, log_text, model_bytes, order_bytes
 
 logger = logging.getLogger(__name__)
+SERVICE_NAME = "qwire-order"
 CONFIG = load_config()
 ORDER_CONFIG = CONFIG["order"]
 LOGGING_CONFIG = CONFIG["logging"]
@@ -42,96 +66,448 @@ _ensure_file_logger()
 
 POLL_INTERVAL_SECONDS = int(ORDER_CONFIG["poll_interval_seconds"])
 CALLBACK_SKIP_AMOUNT_GTE = float(ORDER_CONFIG["callback_skip_amount_gte"])
+RULES = rules.compile_rules(ORDER_CONFIG["rules"], CALLBACK_SKIP_AMOUNT_GTE)
+RETENTION_CONFIG = ORDER_CONFIG["retention"]
+SCHEDULER_CONFIG = ORDER_CONFIG["scheduler"]
+EXPORT_PAGE_SIZE = max(1, int(ORDER_CONFIG["export"]["page_size"]))
+ORDER_STATUSES = ("SUCCESS", "COMPLETED", "FAIL")
 _stop_event = threading.Event()
+_idempotency_cache = IdempotencyCache(int(ORDER_CONFIG["idempotency_cache_size"]))
+_callback_sender = CallbackSender(CONFIG["callback_sender"], logger)
+DELIVERY_CONFIG = CONFIG["callback_sender"]["delivery"]
+DIAGNOSTICS_CONFIG = CONFIG["diagnostics"]
+ADMIN = admin.dependencies(CONFIG["admin"])
+_profile_session = ProfileSession(
+    DIAGNOSTICS_CONFIG["profile_max_seconds"], DIAGNOSTICS_CONFIG["profile_interval_ms"]
+)
 
 
-def _json(payload: dict) -> str:
-    return json.dumps(payload, ensure_ascii=False, indent=2, default=str)
+def _order_outcome(order: OrderResponse | order_db.OrderRecord) -> rules.Outcome:
+    # Stored card numbers are masked after the first six digits, so BIN rules
+    # longer than that only apply at order creation.
+    return RULES.evaluate(
+        order.cardNumber,
+        order.amount,
+        order.currency,
+        [product.productId for product in order.products],
+    )
 
 
-def _dispatch_callback(order: OrderResponse, callback_url: str, event_type: str) -> None:
-    if order.amount >= CALLBACK_SKIP_AMOUNT_GTE:
+def _callback_outcome(order: OrderResponse | order_db.OrderRecord, event_type: str) -> rules.Outcome | None:
+    outcome = _order_outcome(order)
+    if outcome.suppress_callback:
         logger.info(
-            "skip callback by amount policy: reference=%s amount=%s threshold=%s event=%s",
+            "skip callback by rule: reference=%s amount=%s rules=%s event=%s",
             order.reference,
             order.amount,
-            CALLBACK_SKIP_AMOUNT_GTE,
+            ",".join(outcome.rules),
             event_type,
         )
+        return None
+    return outcome
+
+
+def _dispatch_callback(order: OrderResponse | order_db.OrderRecord, callback_url: str, event_type: str) -> None:
+    outcome = _callback_outcome(order, event_type)
+    if outcome is None:
         return
 
-    payload = order.model_dump(mode="json")
-    payload["eventType"] = event_type
-    logger.info("dispatch callback -> %s\n%s", callback_url, _json(payload))
+    body = order_bytes(order, eventType=event_type)
+    logger.info("dispatch callback -> %s\n%s", callback_url, log_text(body))
+    _callback_sender.send(
+        callback_url, body, str(order.reference), event_type, payload=order, delay=outcome.callback_delay
+    )
+
+
+def _as_response(payload: Any) -> Any:
+    if isinstance(payload, list):
+        return [_as_response(item) for item in payload]
+    if isinstance(payload, order_db.OrderRecord):
+        return payload.to_response()
+    return payload
+
+
+def use_in_process_callbacks(
+    port: int,
+    handlers: dict[str, Callable[[Any], Any]],
+    hosts: tuple[str, ...],
+    enabled: Callable[[], bool] | None = None,
+) -> None:
+    wrapped = {path: (lambda payload, handler=handler: handler(_as_response(payload))) for path, handler in handlers.items()}
+    _callback_sender.register_local_receiver(port, wrapped, hosts, enabled)
+    logger.info("in-process callback delivery enabled: port=%s paths=%s", port, sorted(handlers))
+
+
+def _batch_url(callback_url: str) -> str:
+    parts = urlsplit(callback_url)
+    return urlunsplit((parts.scheme, parts.netloc, DELIVERY_CONFIG["batch_path"], "", ""))
+
+
+def _coalesce(transitions: list[order_db.TransitionTarget]) -> dict[UUID, tuple[str, list[str]]]:
+    events: dict[UUID, tuple[str, list[str]]] = {}
+    for target in transitions:
+        _, order_events = events.setdefault(target.reference, (target.callback_url, []))
+        order_events.append(f"ORDER_{target.target_status}")
+    return events
+
+
+def _deliver_event(target: order_db.TransitionTarget) -> None:
+    order = order_db.get_order_record(target.reference)
+    if order is None:
+        return
+    _dispatch_callback(order, target.callback_url, f"ORDER_{target.target_status}")
+
+
+def _coalesced_body(reference: UUID, events: list[str]) -> tuple[bytes, order_db.OrderRecord, float] | None:
+    order = order_db.get_order_record(reference)
+    if order is None:
+        return None
+    outcome = _callback_outcome(order, events[-1])
+    if outcome is None:
+        return None
+    return order_bytes(order, eventType=events[-1], events=events), order, outcome.callback_delay
+
+
+def _deliver_coalesced(reference: UUID, callback_url: str, events: list[str]) -> None:
+    coalesced = _coalesced_body(reference, events)
+    if coalesced is None:
+        return
+    body, order, delay = coalesced
+    logger.info("dispatch callback -> %s\n%s", callback_url, log_text(body))
+    _callback_sender.send(callback_url, body, str(reference), events[-1], payload=order, delay=delay)
 
-    body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
-    request = urllib.request.Request(callback_url, data=body, headers={"Content-Type": "application/json"}, method="POST")
-    try:
-        with urllib.request.urlopen(request, timeout=5) as response:
-            logger.info("callback response status=%s", response.status)
-            raw_body = response.read().decode("utf-8", errors="replace").strip()
-            if raw_body:
-                try:
-                    response_payload = json.loads(raw_body)
-                    logger.info("callback response body:\n%s", _json(response_payload))
-                except json.JSONDecodeError:
-                    logger.info("callback response body(raw): %s", raw_body)
-    except urllib.error.HTTPError as exc:
-        logger.warning("callback http error: %s", exc)
-    except Exception as exc:
-        logger.warning("callback request failed: %s", exc)
+
+def _deliver_batch(batch_url: str, entries: list[tuple[UUID, list[str]]]) -> None:
+    # Orders are batched per callback delay, so each is held back as long as
+    # it would be in single mode.
+    by_delay: dict[float, list[tuple[bytes, order_db.OrderRecord]]] = {}
+    for reference, events in entries:
+        coalesced = _coalesced_body(reference, events)
+        if coalesced is not None:
+            body, order, delay = coalesced
+            by_delay.setdefault(delay, []).append((body, order))
+    for delay, items in by_delay.items():
+        logger.info("dispatch callback batch -> %s size=%s delay=%ss", batch_url, len(items), delay)
+        _callback_sender.send(
+            batch_url,
+            b"[" + b",".join(body for body, _ in items) + b"]",
+            f"batch({len(items)})",
+            "ORDER_BATCH",
+            payload=[order for _, order in items],
+            delay=delay,
+        )
+
+
+def _delivery_jobs(transitions: list[order_db.TransitionTarget]) -> list[tuple[str, Callable[[], None]]]:
+    mode = DELIVERY_CONFIG["mode"]
+    if mode == "single":
+        return [(target.callback_url, partial(_deliver_event, target)) for target in transitions]
+
+    coalesced = _coalesce(transitions)
+    if mode == "coalesce":
+        return [
+            (callback_url, partial(_deliver_coalesced, reference, callback_url, events))
+            for reference, (callback_url, events) in coalesced.items()
+        ]
+
+    grouped: dict[str, list[tuple[UUID, list[str]]]] = {}
+    for reference, (callback_url, events) in coalesced.items():
+        grouped.setdefault(_batch_url(callback_url), []).append((reference, events))
+    max_size = max(1, int(DELIVERY_CONFIG["batch_max_size"]))
+    return [
+        (batch_url, partial(_deliver_batch, batch_url, entries[start : start + max_size]))
+        for batch_url, entries in grouped.items()
+        for start in range(0, len(entries), max_size)
+    ]
+
+
+def _dispatch_transitions(transitions: list[order_db.TransitionTarget]) -> None:
+    for _, job in _delivery_jobs(transitions):
+        job()
+
+
+def _callback_retry_worker() -> None:
+    interval = float(CONFIG["callback_sender"]["retry"]["poll_seconds"])
+    while not _stop_event.is_set():
+        try:
+            _callback_sender.run_due_retries()
+        except Exception as exc:
+            logger.warning("callback retry run failed: %s", exc)
+        _stop_event.wait(interval)
+
+
+def _transition_chunks() -> Iterator[list[order_db.TransitionTarget]]:
+    chunk_size = int(SCHEDULER_CONFIG["chunk_size"])
+    if chunk_size > 0:
+        return order_db.iter_scheduled_transitions(chunk_size)
+    # Lazy like the chunked path, so the work happens on the first next().
+    return (order_db.apply_scheduled_transitions() for _ in range(1))
+
+
+def _scheduler_tick() -> None:
+    chunks = _transition_chunks()
+    while True:
+        with timings.phase("transitions"), tracing.span("scheduler.transitions"):
+            transitions = next(chunks, None)
+        if transitions is None:
+            return
+        attributes = {"transitions": len(transitions)}
+        with timings.phase("dispatch"), tracing.span("scheduler.dispatch", attributes=attributes):
+            _dispatch_transitions(transitions)
 
 
 def _status_scheduler() -> None:
     while not _stop_event.is_set():
-        transitions = order_db.apply_scheduled_transitions()
-        for target in transitions:
-            order = order_db.get_order(target.reference)
-            if order is None:
-                continue
-            _dispatch_callback(order, target.callback_url, f"ORDER_{target.target_status}")
+        with timings.track("scheduler", "tick"), tracing.span("scheduler.tick", service=SERVICE_NAME):
+            _scheduler_tick()
         _stop_event.wait(POLL_INTERVAL_SECONDS)
 
 
+class _HostSlots:
+    # Per-host concurrency without head-of-line blocking: a job whose host is
+    # already at per_host_concurrency is parked instead of holding a worker,
+    # and runs when one of that host's jobs finishes. Used only on the loop.
+    def __init__(self, per_host: int) -> None:
+        self.per_host = max(1, per_host)
+        self.in_flight: dict[str, int] = {}
+        self.parked: dict[str, deque[Callable[[], None]]] = {}
+
+    def acquire(self, host: str, job: Callable[[], None]) -> bool:
+        if self.in_flight.get(host, 0) < self.per_host:
+            self.in_flight[host] = self.in_flight.get(host, 0) + 1
+            return True
+        self.parked.setdefault(host, deque()).append(job)
+        return False
+
+    def next_job(self, host: str) -> Callable[[], None] | None:
+        # A finished job's slot passes straight to the host's oldest parked job.
+        parked = self.parked.get(host)
+        if parked:
+            return parked.popleft()
+        self.parked.pop(host, None)
+        self.in_flight[host] -= 1
+        if not self.in_flight[host]:
+            del self.in_flight[host]
+        return None
+
+
+async def _dispatch_worker(
+    queue: asyncio.Queue,
+    executor: ThreadPoolExecutor,
+    slots: _HostSlots,
+    room: asyncio.Semaphore,
+) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        url, job = await queue.get()
+        host = urlsplit(url).netloc
+        if not slots.acquire(host, job):
+            continue
+        while job is not None:
+            try:
+                await loop.run_in_executor(executor, job)
+            except Exception as exc:
+                logger.warning("callback dispatch failed: %s", exc)
+            finally:
+                room.release()
+                queue.task_done()
+            job = slots.next_job(host)
+
+
+async def _async_status_scheduler() -> None:
+    loop = asyncio.get_running_loop()
+    concurrency = max(1, int(SCHEDULER_CONFIG["max_concurrency"]))
+    # room bounds queued and parked jobs to queue_size on top of the ones the
+    # workers are running, so parking does not lift the bound.
+    queue_size = max(1, int(SCHEDULER_CONFIG["queue_size"]))
+    queue: asyncio.Queue = asyncio.Queue()
+    room = asyncio.Semaphore(queue_size + concurrency)
+    executor = ThreadPoolExecutor(max_workers=concurrency + 1, thread_name_prefix="order-dispatch")
+    slots = _HostSlots(int(SCHEDULER_CONFIG["per_host_concurrency"]))
+    workers = [asyncio.create_task(_dispatch_worker(queue, executor, slots, room)) for _ in range(concurrency)]
+    try:
+        while True:
+            try:
+                # Executor calls and queued jobs run in a copy of the tick's
+                # context, so their spans stay in the tick's trace.
+                with tracing.span("scheduler.tick", service=SERVICE_NAME):
+                    chunks = _transition_chunks()
+                    while True:
+                        with tracing.span("scheduler.transitions"):
+                            context = contextvars.copy_context()
+                            transitions = await loop.run_in_executor(executor, context.run, next, chunks, None)
+                        if transitions is None:
+                            break
+                        for url, job in _delivery_jobs(transitions):
+                            if room.locked():
+                                logger.info("dispatch queue full (%s), waiting for in-flight callbacks", queue_size)
+                            await room.acquire()
+                            queue.put_nowait((url, partial(contextvars.copy_context().run, job)))
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("scheduler tick failed: %s", exc)
+            await asyncio.sleep(POLL_INTERVAL_SECONDS)
+    finally:
+        timeout = float(SCHEDULER_CONFIG["shutdown_timeout_seconds"])
+        try:
+            await asyncio.wait_for(queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pending = queue.qsize() + sum(len(parked) for parked in slots.parked.values())
+            logger.warning("scheduler shutdown: %s callbacks not drained after %ss", pending, timeout)
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        executor.shutdown(wait=False)
+
+
+def _purge_aged_orders() -> dict[str, int]:
+    batch_size = int(RETENTION_CONFIG["batch_size"])
+    batch_pause = float(RETENTION_CONFIG["batch_pause_seconds"])
+    purged: dict[str, int] = {}
+    for status, max_age in RETENTION_CONFIG["max_age_seconds"].items():
+        total = 0
+        while not _stop_event.is_set():
+            deleted = order_db.purge_orders_batch(status, int(max_age), batch_size)
+            if deleted <= 0:
+                break
+            total += deleted
+            logger.info("retention purge progress: status=%s deleted=%s total=%s", status, deleted, total)
+            if deleted < batch_size:
+                break
+            _stop_event.wait(batch_pause)
+        purged[status] = total
+    logger.info("retention purge finished: %s", purged)
+    return purged
+
+
+def _retention_worker() -> None:
+    interval = float(RETENTION_CONFIG["interval_seconds"])
+    while not _stop_event.is_set():
+        try:
+            _purge_aged_orders()
+        except Exception as exc:
+            logger.warning("retention purge failed: %s", exc)
+        _stop_event.wait(interval)
+
+
 @asynccontextmanager
 async def lifespan(_: FastAPI):
     order_db.init_db()
-    logger.info("order service startup: scheduler poll_interval=%ss", POLL_INTERVAL_SECONDS)
-    scheduler = threading.Thread(target=_status_scheduler, daemon=True)
-    scheduler.start()
+    logger.info(
+        "order service startup: scheduler mode=%s poll_interval=%ss",
+        SCHEDULER_CONFIG["mode"],
+        POLL_INTERVAL_SECONDS,
+    )
+    scheduler_task = None
+    if SCHEDULER_CONFIG["mode"] == "asyncio":
+        scheduler_task = asyncio.create_task(_async_status_scheduler())
+    else:
+        threading.Thread(target=_status_scheduler, daemon=True).start()
+    threading.Thread(target=_callback_retry_worker, daemon=True).start()
+    if RETENTION_CONFIG["enabled"]:
+        logger.info("order service retention enabled: max_age_seconds=%s", RETENTION_CONFIG["max_age_seconds"])
+        threading.Thread(target=_retention_worker, daemon=True).start()
     try:
         yield
     finally:
         _stop_event.set()
+        if scheduler_task is not None:
+            scheduler_task.cancel()
+            await asyncio.gather(scheduler_task, return_exceptions=True)
+        capture.flush()
+        tracing.flush()
         logger.info("order service shutdown")
 
 
 app = FastAPI(title="QWire Order API v2", version="2.0.0", lifespan=lifespan)
+fault_injection.install(app, ORDER_CONFIG["faults"])
+admission.install(app, ORDER_CONFIG["admission"])
+capture.install(app, "order", CONFIG["capture"])
+# The last middleware added is outermost. msgpack wraps capture, admission and
+# fault injection so they see plain JSON, and sits inside compression so
+# request bodies are inflated before they are decoded.
+msgpack_codec.install(app, CONFIG["msgpack"], paths=("/order",))
+compression.install(app, CONFIG["compression"])
+timings.install(app, DIAGNOSTICS_CONFIG)
+tracing.install(app, CONFIG["tracing"], service=SERVICE_NAME)
+
+
+def _order_exists_response() -> JSONResponse:
+    return JSONResponse(status_code=400, content={"status": "FAIL", "fail_reason": "Order already exists"})
+
+
+def _replay_response(body: OrderRequest, digest: bytes):
+    cached = _idempotency_cache.get(body.reference)
+    if cached is not None:
+        if cached.digest != digest:
+            return _order_exists_response()
+        logger.info("POST /order idempotent replay(%s): reference=%s", cached.status_code, body.reference)
+        return json_response(cached.body, status_code=cached.status_code)
+
+    stored = order_db.get_stored_response(body.reference)
+    if stored is None:
+        return None
+    # Orders stored without their response (created before it was kept) are
+    # treated as conflicts rather than replayed from their current state.
+    if stored.request_hash != digest or stored.body is None:
+        return _order_exists_response()
+    _idempotency_cache.put(body.reference, CachedResponse(digest, stored.status_code, stored.body))
+    logger.info("POST /order idempotent replay(%s) from db: reference=%s", stored.status_code, body.reference)
+    return json_response(stored.body, status_code=stored.status_code)
 
 
 @app.post("/order")
 def create_order(body: OrderRequest):
-    logger.info("POST /order request:\n%s", _json(body.model_dump(mode="json")))
+    # Body parsing and validation ran before the handler was entered.
+    timings.since_start("validation")
+    timings.label(reference=str(body.reference))
+    tracing.set_attribute("order.reference", str(body.reference))
+    tracing.remember(str(body.reference))
+    with timings.phase("logging"):
+        logger.info("POST /order request:\n%s", log_text(model_bytes(body)))
+
+    digest = request_digest(body)
+    replay = _replay_response(body, digest)
+    if replay is not None:
+        return replay
 
-    if order_db.exists(body.reference):
-        return JSONResponse(status_code=400, content={"status": "FAIL", "fail_reason": "Order already exists"})
+    outcome = RULES.evaluate(
+        body.cardNumber, body.amount, body.currency, [product.productId for product in body.products]
+    )
+    try:
+        if outcome.fail_reason is not None:
+            failed_order = order_db.create_order(
+                body, status="FAIL", fail_reason=outcome.fail_reason, response_status=400
+            )
+            with timings.phase("serialization"):
+                payload = model_bytes(failed_order)
+            _idempotency_cache.put(body.reference, CachedResponse(digest, 400, payload))
+            with timings.phase("logging"):
+                logger.info("POST /order response(400):\n%s", log_text(payload))
+            return json_response(payload, status_code=400)
 
-    if body.cardNumber.strip().startswith("4"):
-        failed_order = order_db.create_order(body, status="FAIL", fail_reason="Unsupported card type")
-        payload = failed_order.model_dump(mode="json")
-        logger.info("POST /order response(400):\n%s", _json(payload))
-        return JSONResponse(status_code=400, content=payload)
+        order = order_db.create_order(body, status="SUCCESS", response_status=201)
+    except order_db.DuplicateOrderError:
+        return _replay_response(body, digest) or _order_exists_response()
 
-    order = order_db.create_order(body, status="SUCCESS")
+    with timings.phase("serialization"):
+        payload = model_bytes(order)
+    _idempotency_cache.put(body.reference, CachedResponse(digest, 201, payload))
     callback_info = order_db.get_callback_info(body.reference)
     if callback_info is not None:
         callback_url, _ = callback_info
-        _dispatch_callback(order, callback_url, "ORDER_SUCCESS")
+        with timings.phase("callback"):
+            _dispatch_callback(order, callback_url, "ORDER_SUCCESS")
+
+    with timings.phase("logging"):
+        logger.info("POST /order response(201):\n%s", log_text(payload))
+    return json_response(payload, status_code=201)
+
 
-    payload = order.model_dump(mode="json")
-    payload.pop("fail_reason", None)
-    logger.info("POST /order response(201):\n%s", _json(payload))
-    return JSONResponse(status_code=201, content=payload)
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return metrics_response()
 
 
 @app.get("/order")
@@ -144,15 +520,112 @@ def get_order(reference: str = Query(..., description="Order reference (UUID)"))
             content={"status": "FAIL", "fail_reason": "invalid UUID string", "reference": reference},
         )
 
-    order = order_db.get_order(reference_uuid)
+    order = order_db.get_order(reference_uuid, replica=True)
     if order is None:
         return JSONResponse(
             status_code=404,
             content={"status": "FAIL", "fail_reason": "Order not found", "reference": reference},
         )
 
-    payload = order.model_dump(mode="json")
-    if order.fail_reason is None:
-        payload.pop("fail_reason", None)
-    logger.info("GET /order response:\n%s", _json(payload))
-    return JSONResponse(status_code=200, content=payload)
+    payload = model_bytes(order)
+    logger.info("GET /order response:\n%s", log_text(payload))
+    return json_response(payload, status_code=200)
+
+
+@app.get("/orders/export")
+def export_orders(
+    format: str = Query("ndjson", description="ndjson or csv"),
+    status: list[str] = Query([], description="Only orders in these statuses (repeatable)"),
+    since: datetime | None = Query(None, description="created_at >= since (UTC unless an offset is given)"),
+    until: datetime | None = Query(None, description="created_at < until (UTC unless an offset is given)"),
+):
+    if format not in export.FORMATS:
+        return JSONResponse(status_code=400, content={"status": "FAIL", "fail_reason": f"unsupported format: {format}"})
+    unknown = [value for value in status if value not in ORDER_STATUSES]
+    if unknown:
+        return JSONResponse(
+            status_code=400,
+            content={"status": "FAIL", "fail_reason": f"unknown status: {', '.join(unknown)}"},
+        )
+
+    pages = order_db.iter_order_pages(EXPORT_PAGE_SIZE, tuple(status), since, until)
+    logger.info("GET /orders/export format=%s status=%s since=%s until=%s", format, status, since, until)
+    # A sync iterator: Starlette pulls each page in the threadpool and sends it
+    # as one chunk of a chunked response.
+    return StreamingResponse(export.chunks(format, pages), media_type=export.FORMATS[format])
+
+
+@app.get("/admin/profile", dependencies=ADMIN, response_class=PlainTextResponse)
+async def profile(
+    seconds: float = Query(10, gt=0, description="Sampling duration"),
+    interval_ms: float | None = Query(None, gt=0, description="Sampling interval"),
+):
+    profiler = _profile_session.start(seconds, interval_ms)
+    if profiler is None:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    logger.info("profile started: seconds=%s interval=%ss", seconds, profiler.interval)
+    await asyncio.sleep(min(seconds, _profile_session.max_seconds))
+    return PlainTextResponse(_profile_session.stop())
+
+
+@app.post("/admin/profile/start", dependencies=ADMIN)
+async def start_profile(
+    seconds: float = Query(60, gt=0, description="Stop automatically after this long"),
+    interval_ms: float | None = Query(None, gt=0, description="Sampling interval"),
+) -> dict[str, Any]:
+    profiler = _profile_session.start(seconds, interval_ms)
+    if profiler is None:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    logger.info("profile started: seconds=%s interval=%ss", seconds, profiler.interval)
+    return {
+        "running": True,
+        "seconds": min(seconds, _profile_session.max_seconds),
+        "intervalMs": profiler.interval * 1000,
+    }
+
+
+@app.post("/admin/profile/stop", dependencies=ADMIN, response_class=PlainTextResponse)
+async def stop_profile():
+    # Returns the stacks of the profile just stopped, or of the last one if it
+    # already stopped itself.
+    return PlainTextResponse(_profile_session.stop())
+
+
+@app.get("/admin/slow-requests", dependencies=ADMIN)
+async def slow_requests(limit: int | None = Query(None, ge=1, description="Most recent first")) -> dict[str, Any]:
+    return {
+        "thresholdMs": timings.RING.threshold * 1000,
+        "entries": timings.RING.entries(limit),
+    }
+
+
+@app.delete("/admin/slow-requests", dependencies=ADMIN)
+async def clear_slow_requests() -> dict[str, Any]:
+    timings.RING.clear()
+    return {"entries": []}
+
+
+@app.get("/admin/queries", dependencies=ADMIN)
+async def query_stats() -> dict[str, Any]:
+    log = order_db.query_log()
+    return {
+        "enabled": log is not None,
+        "statements": querylog.statement_stats(log.fingerprints() if log is not None else {}),
+        "connections": querylog.connect_stats(),
+    }
+
+
+@app.get("/admin/slow-queries", dependencies=ADMIN)
+async def slow_queries(limit: int | None = Query(None, ge=1, description="Most recent first")) -> dict[str, Any]:
+    log = order_db.query_log()
+    if log is None:
+        return {"enabled": False, "entries": []}
+    return {"enabled": True, "thresholdMs": log.threshold * 1000, "entries": log.entries(limit)}
+
+
+@app.delete("/admin/slow-queries", dependencies=ADMIN)
+async def clear_slow_queries() -> dict[str, Any]:
+    log = order_db.query_log()
+    if log is not None:
+        log.clear()
+    return {"entries": []}
@@ -0,0 +1,106 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from types import FrameType
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    # ';' separates frames and ' ' the count in the collapsed format.
+    return label.replace(";", ":")
+
+
+def _stack(frame: FrameType | None) -> list[str]:
+    stack = []
+    while frame is not None:
+        stack.append(_frame_label(frame))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+class SamplingProfiler:
+    # Samples every thread's stack with sys._current_frames() and folds them
+    # into the collapsed format read by flamegraph.pl and speedscope:
+    # "thread;outer;...;inner count" per line.
+    def __init__(self, interval_ms: float = 10) -> None:
+        self.interval = max(0.001, float(interval_ms) / 1000)
+        self.samples: Counter[str] = Counter()
+        self.sample_count = 0
+        self.started_at: float | None = None
+        self.stopped_at: float | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        self.started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="qwire-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> str:
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        if self.stopped_at is None:
+            self.stopped_at = time.monotonic()
+        return self.collapsed()
+
+    def sample(self) -> None:
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            root = names.get(ident, f"thread-{ident}").replace(";", ":").replace(" ", "_")
+            self.samples[";".join([root, *_stack(frame)])] += 1
+        self.sample_count += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+
+class ProfileSession:
+    # At most one profile at a time; a started profile stops itself after
+    # `seconds` so a forgotten one does not keep sampling.
+    def __init__(self, max_seconds: float, interval_ms: float) -> None:
+        self.max_seconds = float(max_seconds)
+        self.interval_ms = float(interval_ms)
+        self._lock = threading.Lock()
+        self._profiler: SamplingProfiler | None = None
+        self._timer: threading.Timer | None = None
+        self._last: str = ""
+
+    def start(self, seconds: float, interval_ms: float | None = None) -> SamplingProfiler | None:
+        with self._lock:
+            if self._profiler is not None and self._profiler.running:
+                return None
+            profiler = self._profiler = SamplingProfiler(interval_ms or self.interval_ms)
+            profiler.start()
+            self._timer = threading.Timer(min(float(seconds), self.max_seconds), self.stop)
+            self._timer.daemon = True
+            self._timer.start()
+            return profiler
+
+    def stop(self) -> str:
+        with self._lock:
+            profiler, self._profiler = self._profiler, None
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if profiler is not None:
+                self._last = profiler.stop()
+            return self._last
+
+    def running(self) -> bool:
+        return self._profiler is not None and self._profiler.running
@@ -0,0 +1,372 @@
+import hashlib
+import json
+import logging
+import re
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any
+
+from pymysql.cursors import Cursor, SSCursor
+
+from qwire_mock import tracing
+from qwire_mock.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+QUERY_SECONDS = "qwire_db_query_seconds"
+CONNECT_SECONDS = "qwire_db_connect_seconds"
+
+REGISTRY.histogram(QUERY_SECONDS, "order_db statement latency, by statement fingerprint and call site")
+REGISTRY.histogram(CONNECT_SECONDS, "Time to open a MySQL connection, by target")
+REGISTRY.describe("qwire_db_rows_returned_total", "counter", "Rows returned by order_db statements")
+REGISTRY.describe("qwire_db_rows_affected_total", "counter", "Rows changed by order_db statements")
+REGISTRY.describe("qwire_db_rows_examined_total", "counter", "Rows examined server-side, where measured")
+REGISTRY.describe("qwire_db_slow_queries_total", "counter", "Statements over mysql.instrumentation.slow_query_ms")
+REGISTRY.describe("qwire_db_statement_info", "gauge", "Normalized SQL of each statement id")
+
+_SPACE = re.compile(r"\s+")
+_STRING = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_PLACEHOLDER = re.compile(r"%s|%\(\w+\)s")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+# IN (?, ?, ?) -> IN (?)
+_LIST = re.compile(r"\(\?(?:, \?)+\)")
+# VALUES (...), (...), ... -> VALUES (...), for rows with at most one level of nested parentheses
+_ROWS = re.compile(r"(\([^()]*(?:\([^()]*\)[^()]*)*\))(?:, \1)+")
+_MAX_CACHED_SQL = 4096
+_MAX_PARAMS = 32
+
+_ROWS_EXAMINED_SQL = (
+    "SELECT ROWS_EXAMINED FROM performance_schema.events_statements_history "
+    "WHERE THREAD_ID = PS_CURRENT_THREAD_ID() ORDER BY EVENT_ID DESC LIMIT 1"
+)
+
+
+def _fingerprint(sql: str) -> tuple[str, str]:
+    text = _SPACE.sub(" ", sql).strip()
+    text = _STRING.sub("?", text)
+    text = _PLACEHOLDER.sub("?", text)
+    text = _NUMBER.sub("?", text)
+    text = _LIST.sub("(?)", text)
+    text = _ROWS.sub(r"\1", text)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:12], text
+
+
+_cached_fingerprint = lru_cache(maxsize=1024)(_fingerprint)
+
+
+def fingerprint(sql: str | bytes) -> tuple[str, str]:
+    # (statement id, normalized SQL). order_db's statements are constants, so
+    # the cache makes this a dict lookup; generated bulk inserts are too big
+    # to keep around and are normalized each time.
+    if isinstance(sql, bytes):
+        sql = sql.decode("utf-8", "replace")
+    if len(sql) > _MAX_CACHED_SQL:
+        return _fingerprint(sql)
+    return _cached_fingerprint(sql)
+
+
+def call_site(depth: int = 2) -> str:
+    # The nearest public function up the stack, so statements issued from
+    # helpers (_apply_phase, _fetch_order_record) are attributed to the
+    # order_db entry point that ran them.
+    frame = sys._getframe(depth)
+    nearest = frame.f_code.co_name
+    for _ in range(6):
+        if frame is None:
+            break
+        name = frame.f_code.co_name
+        if not name.startswith(("_", "<")):
+            return name
+        frame = frame.f_back
+    return nearest
+
+
+def _redact_value(value: Any) -> Any:
+    if value is None:
+        return None
+    if isinstance(value, (str, bytes, bytearray)):
+        return f"<{type(value).__name__}:{len(value)}>"
+    if isinstance(value, (list, tuple)):
+        return f"<{len(value)} values>"
+    return f"<{type(value).__name__}>"
+
+
+def _plain_value(value: Any) -> Any:
+    if value is None or isinstance(value, (int, float)):
+        return value
+    text = repr(value) if isinstance(value, (bytes, bytearray)) else str(value)
+    return text if len(text) <= 64 else text[:61] + "..."
+
+
+def redact_params(args: Any, redact: bool = True) -> Any:
+    render = _redact_value if redact else _plain_value
+    if args is None:
+        return None
+    if isinstance(args, dict):
+        return {key: render(value) for key, value in list(args.items())[:_MAX_PARAMS]}
+    if isinstance(args, (list, tuple)):
+        return [render(value) for value in list(args)[:_MAX_PARAMS]]
+    return render(args)
+
+
+class QueryLog:
+    def __init__(
+        self,
+        slow_query_ms: float = 200,
+        size: int = 200,
+        path: str | None = None,
+        redact: bool = True,
+        rows_examined: str = "slow",
+    ) -> None:
+        self.threshold = float(slow_query_ms) / 1000
+        self.path = path or None
+        self.redact = bool(redact)
+        if rows_examined not in ("off", "slow", "all"):
+            raise ValueError(f"Unsupported mysql.instrumentation.rows_examined: {rows_examined}")
+        self.rows_examined = rows_examined
+        self._entries: deque[dict[str, Any]] = deque(maxlen=max(1, int(size)))
+        self._lock = threading.Lock()
+        self._statements: dict[str, str] = {}
+
+    def statement(self, sql: str | bytes) -> str:
+        statement_id, text = fingerprint(sql)
+        if statement_id not in self._statements:
+            with self._lock:
+                self._statements[statement_id] = text
+            REGISTRY.set("qwire_db_statement_info", 1, statement=statement_id, sql=text[:200])
+        return statement_id
+
+    def fingerprints(self) -> dict[str, str]:
+        with self._lock:
+            return dict(self._statements)
+
+    def record(
+        self,
+        cursor: "InstrumentedCursor",
+        sql: str | bytes,
+        args: Any,
+        seconds: float,
+        site: str,
+        many: bool = False,
+        error: BaseException | None = None,
+    ) -> None:
+        statement_id = self.statement(sql)
+        labels = {"statement": statement_id, "site": site}
+        cursor.labels = labels
+        REGISTRY.observe(QUERY_SECONDS, seconds, **labels)
+        rows = None
+        if error is None and not cursor.unbuffered:
+            rows = max(0, cursor.rowcount)
+            if cursor.description is not None:
+                REGISTRY.inc("qwire_db_rows_returned_total", rows, **labels)
+            else:
+                REGISTRY.inc("qwire_db_rows_affected_total", rows, **labels)
+
+        tracing.record(
+            f"db.{site}",
+            seconds,
+            {"db.system": "mysql", "db.statement": self._statements.get(statement_id, ""), "db.rows": rows or 0},
+            error=None if error is None else f"{type(error).__name__}: {error}",
+        )
+
+        slow = seconds >= self.threshold
+        examined = None
+        if error is None and (self.rows_examined == "all" or (slow and self.rows_examined == "slow")):
+            examined = self._examined(cursor)
+            if examined is not None:
+                REGISTRY.inc("qwire_db_rows_examined_total", examined, **labels)
+        if not slow:
+            return
+
+        REGISTRY.inc("qwire_db_slow_queries_total", site=site)
+        if many:
+            params: Any = {"rows": len(args), "first": redact_params(args[0], self.redact) if args else None}
+        else:
+            params = redact_params(args, self.redact)
+        entry = {
+            "at": datetime.now(timezone.utc).isoformat(),
+            "statement": statement_id,
+            "sql": self._statements.get(statement_id, ""),
+            "site": site,
+            "ms": round(seconds * 1000, 3),
+            "rows": rows,
+            "rowsExamined": examined,
+            "params": params,
+        }
+        if error is not None:
+            entry["error"] = f"{type(error).__name__}: {error}"
+        logger.warning("slow query %.1fms site=%s statement=%s rows=%s", seconds * 1000, site, statement_id, rows)
+        with self._lock:
+            self._entries.append(entry)
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+
+    def _examined(self, cursor: "InstrumentedCursor") -> int | None:
+        # performance_schema keeps the last statements per thread; needs
+        # MySQL 8.0.16+ and SELECT on performance_schema. Unbuffered cursors
+        # still have rows pending on the connection, so they are skipped.
+        if cursor.unbuffered or self.rows_examined == "off":
+            return None
+        try:
+            with cursor.connection.cursor(Cursor) as lookup:
+                lookup.execute(_ROWS_EXAMINED_SQL)
+                row = lookup.fetchone()
+        except Exception as exc:
+            logger.warning("rows examined unavailable, disabling the lookup: %s", exc)
+            self.rows_examined = "off"
+            return None
+        return None if row is None else int(row[0])
+
+    def entries(self, limit: int | None = None) -> list[dict[str, Any]]:
+        with self._lock:
+            entries = list(self._entries)
+        entries.reverse()
+        return entries[:limit] if limit else entries
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class InstrumentedCursor:
+    def __init__(self, cursor, log: QueryLog, connection) -> None:
+        self._cursor = cursor
+        self._log = log
+        self.connection = connection
+        self.unbuffered = isinstance(cursor, SSCursor)
+        self.labels: dict[str, str] = {}
+
+    def execute(self, query, args=None):
+        site = call_site()
+        started = time.perf_counter()
+        error = None
+        try:
+            return self._cursor.execute(query, args)
+        except BaseException as exc:
+            error = exc
+            raise
+        finally:
+            self._log.record(self, query, args, time.perf_counter() - started, site, error=error)
+
+    def executemany(self, query, args):
+        site = call_site()
+        args = list(args)
+        started = time.perf_counter()
+        error = None
+        try:
+            return self._cursor.executemany(query, args)
+        except BaseException as exc:
+            error = exc
+            raise
+        finally:
+            self._log.record(self, query, args, time.perf_counter() - started, site, many=True, error=error)
+
+    # Unbuffered cursors only know their row count once rows are read.
+    def _returned(self, count: int) -> None:
+        if self.unbuffered and count and self.labels:
+            REGISTRY.inc("qwire_db_rows_returned_total", count, **self.labels)
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        self._returned(0 if row is None else 1)
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._cursor.fetchmany(size) if size is not None else self._cursor.fetchmany()
+        self._returned(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._returned(len(rows))
+        return rows
+
+    def __iter__(self):
+        count = 0
+        try:
+            for row in self._cursor:
+                count += 1
+                yield row
+        finally:
+            self._returned(count)
+
+    def __getattr__(self, name: str):
+        return getattr(self._cursor, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._cursor.close()
+
+
+class InstrumentedConnection:
+    def __init__(self, conn, log: QueryLog) -> None:
+        self._conn = conn
+        self._log = log
+
+    def cursor(self, cursor=None) -> InstrumentedCursor:
+        return InstrumentedCursor(self._conn.cursor(cursor), self._log, self._conn)
+
+    def __getattr__(self, name: str):
+        return getattr(self._conn, name)
+
+
+def _quantile(cumulative: list[tuple[float, float]], q: float) -> float:
+    # Linear interpolation inside the bucket, like Prometheus' histogram_quantile.
+    count = cumulative[-1][1] if cumulative else 0
+    if not count:
+        return 0.0
+    rank = q * count
+    lower_bound, lower_count = 0.0, 0.0
+    for bound, seen in cumulative:
+        if seen >= rank:
+            if bound == float("inf"):
+                return lower_bound
+            return lower_bound + (bound - lower_bound) * (rank - lower_count) / max(seen - lower_count, 1e-12)
+        lower_bound, lower_count = bound, seen
+    return lower_bound
+
+
+def statement_stats(fingerprints: dict[str, str]) -> list[dict[str, Any]]:
+    # One entry per (statement, call site), heaviest total time first.
+    stats = []
+    for labels, (cumulative, total, count) in REGISTRY.histogram_values(QUERY_SECONDS).items():
+        if not count:
+            continue
+        label_map = dict(labels)
+        stats.append(
+            {
+                "statement": label_map.get("statement"),
+                "site": label_map.get("site"),
+                "sql": fingerprints.get(label_map.get("statement", ""), ""),
+                "count": int(count),
+                "totalMs": round(total * 1000, 3),
+                "meanMs": round(total * 1000 / count, 3),
+                "p50Ms": round(_quantile(cumulative, 0.5) * 1000, 3),
+                "p95Ms": round(_quantile(cumulative, 0.95) * 1000, 3),
+                "p99Ms": round(_quantile(cumulative, 0.99) * 1000, 3),
+                "rowsReturned": int(REGISTRY.value("qwire_db_rows_returned_total", **label_map)),
+                "rowsAffected": int(REGISTRY.value("qwire_db_rows_affected_total", **label_map)),
+                "rowsExamined": int(REGISTRY.value("qwire_db_rows_examined_total", **label_map)),
+            }
+        )
+    stats.sort(key=lambda item: item["totalMs"], reverse=True)
+    return stats
+
+
+def connect_stats() -> dict[str, dict[str, Any]]:
+    stats = {}
+    for labels, (cumulative, total, count) in REGISTRY.histogram_values(CONNECT_SECONDS).items():
+        if count:
+            stats[dict(labels).get("target", "")] = {
+                "count": int(count),
+                "meanMs": round(total * 1000 / count, 3),
+                "p95Ms": round(_quantile(cumulative, 0.95) * 1000, 3),
+            }
+    return stats
@@ -0,0 +1,160 @@
+import asyncio
+import copy
+import random
+import threading
+from collections import deque
+from typing import Any, NamedTuple
+
+from qwire_mock.fault_injection import Latency, body_reference, buffer_body, send_json
+from qwire_mock.metrics import REGISTRY
+
+CALLBACK_PATHS = ("/callback", "/callbacks/batch")
+
+REGISTRY.describe("qwire_receiver_injected_total", "counter", "Callback receiver behaviors applied, by kind")
+
+
+class Step(NamedTuple):
+    status: int = 200
+    drop: bool = False
+    delay: float | None = None
+    retry_after: int | None = None
+
+
+def parse_step(value: Any) -> Step:
+    # Script steps are a status code, "ok", "drop", or a mapping with
+    # status / drop / delay_ms / retry_after_seconds.
+    if isinstance(value, dict):
+        delay_ms = value.get("delay_ms")
+        return Step(
+            status=int(value.get("status", 200)),
+            drop=bool(value.get("drop", False)),
+            delay=None if delay_ms is None else float(delay_ms) / 1000,
+            retry_after=value.get("retry_after_seconds"),
+        )
+    if isinstance(value, str) and value.lower() in ("ok", "drop"):
+        return Step(drop=value.lower() == "drop")
+    status = int(value)
+    if not 100 <= status <= 599:
+        raise ValueError(f"Invalid status in receiver script: {value}")
+    return Step(status=status)
+
+
+class ReceiverBehavior:
+    def __init__(self, config: dict[str, Any], rng: random.Random | None = None) -> None:
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self._defaults = copy.deepcopy(config)
+        self.configure(config)
+
+    def configure(self, config: dict[str, Any]) -> None:
+        latency = Latency(config.get("latency"), self._rng)
+        errors = [
+            (int(item["status"]), float(item["rate"]), item.get("retry_after_seconds"))
+            for item in config.get("errors") or ()
+        ]
+        drop_rate = float(config.get("drop_rate", 0))
+        scripts = {
+            str(reference).lower(): deque(parse_step(step) for step in steps)
+            for reference, steps in (config.get("scripts") or {}).items()
+        }
+        with self._lock:
+            self.config = copy.deepcopy(config)
+            self.latency = latency
+            self.errors = errors
+            self.drop_rate = drop_rate
+            self._scripts = scripts
+
+    def reset(self) -> None:
+        self.configure(self._defaults)
+
+    def set_script(self, reference: str, steps: list[Any]) -> None:
+        parsed = deque(parse_step(step) for step in steps)
+        with self._lock:
+            self._scripts[reference.lower()] = parsed
+
+    @property
+    def active(self) -> bool:
+        with self._lock:
+            return bool(
+                self.latency.distribution != "none" or self.errors or self.drop_rate > 0 or self._scripts
+            )
+
+    def describe(self) -> dict[str, Any]:
+        with self._lock:
+            remaining = {
+                reference: [step._asdict() for step in steps] for reference, steps in self._scripts.items()
+            }
+            return {**self.config, "remainingScripts": remaining}
+
+    def next_step(self, reference: str | None) -> Step:
+        with self._lock:
+            script = self._scripts.get(reference.lower()) if reference else None
+            if script:
+                step = script.popleft()
+                if not script:
+                    del self._scripts[reference.lower()]
+                return step
+            roll = self._rng.random()
+            if roll < self.drop_rate:
+                return Step(drop=True)
+            roll -= self.drop_rate
+            for status, rate, retry_after in self.errors:
+                if roll < rate:
+                    return Step(status=status, retry_after=retry_after)
+                roll -= rate
+            return Step()
+
+    def delay(self, step: Step) -> float:
+        if step.delay is not None:
+            return step.delay
+        with self._lock:
+            return self.latency.sample()
+
+
+async def _drop(send) -> None:
+    # Promise a body, send only part of it and return; the server then closes
+    # the connection, which the sender sees as a broken response.
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", b"64")],
+        }
+    )
+    await send({"type": "http.response.body", "body": b'{"mess', "more_body": True})
+
+
+class ReceiverBehaviorMiddleware:
+    def __init__(self, app, behavior: ReceiverBehavior) -> None:
+        self.app = app
+        self.behavior = behavior
+
+    async def __call__(self, scope, receive, send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "POST"
+            or scope["path"] not in CALLBACK_PATHS
+            or not self.behavior.active
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        body, receive = await buffer_body(receive)
+        step = self.behavior.next_step(body_reference(body))
+        delay = self.behavior.delay(step)
+        if delay > 0:
+            REGISTRY.inc("qwire_receiver_injected_total", kind="latency")
+            await asyncio.sleep(delay)
+
+        if step.drop:
+            REGISTRY.inc("qwire_receiver_injected_total", kind="drop")
+            await _drop(send)
+            return
+        if step.status != 200:
+            REGISTRY.inc("qwire_receiver_injected_total", kind=f"status_{step.status}")
+            headers = ()
+            if step.retry_after is not None:
+                headers = ((b"retry-after", str(step.retry_after).encode("ascii")),)
+            await send_json(send, step.status, {"message": f"Injected {step.status} response"}, headers)
+            return
+        await self.app(scope, receive, send)
@@ -0,0 +1,183 @@
+import heapq
+import json
+import logging
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+from uuid import uuid4
+
+from qwire_mock.capture import body_bytes
+
+logger = logging.getLogger(__name__)
+
+UUID_PATTERN = re.compile(rb"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}")
+VOLATILE_FIELDS = ("orderId", "orderDate")
+
+
+class ReferenceRewriter:
+    def __init__(self) -> None:
+        self._mapping: dict[bytes, bytes] = {}
+        self._lock = threading.Lock()
+
+    def _replace(self, match: re.Match) -> bytes:
+        original = match.group(0).lower()
+        with self._lock:
+            replacement = self._mapping.get(original)
+            if replacement is None:
+                replacement = self._mapping[original] = str(uuid4()).encode("ascii")
+        return replacement
+
+    def rewrite(self, data: bytes) -> bytes:
+        return UUID_PATTERN.sub(self._replace, data)
+
+
+def _read_file(path: Path, service: str | None) -> Iterator[dict[str, Any]]:
+    # Stop at the size seen on open so replaying into a capturing server does
+    # not feed its own requests back into the replay.
+    remaining = path.stat().st_size
+    with path.open("rb") as f:
+        for line in f:
+            remaining -= len(line)
+            if remaining < 0:
+                break
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if service is None or record.get("service") == service:
+                yield record
+
+
+def load_records(paths: Iterable[str], service: str | None = None) -> Iterator[dict[str, Any]]:
+    # Each capture file is already in arrival order; merge them so order and
+    # callback captures interleave by timestamp without loading everything.
+    files = [_read_file(Path(p), service) for p in sorted(paths)]
+    return heapq.merge(*files, key=lambda record: record["ts"])
+
+
+def _normalize(body: bytes) -> Any:
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return body
+    if isinstance(payload, dict):
+        for name in VOLATILE_FIELDS:
+            payload.pop(name, None)
+    return payload
+
+
+class ReplayStats:
+    def __init__(self) -> None:
+        self.sent = 0
+        self.matched = 0
+        self.mismatched = 0
+        self.errors = 0
+        self.skipped = 0
+        self.latencies_ms: list[float] = []
+        self._lock = threading.Lock()
+
+    def record(self, outcome: str, latency_ms: float | None = None) -> None:
+        with self._lock:
+            self.sent += 1
+            setattr(self, outcome, getattr(self, outcome) + 1)
+            if latency_ms is not None:
+                self.latencies_ms.append(latency_ms)
+
+    def summary(self) -> dict[str, Any]:
+        latencies = sorted(self.latencies_ms)
+
+        def _pct(p: float) -> float:
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] if latencies else 0.0
+
+        return {
+            "sent": self.sent,
+            "matched": self.matched,
+            "mismatched": self.mismatched,
+            "errors": self.errors,
+            "skipped": self.skipped,
+            "p50Ms": round(_pct(0.50), 3),
+            "p99Ms": round(_pct(0.99), 3),
+        }
+
+
+def _send(
+    record: dict[str, Any],
+    targets: dict[str, str],
+    rewriter: ReferenceRewriter | None,
+    timeout: float,
+    stats: ReplayStats,
+) -> None:
+    path = record["path"] + (f"?{record['query']}" if record.get("query") else "")
+    if record.get("requestTruncated"):
+        logger.warning("replay %s %s skipped: request body was truncated at capture", record["method"], path)
+        stats.record("skipped")
+        return
+    body = body_bytes(record, "request")
+    expected = body_bytes(record, "response")
+    if rewriter is not None:
+        path = rewriter.rewrite(path.encode("latin-1")).decode("latin-1")
+        body = rewriter.rewrite(body)
+        expected = rewriter.rewrite(expected)
+
+    request = urllib.request.Request(
+        targets[record["service"]].rstrip("/") + path,
+        data=body or None,
+        headers=record.get("headers", {}),
+        method=record["method"],
+    )
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            status, actual = response.status, response.read()
+    except urllib.error.HTTPError as exc:
+        status, actual = exc.code, exc.read()
+    except Exception as exc:
+        logger.warning("replay %s %s failed: %s", record["method"], path, exc)
+        stats.record("errors")
+        return
+    latency_ms = (time.perf_counter() - started) * 1000
+
+    # A truncated captured response can only be checked on its status.
+    body_matches = record.get("responseTruncated") or _normalize(actual) == _normalize(expected)
+    if status == record["status"] and body_matches:
+        stats.record("matched", latency_ms)
+    else:
+        logger.info(
+            "replay mismatch %s %s: status %s (captured %s)\n%s",
+            record["method"],
+            path,
+            status,
+            record["status"],
+            actual.decode("utf-8", errors="replace"),
+        )
+        stats.record("mismatched", latency_ms)
+
+
+def replay(
+    records: Iterable[dict[str, Any]],
+    targets: dict[str, str],
+    speed: float = 1.0,
+    rewrite_references: bool = True,
+    concurrency: int = 64,
+    timeout: float = 10.0,
+) -> dict[str, Any]:
+    stats = ReplayStats()
+    rewriter = ReferenceRewriter() if rewrite_references else None
+    first_ts = None
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="replay") as executor:
+        for record in records:
+            if first_ts is None:
+                first_ts = record["ts"]
+            if speed > 0:
+                delay = (record["ts"] - first_ts) / speed - (time.perf_counter() - started)
+                if delay > 0:
+                    time.sleep(delay)
+            executor.submit(_send, record, targets, rewriter, timeout, stats)
+    summary = stats.summary()
+    summary["elapsedSeconds"] = round(time.perf_counter() - started, 3)
+    return summary
@@ -0,0 +1,65 @@
+import itertools
+import logging
+import threading
+import time
+from typing import Any, Callable
+
+from qwire_mock.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+REGISTRY.describe("qwire_db_reads_total", "counter", "Stale-tolerant order reads, by serving target")
+REGISTRY.describe("qwire_db_replica_ejections_total", "counter", "Replicas ejected after repeated failures")
+
+
+class ReplicaPool:
+    # Round-robin over healthy replicas. A replica failing failure_threshold
+    # times in a row is skipped for eject_seconds, then tried again.
+    def __init__(
+        self,
+        replicas: list[dict[str, Any]],
+        failure_threshold: int = 3,
+        eject_seconds: float = 30,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.replicas = [dict(replica) for replica in replicas]
+        self.names = [f"{replica['host']}:{replica.get('port', 3306)}" for replica in self.replicas]
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.eject_seconds = float(eject_seconds)
+        self._clock = clock
+        self._failures = [0] * len(self.replicas)
+        self._ejected_until = [0.0] * len(self.replicas)
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+        REGISTRY.gauge_callback(
+            "qwire_db_replicas_healthy",
+            "Configured read replicas not currently ejected",
+            lambda: len(self.healthy()),
+        )
+
+    def healthy(self) -> list[int]:
+        now = self._clock()
+        with self._lock:
+            return [index for index, until in enumerate(self._ejected_until) if until <= now]
+
+    def candidates(self) -> list[int]:
+        # Healthy replicas in round-robin order, starting one further each call.
+        healthy = self.healthy()
+        if not healthy:
+            return []
+        start = next(self._next) % len(healthy)
+        return healthy[start:] + healthy[:start]
+
+    def record_success(self, index: int) -> None:
+        with self._lock:
+            self._failures[index] = 0
+
+    def record_failure(self, index: int, error: Exception) -> None:
+        with self._lock:
+            self._failures[index] += 1
+            if self._failures[index] < self.failure_threshold:
+                return
+            self._failures[index] = 0
+            self._ejected_until[index] = self._clock() + self.eject_seconds
+        REGISTRY.inc("qwire_db_replica_ejections_total", replica=self.names[index])
+        logger.warning("replica ejected for %.0fs: %s error=%s", self.eject_seconds, self.names[index], error)
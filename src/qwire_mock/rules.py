@@ -0,0 +1,194 @@
+from bisect import bisect_right
+from typing import Any, Iterable, NamedTuple
+
+# Rules compile to one bit each (bit i = i-th rule, lower bits win). Every
+# match dimension maps a request key to the bitmask of rules it satisfies, so
+# evaluation is a trie walk, a bisect and a few dict lookups plus bitwise ANDs,
+# whatever the number of rules.
+
+_MASK = ""
+
+
+class Outcome(NamedTuple):
+    fail_reason: str | None = None
+    suppress_callback: bool = False
+    callback_delay: float = 0.0
+    rules: tuple[str, ...] = ()
+
+
+NO_MATCH = Outcome()
+
+
+class Rule(NamedTuple):
+    name: str
+    bin_prefixes: tuple[str, ...]
+    amount_gte: float | None
+    amount_lt: float | None
+    currencies: tuple[str, ...]
+    product_ids: tuple[str, ...]
+    fail_reason: str | None
+    suppress_callback: bool
+    callback_delay: float
+
+
+def _values(value: Any) -> tuple[str, ...]:
+    if value is None:
+        return ()
+    if isinstance(value, (list, tuple)):
+        return tuple(str(item) for item in value)
+    return (str(value),)
+
+
+def parse_rule(index: int, config: dict[str, Any]) -> Rule:
+    match = config.get("match") or {}
+    action = config.get("action") or {}
+    unknown = set(match) - {"bin_prefix", "amount_gte", "amount_lt", "currency", "product_id"}
+    if unknown:
+        raise ValueError(f"Unknown match keys in rule {config.get('name', index)}: {sorted(unknown)}")
+    rule = Rule(
+        name=str(config.get("name") or f"rule-{index}"),
+        bin_prefixes=_values(match.get("bin_prefix")),
+        amount_gte=None if match.get("amount_gte") is None else float(match["amount_gte"]),
+        amount_lt=None if match.get("amount_lt") is None else float(match["amount_lt"]),
+        currencies=tuple(value.upper() for value in _values(match.get("currency"))),
+        product_ids=_values(match.get("product_id")),
+        fail_reason=action.get("fail_reason"),
+        suppress_callback=bool(action.get("suppress_callback", False)),
+        callback_delay=float(action.get("callback_delay_ms", 0)) / 1000,
+    )
+    if rule.fail_reason is None and not rule.suppress_callback and rule.callback_delay <= 0:
+        raise ValueError(f"Rule {rule.name} has no action")
+    return rule
+
+
+class _BinTrie:
+    def __init__(self) -> None:
+        self.root: dict[str, Any] = {}
+
+    def add(self, prefix: str, bit: int) -> None:
+        node = self.root
+        for digit in prefix:
+            node = node.setdefault(digit, {})
+        node[_MASK] = node.get(_MASK, 0) | bit
+
+    def match(self, card_number: str) -> int:
+        mask = self.root.get(_MASK, 0)
+        node = self.root
+        for digit in card_number:
+            node = node.get(digit)
+            if node is None:
+                break
+            mask |= node.get(_MASK, 0)
+        return mask
+
+
+class _AmountIndex:
+    # Boundaries split the amount axis into segments; each segment stores the
+    # mask of rules whose [amount_gte, amount_lt) band covers it.
+    def __init__(self, bands: list[tuple[float, float, int]]) -> None:
+        starts: dict[float, int] = {}
+        ends: dict[float, int] = {}
+        for low, high, bit in bands:
+            starts[low] = starts.get(low, 0) | bit
+            ends[high] = ends.get(high, 0) | bit
+        self.boundaries = sorted(set(starts) | set(ends))
+        self.masks: list[int] = []
+        mask = 0
+        for boundary in self.boundaries:
+            mask = (mask | starts.get(boundary, 0)) & ~ends.get(boundary, 0)
+            self.masks.append(mask)
+
+    def match(self, amount: float) -> int:
+        index = bisect_right(self.boundaries, amount) - 1
+        return self.masks[index] if index >= 0 else 0
+
+
+class RuleSet:
+    def __init__(self, rules: Iterable[Rule]) -> None:
+        self.rules = list(rules)
+        everything = (1 << len(self.rules)) - 1
+        self._bins = _BinTrie()
+        self._currencies: dict[str, int] = {}
+        self._products: dict[str, int] = {}
+        bands: list[tuple[float, float, int]] = []
+        constrained = {"bin": 0, "amount": 0, "currency": 0, "product": 0}
+
+        for index, rule in enumerate(self.rules):
+            bit = 1 << index
+            for prefix in rule.bin_prefixes:
+                self._bins.add(prefix, bit)
+            for currency in rule.currencies:
+                self._currencies[currency] = self._currencies.get(currency, 0) | bit
+            for product_id in rule.product_ids:
+                self._products[product_id] = self._products.get(product_id, 0) | bit
+            if rule.amount_gte is not None or rule.amount_lt is not None:
+                low = float("-inf") if rule.amount_gte is None else rule.amount_gte
+                high = float("inf") if rule.amount_lt is None else rule.amount_lt
+                bands.append((low, high, bit))
+                constrained["amount"] |= bit
+            if rule.bin_prefixes:
+                constrained["bin"] |= bit
+            if rule.currencies:
+                constrained["currency"] |= bit
+            if rule.product_ids:
+                constrained["product"] |= bit
+
+        self._amounts = _AmountIndex(bands)
+        # Rules that do not constrain a dimension always pass it.
+        self._any = {dimension: everything & ~mask for dimension, mask in constrained.items()}
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def match_mask(self, card_number: str, amount: float, currency: str, product_ids: Iterable[str]) -> int:
+        mask = self._any["bin"] | self._bins.match(card_number.strip())
+        if not mask:
+            return 0
+        mask &= self._any["amount"] | self._amounts.match(float(amount))
+        if not mask:
+            return 0
+        mask &= self._any["currency"] | self._currencies.get(currency.upper(), 0)
+        if not mask:
+            return 0
+        products = self._any["product"]
+        for product_id in product_ids:
+            products |= self._products.get(product_id, 0)
+        return mask & products
+
+    def evaluate(self, card_number: str, amount: float, currency: str, product_ids: Iterable[str] = ()) -> Outcome:
+        mask = self.match_mask(card_number, amount, currency, product_ids)
+        if not mask:
+            return NO_MATCH
+        # Walk matches in table order; the first rule setting an action wins it.
+        fail_reason = None
+        suppress = False
+        delay = 0.0
+        names = []
+        while mask:
+            bit = mask & -mask
+            mask ^= bit
+            rule = self.rules[bit.bit_length() - 1]
+            names.append(rule.name)
+            if fail_reason is None and rule.fail_reason is not None:
+                fail_reason = rule.fail_reason
+            suppress = suppress or rule.suppress_callback
+            if delay <= 0 < rule.callback_delay:
+                delay = rule.callback_delay
+        return Outcome(fail_reason, suppress, delay, tuple(names))
+
+
+def compile_rules(configs: Iterable[dict[str, Any]], callback_skip_amount_gte: float | None = None) -> RuleSet:
+    rules = [parse_rule(index, config) for index, config in enumerate(configs)]
+    if callback_skip_amount_gte is not None:
+        # order.callback_skip_amount_gte is kept as a built-in lowest-priority rule.
+        rules.append(
+            parse_rule(
+                len(rules),
+                {
+                    "name": "callback_skip_amount_gte",
+                    "match": {"amount_gte": callback_skip_amount_gte},
+                    "action": {"suppress_callback": True},
+                },
+            )
+        )
+    return RuleSet(rules)
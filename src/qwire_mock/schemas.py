@@ -49,6 +49,10 @@ class Received(BaseModel):
     message: str = "OK"
 
 
+class BatchReceived(Received):
+    count: int
+
+
 class CallbackRecord(BaseModel):
     reference: UUID
     receivedAt: datetime
@@ -59,3 +63,12 @@ class CallbackCheckResponse(BaseModel):
     reference: UUID
     total: int
     records: list[CallbackRecord]
+
+
+def mask_card(card_number: str) -> str:
+    value = (card_number or "").strip()
+    if len(value) >= 10:
+        return f"{value[:6]}{'*' * (len(value) - 10)}{value[-4:]}"
+    if len(value) >= 4:
+        return f"{value[:2]}{'*' * (len(value) - 4)}{value[-2:]}"
+    return "*" * len(value)
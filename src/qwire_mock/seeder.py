@@ -0,0 +1,171 @@
+import csv
+import logging
+import os
+import random
+import tempfile
+import time
+from typing import Iterator
+from uuid import UUID
+
+from qwire_mock import order_db
+
+logger = logging.getLogger(__name__)
+
+ORDER_COLUMNS = (
+    "id, reference, order_id, name, callback_url, card_number, amount, currency, status, fail_reason, "
+    "product_count, product_pending, created_at"
+)
+PRODUCT_COLUMNS = "order_id, product_id, count, spec, status"
+DEFERRED_INDEXES = {
+    "idx_v2_orders_status_created": "status, created_at",
+    "idx_v2_orders_status_pending": "status, product_pending",
+}
+PRODUCT_STATUS = {"SUCCESS": "PROCESSING", "COMPLETED": "DELIVERED", "FAIL": "FAIL"}
+
+
+def parse_mix(value: str) -> dict[str, float]:
+    mix: dict[str, float] = {}
+    for part in value.split(","):
+        status, _, weight = part.partition("=")
+        status = status.strip().upper()
+        if status not in PRODUCT_STATUS:
+            raise ValueError(f"Unknown order status in mix: {status}")
+        mix[status] = float(weight)
+    if sum(mix.values()) <= 0:
+        raise ValueError("Status mix weights must add up to a positive number")
+    return mix
+
+
+def _generate(
+    start_id: int,
+    count: int,
+    products_per_order: int,
+    mix: dict[str, float],
+    max_age_seconds: int,
+    rng: random.Random,
+) -> Iterator[tuple[tuple, list[tuple]]]:
+    statuses = list(mix)
+    weights = [mix[status] for status in statuses]
+    callback_url = "http://127.0.0.1:8100/callback"
+    for row_id in range(start_id, start_id + count):
+        status = rng.choices(statuses, weights)[0]
+        reference = UUID(int=rng.getrandbits(128), version=4)
+        pending = 0 if status == "COMPLETED" else products_per_order
+        order = (
+            row_id,
+            order_db.reference_param(reference),
+            f"PX{row_id}",
+            f"Seed Order {row_id}",
+            callback_url,
+            "555555******4444",
+            round(rng.uniform(1, 999), 2),
+            "USD",
+            status,
+            "Unsupported card type" if status == "FAIL" else None,
+            products_per_order,
+            pending,
+            rng.randint(0, max_age_seconds),
+        )
+        products = [
+            (row_id, f"SEED-{index:02d}", rng.randint(1, 5), "M", PRODUCT_STATUS[status])
+            for index in range(products_per_order)
+        ]
+        yield order, products
+
+
+def _insert_batch(cursor, orders: list[tuple], products: list[tuple]) -> None:
+    order_values = ", ".join(["(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW() - INTERVAL %s SECOND)"] * len(orders))
+    cursor.execute(
+        f"INSERT INTO v2_orders ({ORDER_COLUMNS}) VALUES {order_values}",
+        [value for row in orders for value in row],
+    )
+    if products:
+        product_values = ", ".join(["(%s, %s, %s, %s, %s)"] * len(products))
+        cursor.execute(
+            f"INSERT INTO v2_order_products ({PRODUCT_COLUMNS}) VALUES {product_values}",
+            [value for row in products for value in row],
+        )
+
+
+def _load_batch(cursor, orders: list[tuple], products: list[tuple]) -> None:
+    compact = order_db.schema_mode() == "compact"
+    with tempfile.TemporaryDirectory(prefix="qwire-seed-") as tmp:
+        orders_path = os.path.join(tmp, "orders.csv")
+        products_path = os.path.join(tmp, "products.csv")
+        with open(orders_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f, lineterminator="\n")
+            for row in orders:
+                reference = row[1].hex() if compact else row[1]
+                writer.writerow([row[0], reference, *["\\N" if value is None else value for value in row[2:]]])
+        with open(products_path, "w", newline="", encoding="utf-8") as f:
+            csv.writer(f, lineterminator="\n").writerows(products)
+
+        reference_expr = "UNHEX(@reference)" if compact else "@reference"
+        cursor.execute(
+            f"""
+            LOAD DATA LOCAL INFILE %s INTO TABLE v2_orders
+            FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"' ESCAPED BY ''
+            LINES TERMINATED BY '\\n'
+            (id, @reference, order_id, name, callback_url, card_number, amount, currency, status, @fail_reason,
+             product_count, product_pending, @age)
+            SET reference = {reference_expr},
+                fail_reason = NULLIF(@fail_reason, '\\\\N'),
+                created_at = NOW() - INTERVAL @age SECOND
+            """,
+            (orders_path,),
+        )
+        cursor.execute(
+            f"""
+            LOAD DATA LOCAL INFILE %s INTO TABLE v2_order_products
+            FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"'
+            LINES TERMINATED BY '\\n'
+            ({PRODUCT_COLUMNS})
+            """,
+            (products_path,),
+        )
+
+
+def seed_orders(
+    count: int,
+    products_per_order: int = 2,
+    mix: dict[str, float] | None = None,
+    max_age_seconds: int = 120,
+    batch_size: int = 2000,
+    method: str = "insert",
+    defer_indexes: bool = True,
+    random_seed: int | None = None,
+) -> int:
+    mix = mix or {"SUCCESS": 0.7, "COMPLETED": 0.2, "FAIL": 0.1}
+    rng = random.Random(random_seed)
+    load = _load_batch if method == "load-data" else _insert_batch
+    order_db.init_db()
+    started = time.perf_counter()
+    seeded = 0
+    deferred = DEFERRED_INDEXES if defer_indexes else None
+    with order_db.bulk_load(deferred, local_infile=method == "load-data") as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT COALESCE(MAX(id), 0) + 1 AS next_id FROM v2_orders")
+            next_id = int(cursor.fetchone()["next_id"])
+
+            orders: list[tuple] = []
+            products: list[tuple] = []
+            for order, order_products in _generate(next_id, count, products_per_order, mix, max_age_seconds, rng):
+                orders.append(order)
+                products.extend(order_products)
+                if len(orders) >= batch_size:
+                    load(cursor, orders, products)
+                    conn.commit()
+                    seeded += len(orders)
+                    orders, products = [], []
+                    elapsed = time.perf_counter() - started
+                    logger.info("seed progress: %s/%s orders (%.0f orders/s)", seeded, count, seeded / elapsed)
+            if orders:
+                load(cursor, orders, products)
+                conn.commit()
+                seeded += len(orders)
+        if defer_indexes:
+            logger.info("seed: rebuilding secondary indexes")
+
+    elapsed = time.perf_counter() - started
+    logger.info("seed finished: %s orders in %.1fs (%.0f orders/s)", seeded, elapsed, seeded / max(elapsed, 1e-9))
+    return seeded
@@ -0,0 +1,69 @@
+import json
+from datetime import datetime
+from typing import Any
+
+from pydantic import BaseModel
+from starlette.responses import Response
+
+from qwire_mock.config import load_config
+
+try:
+    import orjson
+except ImportError:  # optional fast JSON backend
+    orjson = None
+
+PRETTY_JSON_LOGS = bool(load_config()["logging"].get("pretty_json", True))
+
+
+def dumps(payload: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload, default=str)
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def model_bytes(model: BaseModel, **extra: Any) -> bytes:
+    # Serialize straight to JSON bytes in pydantic-core; no intermediate dict.
+    body = model.__pydantic_serializer__.to_json(model, exclude_none=True)
+    if not extra:
+        return body
+    suffix = b",".join(dumps(key) + b":" + dumps(value) for key, value in extra.items())
+    if body == b"{}":
+        return b"{" + suffix + b"}"
+    return body[:-1] + b"," + suffix + b"}"
+
+
+def _isoformat(value: datetime) -> str:
+    text = value.isoformat()
+    return text[:-6] + "Z" if text.endswith("+00:00") else text
+
+
+def record_bytes(record: Any, **extra: Any) -> bytes:
+    # Same JSON as model_bytes() on the matching pydantic model, built from a
+    # tuple record without constructing the model.
+    payload = record._asdict()
+    payload["reference"] = str(record.reference)
+    payload["orderDate"] = _isoformat(record.orderDate)
+    payload["products"] = [product._asdict() for product in record.products]
+    if payload.get("fail_reason") is None:
+        payload.pop("fail_reason", None)
+    payload.update(extra)
+    return dumps(payload)
+
+
+def order_bytes(order: Any, **extra: Any) -> bytes:
+    if isinstance(order, BaseModel):
+        return model_bytes(order, **extra)
+    return record_bytes(order, **extra)
+
+
+def log_text(body: bytes) -> str:
+    if not PRETTY_JSON_LOGS:
+        return body.decode("utf-8", errors="replace")
+    try:
+        return json.dumps(json.loads(body), ensure_ascii=False, indent=2, default=str)
+    except ValueError:
+        return body.decode("utf-8", errors="replace")
+
+
+def json_response(body: bytes, status_code: int = 200) -> Response:
+    return Response(content=body, status_code=status_code, media_type="application/json")
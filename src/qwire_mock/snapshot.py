@@ -0,0 +1,186 @@
+import gzip
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Iterable, Iterator
+
+from pymysql.cursors import SSCursor
+
+from qwire_mock import order_db
+from qwire_mock.config import load_config
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+ORDER_COLUMNS = (
+    "id, reference, order_id, name, callback_url, card_number, amount, currency, status, fail_reason, "
+    "product_count, product_pending, request_hash, created_at, response_status, response_body"
+)
+PRODUCT_COLUMNS = "id, order_id, product_id, count, spec, status"
+ORDER_ROW_FIELDS = 17
+
+# Rows are stored as JSON arrays tagged by kind. References are stored as UUID
+# text and created_at as an age in seconds, so a snapshot restores into either
+# schema mode and orders land in the same scheduler phase they were dumped in.
+ORDER_ROW = "o"
+PRODUCT_ROW = "p"
+DEAD_LETTER_ROW = "d"
+
+
+def _dead_letter_path() -> str | None:
+    return load_config()["callback_sender"]["dead_letter"].get("file") or None
+
+
+def _read_dead_letters(path: str | None) -> Iterator[dict[str, Any]]:
+    if not path or not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _stream(conn, sql: str) -> Iterator[tuple]:
+    with conn.cursor(SSCursor) as cursor:
+        cursor.execute(sql)
+        yield from cursor
+
+
+def write_snapshot(path: str, header: dict[str, Any], rows: Iterable[list]) -> dict[str, int]:
+    counts = {ORDER_ROW: 0, PRODUCT_ROW: 0, DEAD_LETTER_ROW: 0}
+    with gzip.open(path, "wb", compresslevel=1) as f:
+        f.write(json.dumps(header, separators=(",", ":")).encode("utf-8") + b"\n")
+        for row in rows:
+            counts[row[0]] += 1
+            line = json.dumps(row, ensure_ascii=False, separators=(",", ":"), default=str)
+            f.write(line.encode("utf-8") + b"\n")
+    return counts
+
+
+def read_snapshot(path: str) -> tuple[dict[str, Any], Iterator[list]]:
+    f = gzip.open(path, "rb")
+    header = json.loads(f.readline())
+    if header.get("version") != SNAPSHOT_VERSION:
+        f.close()
+        raise ValueError(f"Unsupported snapshot version in {path}: {header.get('version')}")
+
+    def _rows() -> Iterator[list]:
+        with f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    return header, _rows()
+
+
+def dump_snapshot(path: str, dead_letter_path: str | None = None) -> dict[str, int]:
+    dead_letter_path = dead_letter_path or _dead_letter_path()
+    started = time.perf_counter()
+    # One consistent read view for both tables.
+    with order_db.consistent_read() as conn:
+
+        def _rows() -> Iterator[list]:
+            for row in _stream(
+                conn,
+                """
+                SELECT id, reference, order_id, name, callback_url, card_number, amount, currency, status,
+                       fail_reason, product_count, product_pending, HEX(request_hash),
+                       GREATEST(TIMESTAMPDIFF(SECOND, created_at, NOW()), 0),
+                       response_status, CONVERT(response_body USING utf8mb4)
+                FROM v2_orders ORDER BY id
+                """,
+            ):
+                yield [ORDER_ROW, row[0], str(order_db.reference_value(row[1])), *row[2:]]
+            for row in _stream(conn, f"SELECT {PRODUCT_COLUMNS} FROM v2_order_products ORDER BY id"):
+                yield [PRODUCT_ROW, *row]
+            for record in _read_dead_letters(dead_letter_path):
+                yield [DEAD_LETTER_ROW, record]
+
+        header = {
+            "version": SNAPSHOT_VERSION,
+            "takenAt": datetime.now(timezone.utc).isoformat(),
+            "schemaMode": order_db.schema_mode(),
+        }
+        counts = write_snapshot(path, header, _rows())
+
+    logger.info(
+        "snapshot written to %s: orders=%s products=%s dead_letters=%s in %.2fs",
+        path,
+        counts[ORDER_ROW],
+        counts[PRODUCT_ROW],
+        counts[DEAD_LETTER_ROW],
+        time.perf_counter() - started,
+    )
+    return counts
+
+
+def _insert_orders(cursor, rows: list[list]) -> None:
+    placeholders = "(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, UNHEX(%s), NOW() - INTERVAL %s SECOND, %s, %s)"
+    values = ", ".join([placeholders] * len(rows))
+    params: list[Any] = []
+    for row in rows:
+        # Rows dumped before responses were stored end at the age column.
+        params.extend((row[1], order_db.reference_param(row[2]), *row[3:], *[None] * (ORDER_ROW_FIELDS - len(row))))
+    cursor.execute(f"INSERT INTO v2_orders ({ORDER_COLUMNS}) VALUES {values}", params)
+
+
+def _insert_products(cursor, rows: list[list]) -> None:
+    values = ", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(rows))
+    cursor.execute(
+        f"INSERT INTO v2_order_products ({PRODUCT_COLUMNS}) VALUES {values}",
+        [value for row in rows for value in row[1:]],
+    )
+
+
+def restore_snapshot(
+    path: str,
+    batch_size: int = 5000,
+    replace: bool = True,
+    dead_letter_path: str | None = None,
+) -> dict[str, int]:
+    dead_letter_path = dead_letter_path or _dead_letter_path()
+    header, rows = read_snapshot(path)
+    order_db.init_db()
+    started = time.perf_counter()
+    counts = {ORDER_ROW: 0, PRODUCT_ROW: 0, DEAD_LETTER_ROW: 0}
+    pending: dict[str, list[list]] = {ORDER_ROW: [], PRODUCT_ROW: []}
+    inserters = {ORDER_ROW: _insert_orders, PRODUCT_ROW: _insert_products}
+    dead_letters: list[str] = []
+    # Snapshot rows are already consistent, so key checks stay off for the load.
+    with order_db.bulk_load() as conn:
+        with conn.cursor() as cursor:
+            if replace:
+                cursor.execute("TRUNCATE TABLE v2_order_products")
+                cursor.execute("TRUNCATE TABLE v2_orders")
+            for row in rows:
+                kind = row[0]
+                counts[kind] += 1
+                if kind == DEAD_LETTER_ROW:
+                    dead_letters.append(json.dumps(row[1], ensure_ascii=False, default=str))
+                    continue
+                batch = pending[kind]
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    inserters[kind](cursor, batch)
+                    batch.clear()
+            for kind, batch in pending.items():
+                if batch:
+                    inserters[kind](cursor, batch)
+        conn.commit()
+
+    if dead_letter_path and (replace or dead_letters):
+        with open(dead_letter_path, "w" if replace else "a", encoding="utf-8") as f:
+            f.writelines(line + "\n" for line in dead_letters)
+
+    logger.info(
+        "snapshot %s (taken %s) restored: orders=%s products=%s dead_letters=%s in %.2fs",
+        path,
+        header.get("takenAt"),
+        counts[ORDER_ROW],
+        counts[PRODUCT_ROW],
+        counts[DEAD_LETTER_ROW],
+        time.perf_counter() - started,
+    )
+    return counts
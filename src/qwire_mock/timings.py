@@ -0,0 +1,178 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Any, Callable, Iterator
+
+from qwire_mock.metrics import REGISTRY
+
+REGISTRY.describe("qwire_slow_requests_total", "counter", "Requests and scheduler ticks over the slow threshold")
+
+
+class RequestTimings:
+    __slots__ = ("kind", "name", "started", "phases", "labels")
+
+    def __init__(self, kind: str, name: str) -> None:
+        self.kind = kind
+        self.name = name
+        self.started = time.perf_counter()
+        # name -> [count, total seconds, max seconds]
+        self.phases: dict[str, list] = {}
+        self.labels: dict[str, Any] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        entry = self.phases.get(name)
+        if entry is None:
+            self.phases[name] = [1, seconds, seconds]
+            return
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] = max(entry[2], seconds)
+
+
+_current: ContextVar[RequestTimings | None] = ContextVar("qwire_request_timings", default=None)
+
+
+class SlowRing:
+    def __init__(self, threshold_ms: float, size: int) -> None:
+        self.threshold = float(threshold_ms) / 1000
+        self._entries: deque[dict[str, Any]] = deque(maxlen=max(1, int(size)))
+        self._lock = threading.Lock()
+
+    def offer(self, timings: RequestTimings, **fields: Any) -> None:
+        total = time.perf_counter() - timings.started
+        if total < self.threshold:
+            return
+        REGISTRY.inc("qwire_slow_requests_total", kind=timings.kind)
+        entry = {
+            "kind": timings.kind,
+            "name": timings.name,
+            "finishedAt": datetime.now(timezone.utc).isoformat(),
+            "totalMs": round(total * 1000, 3),
+            **fields,
+            **timings.labels,
+            "phases": [
+                {"name": name, "count": count, "totalMs": round(spent * 1000, 3), "maxMs": round(worst * 1000, 3)}
+                for name, (count, spent, worst) in timings.phases.items()
+            ],
+        }
+        with self._lock:
+            self._entries.append(entry)
+
+    def entries(self, limit: int | None = None) -> list[dict[str, Any]]:
+        with self._lock:
+            entries = list(self._entries)
+        entries.reverse()
+        return entries[:limit] if limit else entries
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# Replaced by configure(); a zero threshold disables capture.
+RING = SlowRing(0, 1)
+_enabled = False
+
+
+def configure(config: dict[str, Any]) -> None:
+    global RING, _enabled
+    RING = SlowRing(config.get("slow_request_ms", 0), config.get("ring_size", 200))
+    _enabled = float(config.get("slow_request_ms", 0)) > 0
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+
+def timed(name: str) -> Callable:
+    # Records each call as a phase of the current request; a single
+    # ContextVar lookup when nothing is being timed.
+    def decorate(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            timings = _current.get()
+            if timings is None:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timings.add(name, time.perf_counter() - started)
+
+        return wrapper
+
+    return decorate
+
+
+def since_start(name: str) -> None:
+    # Time from the start of the request up to now, e.g. body parsing and
+    # validation before the handler runs.
+    timings = _current.get()
+    if timings is not None:
+        timings.add(name, time.perf_counter() - timings.started)
+
+
+def label(**labels: Any) -> None:
+    timings = _current.get()
+    if timings is not None:
+        timings.labels.update(labels)
+
+
+@contextmanager
+def track(kind: str, name: str) -> Iterator[None]:
+    # Times a unit of background work (a scheduler tick) like a request.
+    if not _enabled:
+        yield
+        return
+    timings = RequestTimings(kind, name)
+    token = _current.set(timings)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+        RING.offer(timings)
+
+
+class TimingMiddleware:
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not _enabled:
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings("request", f"{scope['method']} {scope['path']}")
+        token = _current.set(timings)
+        status = {"code": 0}
+
+        async def timed_send(message) -> None:
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            _current.reset(token)
+            RING.offer(timings, status=status["code"])
+
+
+def install(app, config: dict[str, Any]) -> None:
+    configure(config)
+    if not _enabled:
+        return
+    app.add_middleware(TimingMiddleware)
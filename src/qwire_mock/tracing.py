@@ -0,0 +1,472 @@
+import json
+import logging
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Iterator, NamedTuple
+
+from qwire_mock.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# OTLP span kinds
+INTERNAL = 1
+SERVER = 2
+CLIENT = 3
+
+EXEMPT_PATHS = ("/metrics",)
+_TRACEPARENT = re.compile(r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})")
+
+REGISTRY.describe("qwire_trace_spans_exported_total", "counter", "Spans handed to the trace exporter")
+REGISTRY.describe("qwire_trace_spans_dropped_total", "counter", "Spans dropped because the export queue was full")
+REGISTRY.describe("qwire_trace_export_errors_total", "counter", "Failed trace export batches")
+
+
+class SpanContext(NamedTuple):
+    trace_id: str
+    span_id: str
+    sampled: bool
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+
+def parse_traceparent(value: str | bytes | None) -> SpanContext | None:
+    # W3C Trace Context; unknown versions are read as version 00, invalid
+    # headers start a new trace.
+    if not value:
+        return None
+    if isinstance(value, bytes):
+        value = value.decode("latin-1")
+    match = _TRACEPARENT.match(value.strip().lower())
+    if match is None:
+        return None
+    version, trace_id, span_id, flags = match.groups()
+    if version == "ff" or trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return SpanContext(trace_id, span_id, bool(int(flags, 16) & 1))
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits) or 1:0{bits // 4}x}"
+
+
+class Span:
+    recording = True
+
+    def __init__(
+        self,
+        name: str,
+        context: SpanContext,
+        parent_id: str | None,
+        kind: int,
+        service: str,
+        attributes: dict[str, Any] | None = None,
+        links: tuple[SpanContext, ...] = (),
+        start_ns: int | None = None,
+    ) -> None:
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.kind = kind
+        self.service = service
+        self.attributes = dict(attributes or {})
+        self.links = links
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns = 0
+        self.error: str | None = None
+
+    @property
+    def traceparent(self) -> str:
+        return self.context.traceparent
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_error(self, message: str) -> None:
+        self.error = message
+
+    def end(self, end_ns: int | None = None) -> None:
+        if self.end_ns:
+            return
+        self.end_ns = end_ns or time.time_ns()
+        tracer = _tracer
+        if tracer is not None:
+            tracer.processor.on_end(self)
+
+    def to_otlp(self) -> dict[str, Any]:
+        span = {
+            "traceId": self.context.trace_id,
+            "spanId": self.context.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(key, value) for key, value in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error is not None else {"code": 0},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.links:
+            span["links"] = [{"traceId": link.trace_id, "spanId": link.span_id} for link in self.links]
+        return span
+
+
+class NonRecordingSpan:
+    # Carries ids for propagation through unsampled (or untraced) work;
+    # everything else is a no-op.
+    recording = False
+
+    def __init__(self, context: SpanContext | None, service: str = "") -> None:
+        self.context = context
+        self.service = service
+
+    @property
+    def traceparent(self) -> str | None:
+        return None if self.context is None else self.context.traceparent
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_error(self, message: str) -> None:
+        pass
+
+    def end(self, end_ns: int | None = None) -> None:
+        pass
+
+
+NOOP_SPAN = NonRecordingSpan(None)
+
+
+def _otlp_attribute(key: str, value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+def otlp_request(spans: list[Span]) -> dict[str, Any]:
+    # One ExportTraceServiceRequest (OTLP/JSON), spans grouped by service.
+    by_service: dict[str, list[dict[str, Any]]] = {}
+    for span in spans:
+        by_service.setdefault(span.service, []).append(span.to_otlp())
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": [_otlp_attribute("service.name", service)]},
+                "scopeSpans": [{"scope": {"name": "qwire_mock"}, "spans": service_spans}],
+            }
+            for service, service_spans in by_service.items()
+        ]
+    }
+
+
+class FileExporter:
+    # One OTLP/JSON request per line, the format the OpenTelemetry
+    # collector's otlpjsonfile receiver reads.
+    def __init__(self, path: str) -> None:
+        self.path = Path(path)
+
+    def export(self, spans: list[Span]) -> None:
+        line = json.dumps(otlp_request(spans), ensure_ascii=False, separators=(",", ":"))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+class OtlpHttpExporter:
+    def __init__(self, endpoint: str, timeout: float = 5.0) -> None:
+        self.endpoint = endpoint
+        self.timeout = timeout
+
+    def export(self, spans: list[Span]) -> None:
+        body = json.dumps(otlp_request(spans), separators=(",", ":")).encode("utf-8")
+        request = urllib.request.Request(
+            self.endpoint, data=body, headers={"Content-Type": "application/json"}, method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class BatchProcessor:
+    # Ended spans go on a bounded queue and are exported in batches from a
+    # background thread; request threads never wait on the exporter.
+    def __init__(self, exporter, batch_size: int = 512, flush_seconds: float = 2.0, queue_size: int = 10000) -> None:
+        self.exporter = exporter
+        self.batch_size = max(1, int(batch_size))
+        self.flush_seconds = float(flush_seconds)
+        self._queue: queue.Queue[Span] = queue.Queue(maxsize=max(1, int(queue_size)))
+        self._export_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="qwire-trace-export", daemon=True)
+        self._thread.start()
+
+    def on_end(self, span: Span) -> None:
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            REGISTRY.inc("qwire_trace_spans_dropped_total")
+
+    def flush(self) -> None:
+        while True:
+            batch = self._drain()
+            if not batch:
+                break
+            self._export(batch)
+        # Wait for a batch the export thread may still be sending.
+        self._queue.join()
+
+    def _drain(self, first: Span | None = None) -> list[Span]:
+        batch = [] if first is None else [first]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _export(self, batch: list[Span]) -> None:
+        with self._export_lock:
+            try:
+                self.exporter.export(batch)
+                REGISTRY.inc("qwire_trace_spans_exported_total", len(batch))
+            except Exception as exc:
+                REGISTRY.inc("qwire_trace_export_errors_total")
+                logger.warning("trace export of %s spans failed: %s", len(batch), exc)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                first = self._queue.get(timeout=self.flush_seconds)
+            except queue.Empty:
+                continue
+            self._export(self._drain(first))
+
+
+class Tracer:
+    def __init__(self, config: dict[str, Any], exporter=None) -> None:
+        self.sample_ratio = float(config.get("sample_ratio", 0.01))
+        if exporter is None:
+            exporter_name = config.get("exporter", "file")
+            if exporter_name == "otlp":
+                exporter = OtlpHttpExporter(config["otlp_endpoint"])
+            elif exporter_name == "file":
+                exporter = FileExporter(config.get("file") or "traces/traces.jsonl")
+            else:
+                raise ValueError(f"Unsupported tracing.exporter: {exporter_name}")
+        self.processor = BatchProcessor(
+            exporter,
+            batch_size=config.get("batch_size", 512),
+            flush_seconds=config.get("flush_seconds", 2),
+            queue_size=config.get("queue_size", 10000),
+        )
+        self._links: OrderedDict[str, SpanContext] = OrderedDict()
+        self._link_cache_size = max(0, int(config.get("link_cache_size", 10000)))
+        self._lock = threading.Lock()
+
+    def start_span(
+        self,
+        name: str,
+        kind: int,
+        parent: SpanContext | None,
+        service: str,
+        attributes: dict[str, Any] | None = None,
+        links: tuple[SpanContext, ...] = (),
+    ) -> Span | NonRecordingSpan:
+        # Parent-based sampling: a remote or local parent decides, a root
+        # span samples sample_ratio. A span linked to a sampled trace is
+        # recorded anyway, as the root of a new trace, so the work an order
+        # causes later can always be found from the order.
+        if parent is not None and links:
+            links = tuple(link for link in links if link.trace_id != parent.trace_id)
+        if parent is not None and (parent.sampled or not links):
+            trace_id, parent_id, sampled = parent.trace_id, parent.span_id, parent.sampled
+        else:
+            trace_id, parent_id = _new_id(128), None
+            sampled = bool(links) or random.random() < self.sample_ratio
+        context = SpanContext(trace_id, _new_id(64), sampled)
+        if not sampled:
+            return NonRecordingSpan(context, service)
+        return Span(name, context, parent_id, kind, service, attributes, links)
+
+    def remember(self, key: str, context: SpanContext) -> None:
+        if not self._link_cache_size:
+            return
+        with self._lock:
+            self._links[key] = context
+            self._links.move_to_end(key)
+            while len(self._links) > self._link_cache_size:
+                self._links.popitem(last=False)
+
+    def linked(self, key: str) -> tuple[SpanContext, ...]:
+        with self._lock:
+            context = self._links.get(key)
+        return () if context is None else (context,)
+
+
+_tracer: Tracer | None = None
+_tracer_key: str | None = None
+_configure_lock = threading.Lock()
+_current: ContextVar[Span | NonRecordingSpan | None] = ContextVar("qwire_span", default=None)
+
+
+def configure(config: dict[str, Any], exporter=None) -> Tracer | None:
+    # Both services share one tracer when they run in one process.
+    global _tracer, _tracer_key
+    with _configure_lock:
+        if not config.get("enabled", False):
+            _tracer, _tracer_key = None, None
+            return None
+        key = repr(config)
+        if _tracer is None or _tracer_key != key or exporter is not None:
+            _tracer, _tracer_key = Tracer(config, exporter), key
+        return _tracer
+
+
+def flush() -> None:
+    tracer = _tracer
+    if tracer is not None:
+        tracer.processor.flush()
+
+
+def current() -> Span | NonRecordingSpan | None:
+    return _current.get()
+
+
+def current_context() -> SpanContext | None:
+    active = _current.get()
+    return None if active is None else active.context
+
+
+@contextmanager
+def span(
+    name: str,
+    kind: int = INTERNAL,
+    parent: SpanContext | None = None,
+    service: str | None = None,
+    attributes: dict[str, Any] | None = None,
+    links: tuple[SpanContext, ...] = (),
+) -> Iterator[Span | NonRecordingSpan]:
+    tracer = _tracer
+    if tracer is None:
+        yield NOOP_SPAN
+        return
+    active = _current.get()
+    if parent is None and active is not None:
+        parent = active.context
+    if service is None:
+        service = active.service if active is not None else "qwire-mock"
+    started = tracer.start_span(name, kind, parent, service, attributes, links)
+    token = _current.set(started)
+    try:
+        yield started
+    except BaseException as exc:
+        started.set_error(f"{type(exc).__name__}: {exc}")
+        raise
+    finally:
+        _current.reset(token)
+        started.end()
+
+
+def record(name: str, seconds: float, attributes: dict[str, Any], kind: int = CLIENT, error: str | None = None) -> None:
+    # A finished child span of the current one, for work timed elsewhere
+    # (database statements). Nothing happens outside a sampled trace.
+    active = _current.get()
+    if active is None or not active.recording or _tracer is None:
+        return
+    end_ns = time.time_ns()
+    child = Span(
+        name,
+        SpanContext(active.context.trace_id, _new_id(64), True),
+        active.context.span_id,
+        kind,
+        active.service,
+        attributes,
+        start_ns=end_ns - int(seconds * 1e9),
+    )
+    if error is not None:
+        child.set_error(error)
+    child.end(end_ns)
+
+
+def set_attribute(key: str, value: Any) -> None:
+    active = _current.get()
+    if active is not None:
+        active.set_attribute(key, value)
+
+
+def inject(headers: dict[str, str]) -> dict[str, str]:
+    active = _current.get()
+    if active is not None and active.context is not None:
+        headers["traceparent"] = active.traceparent
+    return headers
+
+
+def remember(key: str) -> None:
+    # Keeps the current trace for key (an order reference), so later spans
+    # about the same order can link back to it.
+    tracer = _tracer
+    active = _current.get()
+    if tracer is not None and active is not None and active.recording:
+        tracer.remember(key, active.context)
+
+
+def linked(key: str) -> tuple[SpanContext, ...]:
+    tracer = _tracer
+    return () if tracer is None else tracer.linked(key)
+
+
+class TracingMiddleware:
+    def __init__(self, app, service: str) -> None:
+        self.app = app
+        self.service = service
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or _tracer is None or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        parent = None
+        for key, value in scope.get("headers", []):
+            if key.lower() == b"traceparent":
+                parent = parse_traceparent(value)
+                break
+        attributes = {"http.method": scope["method"], "http.target": scope["path"]}
+        with span(f"{scope['method']} {scope['path']}", SERVER, parent, self.service, attributes) as server_span:
+            traceresponse = server_span.traceparent
+
+            async def traced_send(message) -> None:
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    server_span.set_attribute("http.status_code", status)
+                    if status >= 500:
+                        server_span.set_error(f"HTTP {status}")
+                    if traceresponse is not None:
+                        message = {
+                            **message,
+                            "headers": [*message.get("headers", []), (b"traceresponse", traceresponse.encode("ascii"))],
+                        }
+                await send(message)
+
+            await self.app(scope, receive, traced_send)
+
+
+def install(app, config: dict[str, Any], service: str) -> None:
+    if configure(config) is None:
+        return
+    app.add_middleware(TracingMiddleware, service=service)
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 import pytest
@@ -21,6 +22,49 @@ def record_order_keyword(request: pytest.FixtureRequest):
     return _record
 
 
+@pytest.fixture(scope="session")
+def worker_database() -> str:
+    # Under pytest-xdist every worker gets its own schema, created once per
+    # session, so parallel workers never see each other's rows.
+    from qwire_mock import order_db
+    from qwire_mock.config import load_config
+
+    mysql = load_config()["mysql"]
+    worker = os.environ.get("PYTEST_XDIST_WORKER")
+    if worker:
+        mysql["database"] = f"{mysql['database']}_{worker}"
+    order_db.init_db()
+    return mysql["database"]
+
+
+@pytest.fixture
+def db_transaction(worker_database: str):
+    from qwire_mock import order_db
+
+    with order_db.isolated_transaction():
+        yield
+
+
+@pytest.fixture
+def restore_snapshot(worker_database: str, tmp_path_factory: pytest.TempPathFactory):
+    # Snapshot restores TRUNCATE and bulk-load, which commit, so they cannot
+    # run inside db_transaction. The worker schema is dumped first and put
+    # back afterwards, so restoring a snapshot as test setup leaves no trace.
+    from qwire_mock import snapshot
+
+    saved_dir = tmp_path_factory.mktemp("worker-snapshot")
+    saved = str(saved_dir / "before.jsonl.gz")
+    dead_letters = str(saved_dir / "dead_letters.jsonl")
+    snapshot.dump_snapshot(saved, dead_letter_path=dead_letters)
+
+    def _restore(path: str, **kwargs):
+        kwargs.setdefault("dead_letter_path", dead_letters)
+        return snapshot.restore_snapshot(path, **kwargs)
+
+    yield _restore
+    snapshot.restore_snapshot(saved, dead_letter_path=dead_letters)
+
+
 @pytest.hookimpl(hookwrapper=True)
 def pytest_runtest_makereport(item: pytest.Item, call: pytest.CallInfo):
     outcome = yield
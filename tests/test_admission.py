@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from qwire_mock import admission
+from qwire_mock.metrics import REGISTRY
+
+
+@pytest.mark.case(point="Token bucket allows a burst, then reports the wait until the next token")
+def test_v2_token_bucket_refills_at_rate():
+    now = [0.0]
+    bucket = admission.TokenBucket(rate=2, burst=3, clock=lambda: now[0])
+
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.acquire() == pytest.approx(0.5)
+
+    now[0] = 0.5
+    assert bucket.acquire() == 0.0
+
+
+@pytest.mark.case(point="Per-client rate limit returns 429 with Retry-After and counts the rejection")
+def test_v2_admission_rejects_client_over_limit():
+    app = FastAPI()
+
+    @app.get("/order")
+    def order() -> dict:
+        return {"status": "SUCCESS"}
+
+    config = {
+        "enabled": True,
+        "global": {"rate": 0, "burst": 0},
+        "routes": {},
+        "client": {"header": "X-Client-Id", "rate": 0.1, "burst": 2, "max_clients": 10},
+        "concurrency": {"max_in_flight": 0},
+    }
+    admission.install(app, config)
+    client = TestClient(app)
+    rejected_before = REGISTRY.value("qwire_admission_rejected_total", reason="client")
+
+    statuses = [client.get("/order", headers={"X-Client-Id": "a"}).status_code for _ in range(3)]
+    other = client.get("/order", headers={"X-Client-Id": "b"})
+    limited = client.get("/order", headers={"X-Client-Id": "a"})
+
+    assert statuses == [200, 200, 429]
+    assert other.status_code == 200
+    assert limited.status_code == 429
+    assert int(limited.headers["Retry-After"]) >= 1
+    assert limited.json()["limit"] == "client"
+    assert REGISTRY.value("qwire_admission_rejected_total", reason="client") == rejected_before + 2
+
+
+@pytest.mark.case(point="Concurrency limiter queues up to max_queue, hands slots over FIFO, and rejects the rest")
+def test_v2_concurrency_limiter_bounded_queue():
+    async def scenario() -> list:
+        limiter = admission.ConcurrencyLimiter(max_in_flight=1, max_queue=1, queue_timeout=0.2)
+        assert await limiter.acquire() is None
+        queued = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        rejected = await limiter.acquire()
+        limiter.release()
+        handed_over = await queued
+        timed_out = await asyncio.create_task(limiter.acquire())
+        limiter.release()
+        return [rejected, handed_over, timed_out, limiter.in_flight, limiter.queued]
+
+    assert asyncio.run(scenario()) == ["queue_full", None, "queue_timeout", 0, 0]
+
+
+@pytest.mark.case(point="A request rejected by its client limit does not spend a global token")
+def test_v2_admission_checks_all_buckets_before_consuming():
+    controller = admission.AdmissionController(
+        {
+            "global": {"rate": 0.001, "burst": 2},
+            "client": {"header": "X-Client-Id", "rate": 0.001, "burst": 1},
+        },
+        clock=lambda: 0.0,
+    )
+    scope = {"headers": [(b"x-client-id", b"a")]}
+
+    assert controller.check_rate("GET /order", scope) is None
+    assert controller.check_rate("GET /order", scope)[0] == "client"
+    assert controller.check_rate("GET /order", scope)[0] == "client"
+    assert controller.global_bucket.tokens == pytest.approx(1.0)
+
+
+@pytest.mark.case(point="A waiter cancelled after a slot was handed to it gives the slot back")
+def test_v2_concurrency_limiter_releases_slot_on_cancel_after_handoff():
+    async def scenario() -> list:
+        limiter = admission.ConcurrencyLimiter(max_in_flight=1, max_queue=1, queue_timeout=1)
+        assert await limiter.acquire() is None
+        queued = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        queued.cancel()
+        limiter.release()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        return [limiter.in_flight, limiter.queued, await limiter.acquire()]
+
+    assert asyncio.run(scenario()) == [0, 0, None]
@@ -0,0 +1,226 @@
+import gzip
+import logging
+import urllib.error
+
+import pytest
+
+import qwire_mock.callback_sender as callback_sender
+from qwire_mock.callback_sender import CLOSED, HALF_OPEN, OPEN, CallbackSender, CircuitBreaker
+from qwire_mock.receiver_behavior import ReceiverBehavior
+
+logger = logging.getLogger(__name__)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class DummyResponse:
+    status = 200
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+    def read(self) -> bytes:
+        return b'{"message":"OK"}'
+
+
+def _sender_config(max_attempts: int = 3) -> dict:
+    return {
+        "timeout_seconds": 1,
+        "retry": {
+            "max_attempts": max_attempts,
+            "backoff_base_seconds": 1,
+            "backoff_max_seconds": 8,
+            "jitter": False,
+            "max_pending": 100,
+            "poll_seconds": 0.1,
+        },
+        "circuit_breaker": {
+            "window": 4,
+            "min_requests": 2,
+            "failure_rate": 0.5,
+            "open_seconds": 30,
+            "half_open_probes": 1,
+        },
+        "dead_letter": {"max_entries": 10, "file": None},
+    }
+
+
+@pytest.mark.case(point="Circuit breaker opens at the failure rate and closes after a successful half-open probe")
+def test_v2_circuit_breaker_open_half_open_close():
+    clock = FakeClock()
+    breaker = CircuitBreaker(window=4, min_requests=2, failure_rate=0.5, open_seconds=30, half_open_probes=1, clock=clock)
+
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.allow() is False
+
+    clock.now += 31
+    assert breaker.allow() is True
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow() is False
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+
+@pytest.mark.case(point="Callback sender retries with backoff and dead-letters after max attempts")
+def test_v2_callback_sender_retries_then_dead_letters(monkeypatch: pytest.MonkeyPatch):
+    clock = FakeClock()
+    calls = {"count": 0}
+
+    def _failing_urlopen(*_args, **_kwargs):
+        calls["count"] += 1
+        raise urllib.error.URLError("connection refused")
+
+    monkeypatch.setattr(callback_sender.urllib.request, "urlopen", _failing_urlopen)
+    config = _sender_config(max_attempts=3)
+    config["circuit_breaker"]["min_requests"] = 10
+    sender = CallbackSender(config, logger, clock=clock)
+
+    assert sender.send("http://dead.example:8100/callback", b"{}", "ref-1", "ORDER_SUCCESS") is False
+    assert sender.pending_count() == 1
+    assert sender.run_due_retries() == 0
+
+    clock.now += 1
+    assert sender.run_due_retries() == 1
+    clock.now += 2
+    assert sender.run_due_retries() == 1
+
+    assert calls["count"] == 3
+    assert sender.pending_count() == 0
+    [record] = sender.dead_letters.records()
+    assert record["reference"] == "ref-1"
+    assert record["attempts"] == 3
+
+
+@pytest.mark.case(point="Open circuit isolates a dead host while other hosts keep delivering")
+def test_v2_callback_sender_isolates_dead_host(monkeypatch: pytest.MonkeyPatch):
+    clock = FakeClock()
+    hosts: list[str] = []
+
+    def _urlopen(request, timeout):
+        hosts.append(request.host)
+        if request.host == "dead.example:8100":
+            raise urllib.error.URLError("timed out")
+        return DummyResponse()
+
+    monkeypatch.setattr(callback_sender.urllib.request, "urlopen", _urlopen)
+    sender = CallbackSender(_sender_config(), logger, clock=clock)
+
+    for index in range(4):
+        sender.send("http://dead.example:8100/callback", b"{}", f"dead-{index}", "ORDER_SUCCESS")
+        assert sender.send("http://live.example:8100/callback", b"{}", f"live-{index}", "ORDER_SUCCESS") is True
+
+    assert hosts.count("dead.example:8100") == 2
+    assert hosts.count("live.example:8100") == 4
+    assert sender.breaker("dead.example:8100").state == OPEN
+
+
+@pytest.mark.case(point="In-process transport hands the payload object to the co-hosted callback handler without HTTP")
+def test_v2_callback_sender_in_process_delivery(monkeypatch: pytest.MonkeyPatch):
+    received: list[object] = []
+
+    def _no_http(*_args, **_kwargs):
+        raise AssertionError("in-process delivery must not open an HTTP connection")
+
+    monkeypatch.setattr(callback_sender.urllib.request, "urlopen", _no_http)
+    sender = CallbackSender(_sender_config(), logger)
+    sender.register_local_receiver(8100, {"/callback": received.append})
+
+    payload = object()
+    assert sender.send("http://127.0.0.1:8100/callback", b"{}", "ref-local", "ORDER_SUCCESS", payload=payload) is True
+    assert received == [payload]
+
+
+@pytest.mark.case(point="In-process delivery falls back to HTTP while receiver behaviors set at runtime are active")
+def test_v2_callback_sender_in_process_yields_to_receiver_behavior(monkeypatch: pytest.MonkeyPatch):
+    received: list[object] = []
+    posted: list[str] = []
+
+    def _urlopen(request, timeout=None):
+        posted.append(request.full_url)
+        return DummyResponse()
+
+    monkeypatch.setattr(callback_sender.urllib.request, "urlopen", _urlopen)
+    behavior = ReceiverBehavior({})
+    sender = CallbackSender(_sender_config(), logger)
+    sender.register_local_receiver(8100, {"/callback": received.append}, enabled=lambda: not behavior.active)
+    url = "http://127.0.0.1:8100/callback"
+
+    assert sender.send(url, b"{}", "ref-before", "ORDER_SUCCESS", payload="before") is True
+    behavior.configure({"latency": {"distribution": "fixed", "ms": 50}})
+    assert sender.send(url, b"{}", "ref-during", "ORDER_SUCCESS", payload="during") is True
+    behavior.reset()
+    assert sender.send(url, b"{}", "ref-after", "ORDER_SUCCESS", payload="after") is True
+
+    assert received == ["before", "after"]
+    assert posted == [url]
+
+
+@pytest.mark.case(point="Rule-delayed callback waits on the retry queue without spending an attempt")
+def test_v2_callback_sender_delayed_send(monkeypatch: pytest.MonkeyPatch):
+    clock = FakeClock()
+    calls = {"count": 0}
+
+    def _urlopen(*_args, **_kwargs):
+        calls["count"] += 1
+        return DummyResponse()
+
+    monkeypatch.setattr(callback_sender.urllib.request, "urlopen", _urlopen)
+    sender = CallbackSender(_sender_config(max_attempts=1), logger, clock=clock)
+
+    assert sender.send("http://receiver:8100/callback", b"{}", "ref-delay", "ORDER_SUCCESS", delay=2.5) is False
+    assert sender.pending_count() == 1
+    clock.now += 2
+    assert sender.run_due_retries() == 0
+
+    clock.now += 0.5
+    assert sender.run_due_retries() == 1
+    assert calls["count"] == 1
+    assert sender.pending_count() == 0
+    assert sender.dead_letters.records() == []
+
+
+@pytest.mark.case(point="Sender compresses callbacks once the receiver advertises Accept-Encoding, and resends plain on 415")
+def test_v2_callback_sender_compresses_for_advertising_receiver(monkeypatch: pytest.MonkeyPatch):
+    sent: list[tuple[dict, bytes]] = []
+    statuses = [200, 200, 415, 200]
+
+    class AdvertisingResponse(DummyResponse):
+        headers = {"Accept-Encoding": "gzip"}
+
+    def _urlopen(request, **_kwargs):
+        sent.append((dict(request.header_items()), request.data))
+        status = statuses.pop(0)
+        if status == 415:
+            raise urllib.error.HTTPError(request.full_url, 415, "Unsupported Media Type", {}, None)
+        return AdvertisingResponse()
+
+    monkeypatch.setattr(callback_sender.urllib.request, "urlopen", _urlopen)
+    monkeypatch.setattr(callback_sender.random, "uniform", lambda low, high: 0.0)
+    clock = FakeClock()
+    config = {**_sender_config(), "compression": {"enabled": True, "min_bytes": 64}}
+    sender = CallbackSender(config, logger, clock=clock)
+    body = b'{"reference":"ref-gz","padding":"' + b"x" * 200 + b'"}'
+
+    assert sender.send("http://receiver:8100/callback", body, "ref-gz", "ORDER_SUCCESS") is True
+    assert sender.send("http://receiver:8100/callback", body, "ref-gz", "ORDER_SHIPPED") is True
+    assert sender.send("http://receiver:8100/callback", body, "ref-gz", "ORDER_DELIVERED") is True
+
+    encodings = [headers.get("Content-encoding") for headers, _ in sent]
+    assert encodings == [None, "gzip", "gzip", None]
+    assert gzip.decompress(sent[1][1]) == body
+    assert sent[3][1] == body
+    assert sender.pending_count() == 0
+    assert sender.dead_letters.records() == []
+    assert list(sender.breaker("receiver:8100")._outcomes) == [True, True, True]
@@ -4,6 +4,7 @@ import pytest
 from fastapi.testclient import TestClient
 
 import qwire_mock.callback_service as callback_service
+from qwire_mock.receiver_behavior import Step, parse_step
 
 client = TestClient(callback_service.app)
 
@@ -56,3 +57,73 @@ def test_v2_callback_invalid_payload_returns_400(record_order_keyword):
     body = response.json()
     assert body["message"] == "Invalid order payload"
     assert "errors" in body
+
+
+@pytest.mark.case(point="POST /callbacks/batch accepts an array of callback payloads")
+def test_v2_callback_batch_receive_returns_count(record_order_keyword):
+    refs = [str(uuid4()), str(uuid4())]
+    record_order_keyword(refs[0])
+
+    response = client.post("/callbacks/batch", json=[_callback_payload(ref) for ref in refs])
+
+    assert response.status_code == 200
+    assert response.json() == {"message": "OK", "count": 2}
+
+
+@pytest.fixture
+def reset_receiver_behavior():
+    yield
+    callback_service.receiver_behavior.reset()
+
+
+@pytest.fixture
+def admin_headers(monkeypatch: pytest.MonkeyPatch) -> dict:
+    monkeypatch.setitem(callback_service.CONFIG["admin"], "token", "test-token")
+    return {"X-Admin-Token": "test-token"}
+
+
+@pytest.mark.case(point="Receiver script set via admin endpoint fails twice, then succeeds")
+def test_v2_receiver_script_fail_twice_then_succeed(reset_receiver_behavior, admin_headers, record_order_keyword):
+    ref = str(uuid4())
+    record_order_keyword(ref)
+
+    scripted = client.put(
+        f"/admin/behavior/scripts/{ref}",
+        headers=admin_headers,
+        json=[503, {"status": 429, "retry_after_seconds": 2}, "ok"],
+    )
+    assert scripted.status_code == 200
+    assert len(scripted.json()["remainingScripts"][ref]) == 3
+
+    responses = [client.post("/callback", json=_callback_payload(ref)) for _ in range(4)]
+
+    assert [response.status_code for response in responses] == [503, 429, 200, 200]
+    assert responses[1].headers["Retry-After"] == "2"
+    assert responses[2].json() == {"message": "OK"}
+    assert client.get("/admin/behavior", headers=admin_headers).json()["remainingScripts"] == {}
+
+
+@pytest.mark.case(point="Receiver behavior replaced via admin endpoint injects errors at the configured rate")
+def test_v2_receiver_behavior_error_rate(reset_receiver_behavior, admin_headers, record_order_keyword):
+    ref = str(uuid4())
+    record_order_keyword(ref)
+
+    errors = {"errors": [{"status": 500, "rate": 1.0}]}
+    assert client.put("/admin/behavior", headers=admin_headers, json=errors).status_code == 200
+    failed = client.post("/callback", json=_callback_payload(ref))
+    assert client.put("/admin/behavior", headers=admin_headers, json={"latency": {"distribution": "gaussian"}}).status_code == 400
+    assert client.delete("/admin/behavior", headers=admin_headers).status_code == 200
+    recovered = client.post("/callback", json=_callback_payload(ref))
+
+    assert failed.status_code == 500
+    assert recovered.status_code == 200
+
+
+@pytest.mark.case(point="Receiver script steps parse status codes, ok, drop and per-step delays")
+def test_v2_receiver_script_steps_parse():
+    assert parse_step(503) == Step(status=503)
+    assert parse_step("ok") == Step()
+    assert parse_step("drop") == Step(drop=True)
+    assert parse_step({"status": 200, "delay_ms": 1500}) == Step(delay=1.5)
+    with pytest.raises(ValueError):
+        parse_step(42)
@@ -0,0 +1,106 @@
+import json
+from uuid import uuid4
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from qwire_mock import capture, replay
+
+
+@pytest.mark.case(point="Capture middleware writes one compact request/response record per call")
+def test_v2_capture_middleware_records_exchange(tmp_path, record_order_keyword):
+    ref = str(uuid4())
+    record_order_keyword(ref)
+    app = FastAPI()
+
+    @app.post("/echo")
+    def echo(body: dict) -> dict:
+        return {"reference": body["reference"], "status": "SUCCESS"}
+
+    capture.install(app, "order", {"enabled": True, "directory": str(tmp_path), "max_bytes": 1 << 20, "max_files": 2})
+    TestClient(app).post("/echo", json={"reference": ref}, headers={"X-Request-Id": "1"})
+    capture.flush()
+
+    files = list(tmp_path.glob("order-*.jsonl"))
+    assert len(files) == 1
+    record = json.loads(files[0].read_text(encoding="utf-8"))
+    assert record["service"] == "order"
+    assert (record["method"], record["path"], record["status"]) == ("POST", "/echo", 200)
+    assert record["headers"]["x-request-id"] == "1"
+    assert json.loads(capture.body_bytes(record, "request")) == {"reference": ref}
+    assert json.loads(capture.body_bytes(record, "response"))["reference"] == ref
+
+
+@pytest.mark.case(point="Capture records only allowlisted headers, never the admin token or other credentials")
+def test_v2_capture_drops_credential_headers(tmp_path):
+    app = FastAPI()
+
+    @app.get("/admin/behavior")
+    def behavior() -> dict:
+        return {"active": False}
+
+    capture.install(app, "callback", {"enabled": True, "directory": str(tmp_path), "max_bytes": 1 << 20, "max_files": 2})
+    headers = {"X-Admin-Token": "s3cret", "Authorization": "Bearer t", "Cookie": "a=b", "X-Client-Id": "c1"}
+    TestClient(app).get("/admin/behavior", headers=headers)
+    capture.flush()
+
+    [record] = [json.loads(line) for path in tmp_path.glob("callback-*.jsonl") for line in path.read_text().splitlines()]
+    assert record["headers"]["x-client-id"] == "c1"
+    assert not {"x-admin-token", "authorization", "cookie"} & set(record["headers"])
+    assert "s3cret" not in json.dumps(record)
+
+
+@pytest.mark.case(point="Capture keeps at most max_body_bytes of a streamed response and flags it truncated")
+def test_v2_capture_truncates_large_bodies(tmp_path):
+    app = FastAPI()
+
+    @app.get("/export")
+    def export():
+        return StreamingResponse((b"x" * 1000 for _ in range(50)), media_type="application/x-ndjson")
+
+    config = {"enabled": True, "directory": str(tmp_path), "max_bytes": 1 << 20, "max_files": 2, "max_body_bytes": 2500}
+    capture.install(app, "order", config)
+    response = TestClient(app).get("/export")
+    capture.flush()
+
+    [record] = [json.loads(line) for path in tmp_path.glob("order-*.jsonl") for line in path.read_text().splitlines()]
+    assert len(response.content) == 50000
+    assert capture.body_bytes(record, "response") == b"x" * 2500
+    assert record["responseTruncated"] is True
+    assert "requestTruncated" not in record
+
+
+@pytest.mark.case(point="Capture writer rolls files at max_bytes and keeps only max_files")
+def test_v2_capture_writer_rotates_files(tmp_path):
+    writer = capture.CaptureWriter(str(tmp_path), "callback", max_bytes=200, max_files=2)
+    for index in range(10):
+        writer.write({"ts": index, "path": "/callback", "padding": "x" * 120})
+    writer.close()
+
+    files = sorted(tmp_path.glob("callback-*.jsonl"))
+    assert len(files) == 2
+    assert json.loads(files[-1].read_text(encoding="utf-8").splitlines()[-1])["ts"] == 9
+
+
+@pytest.mark.case(point="Replay maps each captured reference to one fresh UUID across body and query")
+def test_v2_replay_rewrites_references_consistently(tmp_path, record_order_keyword):
+    ref = str(uuid4())
+    record_order_keyword(ref)
+    rewriter = replay.ReferenceRewriter()
+
+    body = rewriter.rewrite(json.dumps({"reference": ref}).encode())
+    query = rewriter.rewrite(f"reference={ref.upper()}".encode())
+
+    new_ref = json.loads(body)["reference"]
+    assert new_ref != ref
+    assert query.decode() == f"reference={new_ref}"
+
+    (tmp_path / "order-2.jsonl").write_text(json.dumps({"ts": 2.0, "service": "order"}) + "\n")
+    (tmp_path / "callback-1.jsonl").write_text(
+        json.dumps({"ts": 1.0, "service": "callback"}) + "\n" + json.dumps({"ts": 3.0, "service": "callback"}) + "\n"
+    )
+    paths = [str(path) for path in tmp_path.iterdir()]
+    assert [record["ts"] for record in replay.load_records(paths)] == [1.0, 2.0, 3.0]
+    assert [record["ts"] for record in replay.load_records(paths, service="order")] == [2.0]
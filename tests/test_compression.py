@@ -0,0 +1,127 @@
+import asyncio
+import gzip
+import json
+import zlib
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from qwire_mock import compression, msgpack_codec
+
+CONFIG = {"enabled": True, "min_bytes": 256, "level": {"gzip": 6, "zstd": 3}, "decode_requests": True}
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/order")
+    async def create(request: Request) -> dict:
+        body = await request.json()
+        return {**body, "padding": "x" * int(body.get("size", 0))}
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse((f'{{"page":{index}}}\n'.encode() for index in range(3)), media_type="application/x-ndjson")
+
+    msgpack_codec.install(app, {"enabled": msgpack_codec.msgpack is not None}, paths=("/order",))
+    compression.install(app, CONFIG)
+    return app
+
+
+@pytest.mark.case(point="Accept-Encoding negotiation honours q-values, wildcards and server preference")
+def test_v2_negotiate_content_encoding():
+    available = ("zstd", "gzip")
+
+    assert compression.negotiate("gzip, deflate, br, zstd", available) == "zstd"
+    assert compression.negotiate("zstd;q=0.5, gzip", available) == "gzip"
+    assert compression.negotiate("*;q=0.1, zstd;q=0", available) == "gzip"
+    assert compression.negotiate("br, identity", available) is None
+    assert compression.negotiate("gzip;q=0", ("gzip",)) is None
+
+
+@pytest.mark.case(point="Responses above min_bytes are compressed, small ones are not, and gzip request bodies are decoded")
+def test_v2_compression_middleware_round_trip():
+    client = TestClient(_app())
+
+    large = client.post("/order", json={"reference": "r-1", "size": 1000}, headers={"Accept-Encoding": "gzip"})
+    small = client.post("/order", json={"reference": "r-2"}, headers={"Accept-Encoding": "gzip"})
+
+    assert large.headers["content-encoding"] == "gzip"
+    assert large.headers["vary"] == "Accept-Encoding"
+    assert int(large.headers["content-length"]) < 1000
+    assert large.json()["padding"] == "x" * 1000
+    assert "content-encoding" not in small.headers
+    assert set(small.headers["accept-encoding"].split(", ")) == set(compression.available_encodings())
+
+    encoded = client.post(
+        "/order",
+        content=gzip.compress(json.dumps({"reference": "r-3"}).encode()),
+        headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+    )
+    assert encoded.json()["reference"] == "r-3"
+    broken = client.post("/order", content=b"not gzip", headers={"Content-Encoding": "gzip"})
+    assert broken.status_code == 415
+
+
+@pytest.mark.case(point="Streamed responses are compressed chunk by chunk, each chunk flushed")
+def test_v2_compression_streams_flushed_chunks():
+    app = _app()
+    request = [{"type": "http.request", "body": b"", "more_body": False}]
+    messages: list[dict] = []
+
+    async def receive():
+        if request:
+            return request.pop(0)
+        # The client stays connected; Starlette cancels this wait once the stream ends.
+        await asyncio.Event().wait()
+
+    async def send(message) -> None:
+        messages.append(message)
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "method": "GET",
+        "path": "/stream",
+        "raw_path": b"/stream",
+        "query_string": b"",
+        "headers": [(b"accept-encoding", b"gzip")],
+        "http_version": "1.1",
+        "scheme": "http",
+        "server": ("testserver", 80),
+        "client": ("testclient", 1),
+        "root_path": "",
+    }
+    asyncio.run(app(scope, receive, send))
+
+    headers = dict(messages[0]["headers"])
+    assert headers[b"content-encoding"] == b"gzip"
+    assert b"content-length" not in headers
+    decoder = zlib.decompressobj(31)
+    pages = [decoder.decompress(message["body"]) for message in messages[1:] if message.get("body")]
+    # Every chunk decodes on its own arrival, without waiting for the end of the stream.
+    assert pages[:3] == [b'{"page":0}\n', b'{"page":1}\n', b'{"page":2}\n']
+
+
+@pytest.mark.case(point="MessagePack request bodies reach handlers as JSON and responses follow the Accept header")
+def test_v2_msgpack_content_negotiation():
+    msgpack = pytest.importorskip("msgpack")
+    client = TestClient(_app())
+    body = msgpack.packb({"reference": "r-mp", "size": 2})
+
+    packed = client.post(
+        "/order",
+        content=body,
+        headers={"Content-Type": "application/msgpack", "Accept": "application/msgpack"},
+    )
+    plain = client.post("/order", content=body, headers={"Content-Type": "application/msgpack"})
+    invalid = client.post("/order", content=b"\xc1", headers={"Content-Type": "application/msgpack"})
+
+    assert packed.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(packed.content) == {"reference": "r-mp", "size": 2, "padding": "xx"}
+    assert plain.json()["reference"] == "r-mp"
+    assert invalid.status_code == 400
+    assert msgpack_codec.wants_msgpack(b"application/json;q=0.9, application/x-msgpack")
+    assert not msgpack_codec.wants_msgpack(b"*/*")
@@ -0,0 +1,109 @@
+import threading
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from qwire_mock import admin, timings
+from qwire_mock.profiler import ProfileSession, SamplingProfiler
+
+
+def _busy_loop(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+
+@pytest.mark.case(point="The sampling profiler folds every thread's stack into collapsed flamegraph lines")
+def test_v2_sampling_profiler_collapsed_stacks():
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy_loop, args=(stop,), name="busy worker")
+    worker.start()
+    profiler = SamplingProfiler(interval_ms=1)
+    try:
+        for _ in range(5):
+            profiler.sample()
+    finally:
+        stop.set()
+        worker.join()
+
+    lines = profiler.collapsed().splitlines()
+    busy = [line for line in lines if line.startswith("busy_worker;")]
+    assert busy
+    stack, count = busy[0].rsplit(" ", 1)
+    assert int(count) >= 1
+    assert "_busy_loop (test_diagnostics.py:" in stack
+    assert profiler.sample_count == 5
+
+
+@pytest.mark.case(point="Only one profile runs at a time and a started profile stops itself")
+def test_v2_profile_session_single_and_auto_stop():
+    session = ProfileSession(max_seconds=0.05, interval_ms=1)
+
+    assert session.start(seconds=10) is not None
+    assert session.start(seconds=10) is None
+    deadline = time.monotonic() + 2
+    while session.running() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert not session.running()
+    assert "MainThread;" in session.stop()
+
+
+@pytest.mark.case(point="Requests over the slow threshold land in the bounded ring with their phases")
+def test_v2_slow_request_ring(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(timings, "RING", timings.SlowRing(threshold_ms=5, size=2))
+    monkeypatch.setattr(timings, "_enabled", True)
+    app = FastAPI()
+
+    @timings.timed("db.lookup")
+    def lookup() -> None:
+        time.sleep(0.01)
+
+    @app.get("/slow")
+    def slow() -> dict:
+        timings.since_start("validation")
+        lookup()
+        lookup()
+        with timings.phase("serialization"):
+            return {"ok": True}
+
+    @app.get("/fast")
+    def fast() -> dict:
+        return {"ok": True}
+
+    app.add_middleware(timings.TimingMiddleware)
+    client = TestClient(app)
+    client.get("/fast")
+    for _ in range(3):
+        client.get("/slow")
+
+    entries = timings.RING.entries()
+    assert len(entries) == 2
+    assert {entry["name"] for entry in entries} == {"GET /slow"}
+    assert entries[0]["status"] == 200
+    phases = {phase["name"]: phase for phase in entries[0]["phases"]}
+    assert set(phases) == {"validation", "db.lookup", "serialization"}
+    assert phases["db.lookup"]["count"] == 2
+    assert phases["db.lookup"]["totalMs"] >= 20
+    assert timings.RING.entries(limit=1) == entries[:1]
+
+
+@pytest.mark.case(point="Admin endpoints require the configured X-Admin-Token, and are disabled without one")
+def test_v2_admin_token():
+    app = FastAPI()
+
+    @app.get("/locked", dependencies=admin.dependencies({"token": "s3cret"}))
+    def locked() -> dict:
+        return {"ok": True}
+
+    @app.get("/disabled", dependencies=admin.dependencies({"token": ""}))
+    def disabled() -> dict:
+        return {"ok": True}
+
+    client = TestClient(app)
+    assert client.get("/locked").status_code == 401
+    assert client.get("/locked", headers={"X-Admin-Token": "wrong"}).status_code == 401
+    assert client.get("/locked", headers={"X-Admin-Token": "s3cret"}).status_code == 200
+    assert client.get("/disabled").status_code == 403
+    assert client.get("/disabled", headers={"X-Admin-Token": ""}).status_code == 403
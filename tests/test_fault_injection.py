@@ -0,0 +1,112 @@
+import asyncio
+import json
+import random
+import statistics
+import time
+from uuid import uuid4
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from qwire_mock import fault_injection
+
+
+def _app(config: dict) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/order")
+    def create(body: dict) -> dict:
+        return {"reference": body["reference"], "status": "SUCCESS", "padding": "x" * 200}
+
+    @app.get("/order")
+    def read(reference: str) -> dict:
+        return {"reference": reference, "status": "SUCCESS"}
+
+    fault_injection.install(app, {"enabled": True, **config})
+    return app
+
+
+@pytest.mark.case(point="Log-normal latency profile reproduces its configured p50 and p99")
+def test_v2_lognormal_latency_matches_percentiles():
+    latency = fault_injection.Latency(
+        {"distribution": "lognormal", "p50_ms": 100, "p99_ms": 1000},
+        random.Random(11),
+    )
+
+    samples = sorted(latency.sample() for _ in range(20000))
+
+    assert statistics.median(samples) == pytest.approx(0.1, rel=0.05)
+    assert samples[int(len(samples) * 0.99)] == pytest.approx(1.0, rel=0.1)
+
+
+@pytest.mark.case(point="Fault profile selected by header injects the configured error status")
+def test_v2_fault_profile_by_header_injects_error(record_order_keyword):
+    ref = str(uuid4())
+    record_order_keyword(ref)
+    client = TestClient(_app({"profiles": {"down": {"errors": [{"status": 503, "rate": 1.0}]}}}))
+
+    injected = client.get("/order", params={"reference": ref}, headers={"X-QWire-Profile": "down"})
+    normal = client.get("/order", params={"reference": ref})
+
+    assert injected.status_code == 503
+    assert injected.json() == {"status": "FAIL", "fail_reason": "Injected 503 response"}
+    assert normal.status_code == 200
+
+
+@pytest.mark.case(point="Reference prefix in the POST body selects a slow-body profile without changing the payload")
+def test_v2_fault_profile_by_reference_prefix_streams_slow_body():
+    ref = "dead" + str(uuid4())[4:]
+    config = {
+        "reference_prefixes": {"dead": "trickle"},
+        "profiles": {"trickle": {"slow_body": {"chunk_bytes": 16, "interval_ms": 1}}},
+    }
+    app = _app(config)
+    request = [{"type": "http.request", "body": f'{{"reference": "{ref}"}}'.encode(), "more_body": False}]
+    messages: list[dict] = []
+
+    async def receive():
+        return request.pop(0) if request else {"type": "http.disconnect"}
+
+    async def send(message) -> None:
+        messages.append(message)
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/order",
+        "raw_path": b"/order",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"content-type", b"application/json"), (b"host", b"mock")],
+        "client": ("127.0.0.1", 1234),
+        "server": ("mock", 80),
+    }
+    asyncio.run(app(scope, receive, send))
+
+    chunks = [message["body"] for message in messages if message["type"] == "http.response.body"]
+    assert messages[0]["status"] == 200
+    assert len(chunks) > 10
+    assert max(len(chunk) for chunk in chunks) == 16
+    assert json.loads(b"".join(chunks))["reference"] == ref
+
+
+@pytest.mark.case(point="Injected latency uses async sleeps, so concurrent delayed requests overlap")
+def test_v2_fault_latency_does_not_hold_workers():
+    app = _app({"default_profile": "slow", "profiles": {"slow": {"latency": {"distribution": "fixed", "ms": 200}}}})
+
+    async def burst() -> float:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://mock") as client:
+            started = time.perf_counter()
+            responses = await asyncio.gather(
+                *(client.get("/order", params={"reference": str(uuid4())}) for _ in range(100))
+            )
+            assert all(response.status_code == 200 for response in responses)
+            return time.perf_counter() - started
+
+    assert asyncio.run(burst()) < 2.0
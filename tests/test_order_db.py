@@ -0,0 +1,254 @@
+from datetime import datetime
+from uuid import uuid4
+
+import pymysql
+import pytest
+
+from qwire_mock import order_db
+from qwire_mock.replicas import ReplicaPool
+
+
+@pytest.mark.case(point="Compact schema mode binds references as BINARY(16) and decodes them back")
+def test_v2_reference_param_matches_schema_mode(monkeypatch: pytest.MonkeyPatch):
+    ref = uuid4()
+
+    monkeypatch.setattr(order_db, "schema_mode", lambda: "standard")
+    assert order_db.reference_param(ref) == str(ref)
+    assert order_db.reference_value(str(ref)) == ref
+
+    monkeypatch.setattr(order_db, "schema_mode", lambda: "compact")
+    assert order_db.reference_param(str(ref)) == ref.bytes
+    assert order_db.reference_value(ref.bytes) == ref
+
+
+class _FakeCursor:
+    rowcount = 0
+    description = None
+
+    def __init__(self, statements: list[str], cursor_class) -> None:
+        self.statements = statements
+        self.cursor_class = cursor_class
+
+    def execute(self, query, args=None):
+        self.statements.append(query)
+        return 1
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+class _FakeConnection:
+    def __init__(self) -> None:
+        self.statements: list[str] = []
+        self.closed = False
+
+    def cursor(self, cursor_class=None) -> _FakeCursor:
+        return _FakeCursor(self.statements, cursor_class)
+
+    def begin(self) -> None:
+        self.statements.append("BEGIN")
+
+    def commit(self) -> None:
+        self.statements.append("COMMIT")
+
+    def rollback(self) -> None:
+        self.statements.append("ROLLBACK")
+
+    def close(self) -> None:
+        self.closed = True
+
+
+@pytest.mark.case(point="Bulk load rolls back a failed load, then rebuilds deferred indexes and restores key checks")
+def test_v2_bulk_load_restores_indexes_on_failure(monkeypatch: pytest.MonkeyPatch):
+    raw = _FakeConnection()
+    monkeypatch.setattr(order_db, "_raw_conn", lambda *args, **kwargs: raw)
+    monkeypatch.setattr(_FakeCursor, "fetchall", lambda self: [{"name": "PRIMARY"}], raising=False)
+
+    with pytest.raises(RuntimeError):
+        with order_db.bulk_load({"idx_v2_orders_status_created": "status, created_at"}) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("INSERT INTO v2_orders VALUES (...)")
+            raise RuntimeError("load failed")
+
+    statements = [statement for statement in raw.statements if "information_schema" not in statement]
+    assert statements == [
+        "SET SESSION unique_checks = 0, foreign_key_checks = 0",
+        "ALTER TABLE v2_orders DROP INDEX idx_v2_orders_status_created",
+        "INSERT INTO v2_orders VALUES (...)",
+        "ROLLBACK",
+        "ALTER TABLE v2_orders ADD INDEX idx_v2_orders_status_created (status, created_at)",
+        "SET SESSION unique_checks = 1, foreign_key_checks = 1",
+        "COMMIT",
+    ]
+    assert raw.closed
+
+
+@pytest.mark.case(point="Isolated transaction shares one connection, ignores commits and rolls back at exit")
+def test_v2_isolated_transaction_rolls_back(monkeypatch: pytest.MonkeyPatch):
+    raw = _FakeConnection()
+    monkeypatch.setattr(order_db, "_raw_conn", lambda *args, **kwargs: raw)
+
+    with order_db.isolated_transaction():
+        conn = order_db._conn()
+        with conn.cursor(order_db.SSCursor) as cursor:
+            assert cursor.cursor_class is order_db.Cursor
+            cursor.execute("UPDATE v2_orders SET status = 'COMPLETED'")
+        conn.commit()
+        conn.close()
+
+        failed = order_db._conn()
+        failed.rollback()
+
+        with pytest.raises(RuntimeError):
+            with order_db.isolated_transaction():
+                pass
+
+    assert raw.statements == [
+        "BEGIN",
+        "SAVEPOINT qwire_sp_1",
+        "UPDATE v2_orders SET status = 'COMPLETED'",
+        "SAVEPOINT qwire_sp_2",
+        "ROLLBACK TO SAVEPOINT qwire_sp_2",
+        "ROLLBACK",
+    ]
+    assert raw.closed
+    assert order_db._isolation is None
+
+
+@pytest.mark.case(point="Replica pool round-robins healthy replicas, ejects after repeated failures and re-admits later")
+def test_v2_replica_pool_round_robin_and_ejection():
+    now = [0.0]
+    pool = ReplicaPool(
+        [{"host": "replica-a"}, {"host": "replica-b", "port": 3307}],
+        failure_threshold=2,
+        eject_seconds=30,
+        clock=lambda: now[0],
+    )
+
+    assert pool.names == ["replica-a:3306", "replica-b:3307"]
+    assert [pool.candidates()[0] for _ in range(4)] == [0, 1, 0, 1]
+
+    error = OSError("connection refused")
+    pool.record_failure(1, error)
+    assert pool.healthy() == [0, 1]
+    pool.record_failure(1, error)
+    assert pool.candidates() == [0]
+
+    now[0] = 30.0
+    assert pool.healthy() == [0, 1]
+
+
+@pytest.mark.case(point="Stale-tolerant reads use a replica, skip unreachable ones and fall back to the primary")
+def test_v2_read_stale_ok_routes_to_replicas(monkeypatch: pytest.MonkeyPatch):
+    mysql = {
+        **order_db.load_config()["mysql"],
+        "replicas": [{"host": "down"}, {"host": "up", "port": 3307}],
+        "replica_pool": {"failure_threshold": 1, "eject_seconds": 60},
+        "instrumentation": {"enabled": False},
+    }
+    monkeypatch.setattr(order_db, "load_config", lambda: {"mysql": mysql})
+    monkeypatch.setattr(order_db, "_raw_conn", lambda *args, **kwargs: "primary")
+
+    def _connect(**kwargs):
+        if kwargs["host"] == "down":
+            raise pymysql.err.OperationalError(2003, "Can't connect")
+        return f"{kwargs['host']}:{kwargs['port']}"
+
+    monkeypatch.setattr(order_db.pymysql, "connect", _connect)
+    rows = {"up:3307": {"lagging": None, "fresh": "replica-row"}, "primary": {"lagging": "primary-row"}}
+
+    def _read(conn, key):
+        return rows[conn].get(key)
+
+    assert [order_db._read_stale_ok(_read, "fresh") for _ in range(3)] == ["replica-row"] * 3
+    assert order_db._replicas().healthy() == [1]
+    assert order_db._read_stale_ok(_read, "lagging") == "primary-row"
+
+    mysql["replicas"] = [{"host": "down"}]
+    assert order_db._read_stale_ok(_read, "lagging") == "primary-row"
+    assert order_db._replicas().candidates() == []
+
+
+@pytest.mark.case(point="Order export pages by id on a fresh connection per page and stops on a short page")
+def test_v2_iter_order_pages_keyset(monkeypatch: pytest.MonkeyPatch):
+    connections = iter(range(1, 10))
+    calls: list[tuple] = []
+    pages = {0: [10, 11], 11: [12, 13], 13: [14]}
+
+    def _fetch(conn, after_id, page_size, statuses, created_from, created_to):
+        calls.append((conn, after_id, page_size, statuses))
+        page = pages[after_id]
+        return page[-1], page
+
+    monkeypatch.setattr(order_db, "_conn", lambda: next(connections))
+    monkeypatch.setattr(order_db, "_fetch_order_page", _fetch)
+
+    assert list(order_db.iter_order_pages(2, ("FAIL",))) == [[10, 11], [12, 13], [14]]
+    assert calls == [(1, 0, 2, ("FAIL",)), (2, 11, 2, ("FAIL",)), (3, 13, 2, ("FAIL",))]
+
+
+
+class _TransitionCursor(_FakeCursor):
+    # Serves SELECT chunks keyed by (phase, keyset cursor) and records updates.
+    def __init__(self, conn, cursor_class) -> None:
+        super().__init__(conn.statements, cursor_class)
+        self.conn = conn
+        self._rows: list[tuple] = []
+
+    def execute(self, query, args=None):
+        self.statements.append(query)
+        phase = next(status for status, select_sql, _, _ in order_db._TRANSITION_PHASES if query.startswith(select_sql))
+        self._rows = self.conn.chunks.get((phase, tuple(args[:-1]) or None), [])
+        return len(self._rows)
+
+    def executemany(self, query, args):
+        self.conn.updated.extend(reference for (reference,) in args)
+
+    def fetchall(self):
+        return self._rows
+
+
+@pytest.mark.case(point="Scheduled transitions page on each phase's index order, committing and closing each chunk")
+def test_v2_iter_scheduled_transitions_keyset(monkeypatch: pytest.MonkeyPatch):
+    refs = [uuid4() for _ in range(3)]
+    first, second = datetime(2026, 1, 1, 10, 0, 0), datetime(2026, 1, 1, 10, 0, 5)
+    chunks = {
+        ("SHIPPED", None): [(str(refs[0]), "http://cb/1", first, 1), (str(refs[1]), "http://cb/2", second, 2)],
+        ("SHIPPED", (second, 2)): [(str(refs[2]), "http://cb/7", second, 7)],
+        ("COMPLETED", None): [(str(refs[1]), "http://cb/2", 2)],
+    }
+    connections: list[_FakeConnection] = []
+    updated: list[str] = []
+
+    def _conn():
+        conn = _FakeConnection()
+        conn.chunks, conn.updated = chunks, updated
+        conn.cursor = lambda cursor_class=None: _TransitionCursor(conn, cursor_class)
+        connections.append(conn)
+        return conn
+
+    monkeypatch.setattr(order_db, "_conn", _conn)
+    monkeypatch.setattr(order_db, "schema_mode", lambda: "standard")
+
+    result = []
+    for chunk in order_db.iter_scheduled_transitions(2):
+        assert all(conn.closed and conn.statements[-1] == "COMMIT" for conn in connections)
+        result.append([(target.reference, target.target_status) for target in chunk])
+
+    assert result == [
+        [(refs[0], "SHIPPED"), (refs[1], "SHIPPED")],
+        [(refs[2], "SHIPPED")],
+        [(refs[1], "COMPLETED")],
+    ]
+    assert updated == [str(refs[0]), str(refs[1]), str(refs[2]), str(refs[1])]
+    selects = [conn.statements[0] for conn in connections]
+    assert selects[0].endswith("ORDER BY created_at, id LIMIT %s")
+    assert "AND (created_at, id) > (%s, %s) ORDER BY created_at, id LIMIT %s" in selects[1]
+    assert "p.status = 'PROCESSING'" in selects[0]
+    assert selects[-1].endswith("ORDER BY id LIMIT %s")
@@ -1,10 +1,18 @@
+import asyncio
+import json
+import threading
+import time
 from datetime import datetime, timezone
+from urllib.parse import urlsplit
 from uuid import uuid4
 
 import pytest
 from fastapi.testclient import TestClient
 
+import qwire_mock.callback_sender as callback_sender
 import qwire_mock.order_service as order_service
+from qwire_mock import rules
+from qwire_mock.metrics import REGISTRY
 from qwire_mock.schemas import OrderResponse, ProductResponse
 
 
@@ -32,6 +40,20 @@ def _build_order_response(reference: str, status: str = "SUCCESS", fail_reason:
     )
 
 
+def _build_order_record(reference) -> order_service.order_db.OrderRecord:
+    return order_service.order_db.OrderRecord(
+        reference,
+        "PX1001",
+        "Widget Adapter Order",
+        datetime.now(timezone.utc),
+        99.99,
+        "USD",
+        "SUCCESS",
+        "555555******4444",
+        (order_service.order_db.ProductRecord("29838-02", 2, "xs-83", "PROCESSING"),),
+    )
+
+
 @pytest.mark.case(point="POST /order creates successfully and returns a masked card")
 def test_v2_create_order_success_returns_201_and_masked_card(
     order_client: TestClient,
@@ -40,11 +62,13 @@ def test_v2_create_order_success_returns_201_and_masked_card(
 ):
     callback_events: list[tuple[str, str]] = []
 
-    monkeypatch.setattr(order_service.order_db, "exists", lambda _reference: False)
+    monkeypatch.setattr(order_service.order_db, "get_stored_response", lambda _reference: None)
     monkeypatch.setattr(
         order_service.order_db,
         "create_order",
-        lambda _request, status, fail_reason=None: _build_order_response(str(_request.reference), status, fail_reason),
+        lambda _request, status, fail_reason=None, response_status=None: _build_order_response(
+            str(_request.reference), status, fail_reason
+        ),
     )
     monkeypatch.setattr(order_service.order_db, "get_callback_info", lambda _reference: ("http://localhost:8100/callback", 99.99))
     monkeypatch.setattr(
@@ -86,7 +110,11 @@ def test_v2_create_order_conflict_returns_400(
     monkeypatch: pytest.MonkeyPatch,
     record_order_keyword,
 ):
-    monkeypatch.setattr(order_service.order_db, "exists", lambda _reference: True)
+    monkeypatch.setattr(
+        order_service.order_db,
+        "get_stored_response",
+        lambda _reference: order_service.order_db.StoredResponse(b"other-payload", 201, b"{}"),
+    )
 
     ref = str(uuid4())
     record_order_keyword(ref)
@@ -107,17 +135,135 @@ def test_v2_create_order_conflict_returns_400(
     assert response.json() == {"status": "FAIL", "fail_reason": "Order already exists"}
 
 
+@pytest.mark.case(point="POST /order identical resubmit replays the cached 201 without DB work; changed payload returns 400")
+def test_v2_create_order_idempotent_replay(
+    order_client: TestClient,
+    monkeypatch: pytest.MonkeyPatch,
+    record_order_keyword,
+):
+    created: list[str] = []
+
+    def _create(request, status, fail_reason=None, response_status=None):
+        created.append(str(request.reference))
+        return _build_order_response(str(request.reference), status, fail_reason)
+
+    monkeypatch.setattr(order_service.order_db, "get_stored_response", lambda _reference: None)
+    monkeypatch.setattr(order_service.order_db, "create_order", _create)
+    monkeypatch.setattr(order_service.order_db, "get_callback_info", lambda _reference: None)
+
+    ref = str(uuid4())
+    record_order_keyword(ref)
+    payload = {
+        "reference": ref,
+        "name": "Idempotent Order",
+        "callback": "http://localhost:8100/callback",
+        "cardNumber": "5555555555554444",
+        "cvv": "123",
+        "expiry": "12/28",
+        "amount": 42.0,
+        "currency": "USD",
+        "products": [{"productId": "P-IDEM", "count": 1, "spec": "S"}],
+    }
+
+    first = order_client.post("/order", json=payload)
+
+    def _no_db(_reference):
+        raise AssertionError("replay must be served from the idempotency cache")
+
+    monkeypatch.setattr(order_service.order_db, "get_stored_response", _no_db)
+    second = order_client.post("/order", json=payload)
+    conflict = order_client.post("/order", json={**payload, "amount": 43.0})
+
+    assert first.status_code == 201
+    assert second.status_code == 201
+    assert second.content == first.content
+    assert created == [ref]
+    assert conflict.status_code == 400
+    assert conflict.json() == {"status": "FAIL", "fail_reason": "Order already exists"}
+
+
+@pytest.mark.case(point="POST /order replay after cache eviction returns the stored original response, not current state")
+def test_v2_create_order_replay_from_stored_response(
+    order_client: TestClient,
+    monkeypatch: pytest.MonkeyPatch,
+    record_order_keyword,
+):
+    ref = str(uuid4())
+    record_order_keyword(ref)
+    payload = {
+        "reference": ref,
+        "name": "Stored Replay Order",
+        "callback": "http://localhost:8100/callback",
+        "cardNumber": "4111111111111111",
+        "cvv": "123",
+        "expiry": "12/28",
+        "amount": 12.0,
+        "currency": "USD",
+        "products": [{"productId": "P-STORED", "count": 1, "spec": "S"}],
+    }
+    digest = order_service.request_digest(order_service.OrderRequest.model_validate(payload))
+    original = b'{"reference":"%s","status":"FAIL","fail_reason":"Unsupported card type"}' % ref.encode()
+
+    def _current_state(_reference, replica=False):
+        raise AssertionError("replay must not rebuild the response from the current order")
+
+    order_service._idempotency_cache.clear()
+    monkeypatch.setattr(order_service.order_db, "get_order", _current_state)
+    monkeypatch.setattr(
+        order_service.order_db,
+        "get_stored_response",
+        lambda _reference: order_service.order_db.StoredResponse(digest, 400, original),
+    )
+    replayed = order_client.post("/order", json=payload)
+
+    monkeypatch.setattr(
+        order_service.order_db,
+        "get_stored_response",
+        lambda _reference: order_service.order_db.StoredResponse(digest, None, None),
+    )
+    order_service._idempotency_cache.clear()
+    unreplayable = order_client.post("/order", json=payload)
+
+    assert replayed.status_code == 400
+    assert replayed.content == original
+    assert unreplayable.status_code == 400
+    assert unreplayable.json() == {"status": "FAIL", "fail_reason": "Order already exists"}
+
+
+@pytest.mark.case(point="Request digest covers the masked card only, never the full PAN, CVV or expiry")
+def test_v2_request_digest_excludes_card_secrets():
+    payload = {
+        "reference": str(uuid4()),
+        "name": "Digest Order",
+        "callback": "http://localhost:8100/callback",
+        "cardNumber": "5555555555554444",
+        "cvv": "123",
+        "expiry": "12/28",
+        "amount": 12.0,
+        "currency": "USD",
+        "products": [{"productId": "P-DIGEST", "count": 1, "spec": "S"}],
+    }
+
+    def _digest(**changes) -> bytes:
+        return order_service.request_digest(order_service.OrderRequest.model_validate({**payload, **changes}))
+
+    assert _digest() == _digest(cvv="999", expiry="01/30")
+    assert _digest() == _digest(cardNumber="5555550000004444")
+    assert _digest() != _digest(cardNumber="5555555555551111")
+    assert _digest() != _digest(amount=13.0)
+
+
 @pytest.mark.case(point="POST /order card number starting with 4 returns 400 and FAIL")
 def test_v2_create_order_invalid_card_returns_400(
     order_client: TestClient,
     monkeypatch: pytest.MonkeyPatch,
     record_order_keyword,
 ):
-    monkeypatch.setattr(order_service.order_db, "exists", lambda _reference: False)
+    monkeypatch.setattr(order_service.order_db, "get_stored_response", lambda _reference: None)
     monkeypatch.setattr(
         order_service.order_db,
         "create_order",
-        lambda request, status, fail_reason=None: _build_order_response(
+        lambda request, status, fail_reason=None, response_status=None: _build_order_response(
             str(request.reference), status="FAIL", fail_reason="Unsupported card type"
         ),
     )
@@ -180,7 +326,7 @@ def test_v2_get_order_not_found_returns_404(
     monkeypatch: pytest.MonkeyPatch,
     record_order_keyword,
 ):
-    monkeypatch.setattr(order_service.order_db, "get_order", lambda _reference: None)
+    monkeypatch.setattr(order_service.order_db, "get_order", lambda _reference, replica=False: None)
     ref = str(uuid4())
     record_order_keyword(ref)
     response = order_client.get("/order", params={"reference": ref})
@@ -198,7 +344,7 @@ def test_v2_get_order_found_returns_200(
 ):
     ref = str(uuid4())
     record_order_keyword(ref)
-    monkeypatch.setattr(order_service.order_db, "get_order", lambda _reference: _build_order_response(ref))
+    monkeypatch.setattr(order_service.order_db, "get_order", lambda _reference, replica=False: _build_order_response(ref))
 
     response = order_client.get("/order", params={"reference": ref})
     assert response.status_code == 200
@@ -217,9 +363,13 @@ def test_v2_create_then_get_order_flow(
     ref = str(uuid4())
     order_response = _build_order_response(ref)
 
-    monkeypatch.setattr(order_service.order_db, "exists", lambda _reference: False)
-    monkeypatch.setattr(order_service.order_db, "create_order", lambda _request, status, fail_reason=None: order_response)
-    monkeypatch.setattr(order_service.order_db, "get_order", lambda _reference: order_response)
+    monkeypatch.setattr(order_service.order_db, "get_stored_response", lambda _reference: None)
+    monkeypatch.setattr(
+        order_service.order_db,
+        "create_order",
+        lambda _request, status, fail_reason=None, response_status=None: order_response,
+    )
+    monkeypatch.setattr(order_service.order_db, "get_order", lambda _reference, replica=False: order_response)
     monkeypatch.setattr(order_service.order_db, "get_callback_info", lambda _reference: None)
 
     record_order_keyword(ref)
@@ -262,8 +412,8 @@ def test_v2_dispatch_callback_skip_by_amount_policy(monkeypatch: pytest.MonkeyPa
         called["count"] += 1
         return DummyResponse()
 
-    monkeypatch.setattr(order_service.urllib.request, "urlopen", _fake_urlopen)
-    monkeypatch.setattr(order_service, "CALLBACK_SKIP_AMOUNT_GTE", 1000.0)
+    monkeypatch.setattr(callback_sender.urllib.request, "urlopen", _fake_urlopen)
+    monkeypatch.setattr(order_service, "RULES", rules.compile_rules([], callback_skip_amount_gte=1000.0))
 
     high_amount_order = _build_order_response(str(uuid4()))
     high_amount_order.amount = 1200.0
@@ -275,3 +425,279 @@ def test_v2_dispatch_callback_skip_by_amount_policy(monkeypatch: pytest.MonkeyPa
     order_service._dispatch_callback(low_amount_order, "http://localhost:8100/callback", "ORDER_SUCCESS")
 
     assert called["count"] == 1
+
+
+@pytest.mark.case(point="Retention purge deletes aged orders per status in batches until drained")
+def test_v2_retention_purge_runs_in_batches(monkeypatch: pytest.MonkeyPatch):
+    batches = {"COMPLETED": [2, 2, 1], "FAIL": [0]}
+    calls: list[tuple[str, int, int]] = []
+
+    def _fake_purge(status, max_age_seconds, batch_size):
+        calls.append((status, max_age_seconds, batch_size))
+        return batches[status].pop(0)
+
+    monkeypatch.setattr(order_service.order_db, "purge_orders_batch", _fake_purge)
+    monkeypatch.setitem(order_service.RETENTION_CONFIG, "batch_size", 2)
+    monkeypatch.setitem(order_service.RETENTION_CONFIG, "batch_pause_seconds", 0)
+    monkeypatch.setitem(order_service.RETENTION_CONFIG, "max_age_seconds", {"COMPLETED": 60, "FAIL": 120})
+    order_service._stop_event.clear()
+
+    purged = order_service._purge_aged_orders()
+
+    assert purged == {"COMPLETED": 5, "FAIL": 0}
+    assert calls == [("COMPLETED", 60, 2)] * 3 + [("FAIL", 120, 2)]
+
+
+@pytest.mark.case(point="Coalesced delivery sends one callback per reference per tick; batch mode posts arrays per receiver")
+def test_v2_dispatch_transitions_coalesce_and_batch(monkeypatch: pytest.MonkeyPatch, record_order_keyword):
+    ref_a, ref_b = uuid4(), uuid4()
+    record_order_keyword(str(ref_a))
+    sent: list[tuple[str, bytes, str]] = []
+    transitions = [
+        order_service.order_db.TransitionTarget(ref_a, "http://localhost:8100/callback", status)
+        for status in ("SHIPPED", "DELIVERED", "COMPLETED")
+    ] + [order_service.order_db.TransitionTarget(ref_b, "http://localhost:8100/callback", "SHIPPED")]
+
+    monkeypatch.setattr(order_service.order_db, "get_order_record", lambda reference: _build_order_record(reference))
+    monkeypatch.setattr(
+        order_service._callback_sender,
+        "send",
+        lambda url, body, reference, event_type, payload=None, delay=0.0: sent.append((url, body, event_type)),
+    )
+
+    monkeypatch.setitem(order_service.DELIVERY_CONFIG, "mode", "coalesce")
+    order_service._dispatch_transitions(transitions)
+
+    assert [event for _, _, event in sent] == ["ORDER_COMPLETED", "ORDER_SHIPPED"]
+    first = json.loads(sent[0][1])
+    assert first["events"] == ["ORDER_SHIPPED", "ORDER_DELIVERED", "ORDER_COMPLETED"]
+
+    sent.clear()
+    monkeypatch.setitem(order_service.DELIVERY_CONFIG, "mode", "batch")
+    order_service._dispatch_transitions(transitions)
+
+    [(url, body, _)] = sent
+    assert url == "http://localhost:8100/callbacks/batch"
+    assert [item["reference"] for item in json.loads(body)] == [str(ref_a), str(ref_b)]
+
+
+@pytest.mark.case(point="Batch mode honours per-order rule callback delays by batching orders per delay")
+def test_v2_dispatch_batch_groups_by_callback_delay(monkeypatch: pytest.MonkeyPatch, record_order_keyword):
+    slow, fast = uuid4(), uuid4()
+    record_order_keyword(str(slow))
+    sent: list[tuple[list[str], float]] = []
+    transitions = [
+        order_service.order_db.TransitionTarget(reference, "http://localhost:8100/callback", "SHIPPED")
+        for reference in (slow, fast)
+    ]
+
+    def _record(reference):
+        record = _build_order_record(reference)
+        return record._replace(currency="EUR") if reference == slow else record
+
+    rule = {"name": "eur-delay", "match": {"currency": "EUR"}, "action": {"callback_delay_ms": 1500}}
+    monkeypatch.setattr(order_service, "RULES", rules.compile_rules([rule], callback_skip_amount_gte=1000.0))
+    monkeypatch.setattr(order_service.order_db, "get_order_record", _record)
+    monkeypatch.setattr(
+        order_service._callback_sender,
+        "send",
+        lambda url, body, reference, event_type, payload=None, delay=0.0: sent.append(
+            ([item["reference"] for item in json.loads(body)], delay)
+        ),
+    )
+    monkeypatch.setitem(order_service.DELIVERY_CONFIG, "mode", "batch")
+    order_service._dispatch_transitions(transitions)
+
+    assert sorted(sent, key=lambda item: item[1]) == [([str(fast)], 0.0), ([str(slow)], 1.5)]
+
+
+async def _run_async_scheduler(done, timeout: float = 2.0) -> None:
+    # Runs the scheduler until done() or the timeout, then shuts it down.
+    task = asyncio.create_task(order_service._async_status_scheduler())
+    deadline = time.monotonic() + timeout
+    while not done() and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+@pytest.mark.case(point="Asyncio scheduler dispatches concurrently within per-host limits and drains on shutdown")
+def test_v2_async_scheduler_bounded_concurrency(monkeypatch: pytest.MonkeyPatch):
+    targets = [
+        order_service.order_db.TransitionTarget(uuid4(), f"http://host-{index % 2}:8100/callback", "SHIPPED")
+        for index in range(12)
+    ]
+    ticks = [targets]
+    lock = threading.Lock()
+    active: dict[str, int] = {}
+    peak: dict[str, int] = {}
+    delivered: list[str] = []
+
+    def _deliver(order, callback_url, event_type):
+        with lock:
+            active[callback_url] = active.get(callback_url, 0) + 1
+            peak[callback_url] = max(peak.get(callback_url, 0), active[callback_url])
+        time.sleep(0.02)
+        with lock:
+            active[callback_url] -= 1
+            delivered.append(str(order.reference))
+
+    monkeypatch.setattr(order_service.order_db, "apply_scheduled_transitions", lambda: ticks.pop() if ticks else [])
+    monkeypatch.setattr(order_service.order_db, "get_order_record", lambda reference: _build_order_record(reference))
+    monkeypatch.setattr(order_service, "_dispatch_callback", _deliver)
+    monkeypatch.setattr(order_service, "POLL_INTERVAL_SECONDS", 0.01)
+    monkeypatch.setitem(order_service.SCHEDULER_CONFIG, "max_concurrency", 6)
+    monkeypatch.setitem(order_service.SCHEDULER_CONFIG, "per_host_concurrency", 2)
+    monkeypatch.setitem(order_service.SCHEDULER_CONFIG, "queue_size", 4)
+
+    asyncio.run(_run_async_scheduler(lambda: len(delivered) == len(targets)))
+
+    assert sorted(delivered) == sorted(str(target.reference) for target in targets)
+    assert max(peak.values()) == 2
+
+
+@pytest.mark.case(point="Asyncio scheduler parks jobs for a saturated host so a fast host's callbacks are not starved")
+def test_v2_async_scheduler_slow_host_does_not_block_fast_host(monkeypatch: pytest.MonkeyPatch):
+    targets = [
+        order_service.order_db.TransitionTarget(uuid4(), f"http://{host}:8100/callback", "SHIPPED")
+        for host in ["slow"] * 4 + ["fast"] * 4
+    ]
+    ticks = [targets]
+    lock = threading.Lock()
+    delivered: list[str] = []
+
+    def _deliver(order, callback_url, event_type):
+        host = urlsplit(callback_url).hostname
+        if host == "slow":
+            time.sleep(0.1)
+        with lock:
+            delivered.append(host)
+
+    monkeypatch.setattr(order_service.order_db, "apply_scheduled_transitions", lambda: ticks.pop() if ticks else [])
+    monkeypatch.setattr(order_service.order_db, "get_order_record", lambda reference: _build_order_record(reference))
+    monkeypatch.setattr(order_service, "_dispatch_callback", _deliver)
+    monkeypatch.setattr(order_service, "POLL_INTERVAL_SECONDS", 0.01)
+    monkeypatch.setitem(order_service.DELIVERY_CONFIG, "mode", "single")
+    monkeypatch.setitem(order_service.SCHEDULER_CONFIG, "max_concurrency", 3)
+    monkeypatch.setitem(order_service.SCHEDULER_CONFIG, "per_host_concurrency", 1)
+    monkeypatch.setitem(order_service.SCHEDULER_CONFIG, "queue_size", 16)
+
+    asyncio.run(_run_async_scheduler(lambda: len(delivered) == len(targets)))
+
+    # Every fast callback lands while the first slow one is still in flight.
+    assert delivered[:4] == ["fast"] * 4
+    assert delivered.count("slow") == 4
+
+
+@pytest.mark.case(point="GET /metrics exposes counters in Prometheus text format")
+def test_v2_metrics_endpoint_renders_registry(order_client):
+    REGISTRY.inc("qwire_test_events_total", kind="probe")
+
+    response = order_client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'qwire_test_events_total{kind="probe"}' in response.text
+
+
+@pytest.mark.case(point="GET /orders/export streams NDJSON and CSV pages and rejects unknown formats and statuses")
+def test_v2_export_orders_streams_pages(order_client: TestClient, monkeypatch: pytest.MonkeyPatch, record_order_keyword):
+    ref_a, ref_b = uuid4(), uuid4()
+    record_order_keyword(str(ref_a))
+    calls: list[tuple] = []
+
+    def _pages(page_size, statuses, since, until):
+        calls.append((page_size, statuses, since, until))
+        yield [_build_order_record(ref_a)]
+        yield [_build_order_record(ref_b)._replace(products=())]
+
+    monkeypatch.setattr(order_service.order_db, "iter_order_pages", _pages)
+
+    ndjson = order_client.get(
+        "/orders/export",
+        params={"status": ["SUCCESS", "FAIL"], "since": "2026-01-01T00:00:00", "until": "2026-02-01T00:00:00"},
+    )
+    assert ndjson.headers["content-type"] == "application/x-ndjson"
+    assert "content-length" not in ndjson.headers
+    lines = [json.loads(line) for line in ndjson.text.splitlines()]
+    assert [line["reference"] for line in lines] == [str(ref_a), str(ref_b)]
+    assert lines[0]["products"][0]["productId"] == "29838-02"
+    assert calls[0][1:] == (
+        ("SUCCESS", "FAIL"),
+        datetime(2026, 1, 1),
+        datetime(2026, 2, 1),
+    )
+
+    rows = order_client.get("/orders/export", params={"format": "csv"}).text.splitlines()
+    assert rows[0].startswith("reference,orderId,name,orderDate")
+    assert rows[1].startswith(str(ref_a)) and rows[1].endswith(",29838-02,2,xs-83,PROCESSING")
+    assert rows[2].startswith(str(ref_b)) and rows[2].endswith(",,,,")
+
+    assert order_client.get("/orders/export", params={"format": "xml"}).status_code == 400
+    assert order_client.get("/orders/export", params={"status": "SHIPPED"}).json()["fail_reason"] == "unknown status: SHIPPED"
+
+
+@pytest.mark.case(point="A slow POST /order is captured with per-phase timings and served by /admin/slow-requests")
+def test_v2_slow_create_order_phases(
+    order_client: TestClient,
+    monkeypatch: pytest.MonkeyPatch,
+    record_order_keyword,
+):
+    monkeypatch.setitem(order_service.CONFIG["admin"], "token", "test-token")
+    admin_headers = {"X-Admin-Token": "test-token"}
+    timings = order_service.timings
+    monkeypatch.setattr(timings, "RING", timings.SlowRing(threshold_ms=1, size=10))
+    monkeypatch.setattr(timings, "_enabled", True)
+
+    def _create(request, status, fail_reason=None, response_status=None):
+        time.sleep(0.005)
+        return _build_order_response(str(request.reference), status, fail_reason)
+
+    # Stubs bypass order_db's own @timed wrappers, so time them the same way.
+    monkeypatch.setattr(
+        order_service.order_db,
+        "get_stored_response",
+        timings.timed("db.get_stored_response")(lambda _reference: None),
+    )
+    monkeypatch.setattr(order_service.order_db, "create_order", timings.timed("db.create_order")(_create))
+    monkeypatch.setattr(
+        order_service.order_db,
+        "get_callback_info",
+        timings.timed("db.get_callback_info")(lambda _reference: ("http://localhost:8100/callback", 99.99)),
+    )
+    monkeypatch.setattr(order_service, "_dispatch_callback", lambda order, callback_url, event_type: None)
+
+    ref = str(uuid4())
+    record_order_keyword(ref)
+    payload = {
+        "reference": ref,
+        "name": "Widget Adapter Order",
+        "callback": "http://localhost:8100/callback",
+        "cardNumber": "5555555555554444",
+        "cvv": "123",
+        "expiry": "12/28",
+        "amount": 99.99,
+        "currency": "USD",
+        "products": [{"productId": "29838-02", "count": 2, "spec": "xs-83"}],
+    }
+    assert order_client.post("/order", json=payload).status_code == 201
+
+    assert order_client.get("/admin/slow-requests").status_code == 401
+    captured = order_client.get("/admin/slow-requests", headers=admin_headers).json()
+    entry = next(entry for entry in captured["entries"] if entry["name"] == "POST /order")
+    assert entry["status"] == 201
+    assert entry["reference"] == ref
+    assert {phase["name"] for phase in entry["phases"]} == {
+        "validation",
+        "logging",
+        "db.get_stored_response",
+        "db.create_order",
+        "serialization",
+        "db.get_callback_info",
+        "callback",
+    }
+
+    assert order_client.delete("/admin/slow-requests", headers=admin_headers).json() == {"entries": []}
+    profile = order_client.get("/admin/profile", params={"seconds": 0.05, "interval_ms": 5}, headers=admin_headers)
+    assert profile.headers["content-type"].startswith("text/plain")
+    assert "MainThread;" in profile.text
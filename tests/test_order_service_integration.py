@@ -1,21 +1,25 @@
+import json
 import os
+from datetime import datetime, timedelta, timezone
 from uuid import uuid4
 
 import pytest
 from fastapi.testclient import TestClient
 
 import qwire_mock.order_service as order_service
-from qwire_mock import order_db
+from qwire_mock import order_db, snapshot
+from qwire_mock.config import load_config
+from qwire_mock.schemas import OrderRequest
 
 
-def _maybe_clear_orders() -> None:
-    if os.environ.get("QWIRE_V2_CLEAR_DB_BEFORE_TEST", "0") == "1":
-        order_db.clear_orders()
+@pytest.fixture
+def integration_order_client(db_transaction):
+    with TestClient(order_service.app) as client:
+        yield client
 
 
 @pytest.fixture
-def integration_order_client():
-    order_db.init_db()
+def committed_order_client(worker_database: str):
     with TestClient(order_service.app) as client:
         yield client
 
@@ -23,8 +27,6 @@ def integration_order_client():
 @pytest.mark.v2_integration
 @pytest.mark.case(point="Integration: POST /order persists successfully into v2_orders/v2_order_products")
 def test_v2_integration_create_order_persists_db(integration_order_client: TestClient, record_order_keyword):
-    _maybe_clear_orders()
-
     ref = str(uuid4())
     record_order_keyword(ref)
 
@@ -51,8 +53,6 @@ def test_v2_integration_create_order_persists_db(integration_order_client: TestC
 @pytest.mark.v2_integration
 @pytest.mark.case(point="Integration: card number starting with 4 returns 400 and persists failed order")
 def test_v2_integration_invalid_card_persists_fail_order(integration_order_client: TestClient, record_order_keyword):
-    _maybe_clear_orders()
-
     ref = str(uuid4())
     record_order_keyword(ref)
 
@@ -78,8 +78,6 @@ def test_v2_integration_invalid_card_persists_fail_order(integration_order_clien
 @pytest.mark.v2_integration
 @pytest.mark.case(point="Integration: GET /order reads and returns data from database")
 def test_v2_integration_get_order_reads_from_db(integration_order_client: TestClient, record_order_keyword):
-    _maybe_clear_orders()
-
     ref = str(uuid4())
     record_order_keyword(ref)
 
@@ -107,10 +105,8 @@ def test_v2_integration_get_order_reads_from_db(integration_order_client: TestCl
 
 
 @pytest.mark.v2_integration
-@pytest.mark.case(point="Integration: duplicate reference second submit returns 400 and keeps only one record")
+@pytest.mark.case(point="Integration: identical resubmit replays the original response, changed payload returns 400")
 def test_v2_integration_duplicate_reference_conflict(integration_order_client: TestClient, record_order_keyword):
-    _maybe_clear_orders()
-
     ref = str(uuid4())
     record_order_keyword(ref)
     payload = {
@@ -127,10 +123,17 @@ def test_v2_integration_duplicate_reference_conflict(integration_order_client: T
 
     first = integration_order_client.post("/order", json=payload)
     second = integration_order_client.post("/order", json=payload)
+    order_service._idempotency_cache.clear()
+    replay_from_db = integration_order_client.post("/order", json=payload)
+    conflict = integration_order_client.post("/order", json={**payload, "amount": 67.0})
 
     assert first.status_code == 201
-    assert second.status_code == 400
-    assert second.json()["fail_reason"] == "Order already exists"
+    assert second.status_code == 201
+    assert second.json() == first.json()
+    assert replay_from_db.status_code == 201
+    assert replay_from_db.content == first.content
+    assert conflict.status_code == 400
+    assert conflict.json()["fail_reason"] == "Order already exists"
 
 
 @pytest.mark.v2_integration
@@ -139,8 +142,6 @@ def test_v2_integration_product_status_transition_30s_60s(
     integration_order_client: TestClient,
     record_order_keyword,
 ):
-    _maybe_clear_orders()
-
     ref = str(uuid4())
     record_order_keyword(ref)
     payload = {
@@ -169,7 +170,7 @@ def test_v2_integration_product_status_transition_30s_60s(
         with conn.cursor() as cursor:
             cursor.execute(
                 "UPDATE v2_orders SET created_at = NOW() - INTERVAL 31 SECOND WHERE reference = %s",
-                (ref,),
+                (order_db.reference_param(ref),),
             )
         conn.commit()
     finally:
@@ -188,7 +189,7 @@ def test_v2_integration_product_status_transition_30s_60s(
         with conn.cursor() as cursor:
             cursor.execute(
                 "UPDATE v2_orders SET created_at = NOW() - INTERVAL 61 SECOND WHERE reference = %s",
-                (ref,),
+                (order_db.reference_param(ref),),
             )
         conn.commit()
     finally:
@@ -209,8 +210,6 @@ def test_v2_integration_order_completed_only_when_all_products_delivered(
     integration_order_client: TestClient,
     record_order_keyword,
 ):
-    _maybe_clear_orders()
-
     ref = str(uuid4())
     record_order_keyword(ref)
     payload = {
@@ -236,7 +235,7 @@ def test_v2_integration_order_completed_only_when_all_products_delivered(
         with conn.cursor() as cursor:
             cursor.execute(
                 "UPDATE v2_orders SET created_at = NOW() - INTERVAL 31 SECOND WHERE reference = %s",
-                (ref,),
+                (order_db.reference_param(ref),),
             )
         conn.commit()
     finally:
@@ -254,7 +253,7 @@ def test_v2_integration_order_completed_only_when_all_products_delivered(
                 SET p.status = 'DELIVERED'
                 WHERE o.reference = %s AND p.product_id = %s
                 """,
-                (ref, "DB-I-MULTI-01"),
+                (order_db.reference_param(ref), "DB-I-MULTI-01"),
             )
         conn.commit()
     finally:
@@ -275,7 +274,7 @@ def test_v2_integration_order_completed_only_when_all_products_delivered(
         with conn.cursor() as cursor:
             cursor.execute(
                 "UPDATE v2_orders SET created_at = NOW() - INTERVAL 61 SECOND WHERE reference = %s",
-                (ref,),
+                (order_db.reference_param(ref),),
             )
         conn.commit()
     finally:
@@ -288,3 +287,183 @@ def test_v2_integration_order_completed_only_when_all_products_delivered(
     final_body = final_state.json()
     assert final_body["status"] == "COMPLETED"
     assert all(item["status"] == "DELIVERED" for item in final_body["products"])
+
+
+@pytest.mark.v2_integration
+@pytest.mark.case(point="Integration: streaming scheduler applies SHIPPED, DELIVERED and COMPLETED in committed chunks")
+def test_v2_integration_streaming_transitions_in_chunks(
+    integration_order_client: TestClient,
+    record_order_keyword,
+):
+    ref = str(uuid4())
+    record_order_keyword(ref)
+    payload = {
+        "reference": ref,
+        "name": "Integration Streaming Transition",
+        "callback": "http://127.0.0.1:8100/callback",
+        "cardNumber": "5555555555554444",
+        "cvv": "123",
+        "expiry": "12/28",
+        "amount": 55.0,
+        "currency": "USD",
+        "products": [{"productId": "DB-I-STREAM", "count": 1, "spec": "S"}],
+    }
+
+    create_response = integration_order_client.post("/order", json=payload)
+    assert create_response.status_code == 201
+
+    conn = order_db._conn()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "UPDATE v2_orders SET created_at = NOW() - INTERVAL 61 SECOND WHERE reference = %s",
+                (order_db.reference_param(ref),),
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+    chunks = list(order_db.iter_scheduled_transitions(chunk_size=1))
+    assert all(len(chunk) <= 1 for chunk in chunks)
+    statuses = [target.target_status for chunk in chunks for target in chunk if str(target.reference) == ref]
+    assert statuses == ["SHIPPED", "DELIVERED", "COMPLETED"]
+
+    final_state = integration_order_client.get("/order", params={"reference": ref})
+    assert final_state.json()["status"] == "COMPLETED"
+
+
+@pytest.mark.v2_integration
+@pytest.mark.case(point="Integration: snapshot dump and restore round-trips orders, products and request hashes")
+def test_v2_integration_snapshot_round_trip(
+    committed_order_client: TestClient,
+    restore_snapshot,
+    record_order_keyword,
+    tmp_path,
+):
+    ref = str(uuid4())
+    record_order_keyword(ref)
+    payload = {
+        "reference": ref,
+        "name": "Integration Snapshot Order",
+        "callback": "http://127.0.0.1:8100/callback",
+        "cardNumber": "5555555555554444",
+        "cvv": "123",
+        "expiry": "12/28",
+        "amount": 42.0,
+        "currency": "USD",
+        "products": [{"productId": "DB-I-SNAP", "count": 2, "spec": "L"}],
+    }
+    assert committed_order_client.post("/order", json=payload).status_code == 201
+    before = committed_order_client.get("/order", params={"reference": ref}).json()
+    request_hash = order_db.get_request_hash(ref)
+    order_count = order_db.count_rows("v2_orders")
+
+    path = str(tmp_path / "state.jsonl.gz")
+    dumped = snapshot.dump_snapshot(path, dead_letter_path=str(tmp_path / "dead.jsonl"))
+    order_db.clear_orders(ref)
+    restored = restore_snapshot(path, dead_letter_path=str(tmp_path / "dead.jsonl"))
+
+    assert restored == dumped
+    assert order_db.count_rows("v2_orders") == order_count
+    assert order_db.get_request_hash(ref) == request_hash
+    assert committed_order_client.get("/order", params={"reference": ref}).json() == before
+
+
+@pytest.mark.v2_integration
+@pytest.mark.case(point="Integration: GET /orders/export streams every page with products and honours the status filter")
+def test_v2_integration_export_orders_pages(
+    integration_order_client: TestClient,
+    monkeypatch: pytest.MonkeyPatch,
+    record_order_keyword,
+):
+    monkeypatch.setattr(order_service, "EXPORT_PAGE_SIZE", 2)
+    references = []
+    started = datetime.now(timezone.utc) - timedelta(seconds=5)
+    for index, card in enumerate(["5555555555554444", "5555555555554444", "4111111111111111"]):
+        ref = str(uuid4())
+        references.append(ref)
+        record_order_keyword(ref)
+        payload = {
+            "reference": ref,
+            "name": f"Integration Export {index}",
+            "callback": "http://127.0.0.1:8100/callback",
+            "cardNumber": card,
+            "cvv": "123",
+            "expiry": "12/28",
+            "amount": 10.0 + index,
+            "currency": "USD",
+            "products": [
+                {"productId": f"DB-I-EXP-{index}-A", "count": 1, "spec": "S"},
+                {"productId": f"DB-I-EXP-{index}-B", "count": 2, "spec": "M"},
+            ],
+        }
+        integration_order_client.post("/order", json=payload)
+
+    # A tight UTC window: it only matches if the bounds are compared in UTC,
+    # whatever the MySQL session time zone is.
+    window = {"since": started.isoformat(), "until": (datetime.now(timezone.utc) + timedelta(minutes=1)).isoformat()}
+    exported = integration_order_client.get("/orders/export", params=window)
+    lines = [json.loads(line) for line in exported.text.splitlines()]
+    ours = [line for line in lines if line["reference"] in references]
+    assert [line["reference"] for line in ours] == references
+    assert all(len(line["products"]) == 2 for line in ours)
+
+    failed = integration_order_client.get("/orders/export", params={**window, "status": "FAIL", "format": "csv"})
+    rows = [row for row in failed.text.splitlines()[1:] if row.split(",")[0] in references]
+    assert [row.split(",")[0] for row in rows] == [references[2], references[2]]
+
+
+@pytest.mark.v2_integration
+@pytest.mark.skipif(
+    not os.environ.get("QWIRE_TEST_REPLICA"),
+    reason="set QWIRE_TEST_REPLICA=host:port of a second MySQL instance",
+)
+@pytest.mark.case(point="Integration: GET /order reads from mysql.replicas and falls back to the primary on a miss")
+def test_v2_integration_get_order_reads_from_replica(
+    committed_order_client: TestClient,
+    monkeypatch: pytest.MonkeyPatch,
+    record_order_keyword,
+):
+    # The second instance stands in for a replica; rows written only there
+    # show which server answered.
+    mysql = load_config()["mysql"]
+    replica_host, _, replica_port = os.environ["QWIRE_TEST_REPLICA"].partition(":")
+    replica = {"host": replica_host, "port": int(replica_port or 3306)}
+    primary = {"host": mysql["host"], "port": mysql["port"]}
+
+    replica_only = OrderRequest(
+        reference=uuid4(),
+        name="Integration Replica Order",
+        callback="http://127.0.0.1:8100/callback",
+        cardNumber="5555555555554444",
+        cvv="123",
+        expiry="12/28",
+        amount=12.0,
+        currency="USD",
+        products=[{"productId": "DB-I-REPLICA", "count": 1, "spec": "S"}],
+    )
+    record_order_keyword(str(replica_only.reference))
+    mysql.update(replica)
+    try:
+        order_db.init_db()
+        order_db.create_order(replica_only, status="SUCCESS")
+    finally:
+        mysql.update(primary)
+    monkeypatch.setitem(mysql, "replicas", [replica])
+
+    try:
+        from_replica = committed_order_client.get("/order", params={"reference": str(replica_only.reference)})
+        assert from_replica.status_code == 200
+        assert from_replica.json()["name"] == "Integration Replica Order"
+        assert order_db.get_order(replica_only.reference) is None
+
+        payload = {**replica_only.model_dump(mode="json"), "reference": str(uuid4()), "name": "Primary Only"}
+        assert committed_order_client.post("/order", json=payload).status_code == 201
+        fallback = committed_order_client.get("/order", params={"reference": payload["reference"]})
+        assert fallback.json()["name"] == "Primary Only"
+    finally:
+        mysql.update(replica)
+        try:
+            order_db.clear_orders(replica_only.reference)
+        finally:
+            mysql.update(primary)
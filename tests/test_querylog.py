@@ -0,0 +1,130 @@
+import time
+
+import pytest
+
+from qwire_mock import querylog
+from qwire_mock.metrics import REGISTRY, Registry
+
+
+class _FakeCursor:
+    def __init__(self, results: dict[str, tuple], delay: float = 0.0) -> None:
+        self.results = results
+        self.delay = delay
+        self.rowcount = -1
+        self.description = None
+        self._row = None
+
+    def execute(self, query, args=None):
+        time.sleep(self.delay)
+        rows, description = self.results.get(query.split()[0], (0, None))
+        self.rowcount = rows
+        self.description = description
+        self._row = (rows,)
+        return rows
+
+    def executemany(self, query, args):
+        return self.execute(query, args)
+
+    def fetchone(self):
+        return self._row
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+class _FakeConnection:
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+
+    def cursor(self, cursor=None) -> _FakeCursor:
+        # The rows-examined lookup reads performance_schema on the same connection.
+        return _FakeCursor({"SELECT": (3, [("id",)])}, self.delay if cursor is None else 0.0)
+
+
+@pytest.mark.case(point="Statements are fingerprinted without literals, IN lists or repeated VALUES rows")
+def test_v2_statement_fingerprint():
+    first_id, first = querylog.fingerprint("SELECT *  FROM v2_orders\n WHERE status IN (%s, %s) AND id > 10")
+    second_id, _ = querylog.fingerprint("SELECT * FROM v2_orders WHERE status IN (%s) AND id > 99")
+    assert first == "SELECT * FROM v2_orders WHERE status IN (?) AND id > ?"
+    assert first_id == second_id
+
+    _, insert = querylog.fingerprint("INSERT INTO t (a, b) VALUES (%s, NOW() - INTERVAL %s SECOND), (%s, NOW() - INTERVAL %s SECOND)")
+    assert insert == "INSERT INTO t (a, b) VALUES (?, NOW() - INTERVAL ? SECOND)"
+    _, literal = querylog.fingerprint(b"UPDATE v2_orders SET status = 'COMPLETED' WHERE reference = 'x'")
+    assert literal == "UPDATE v2_orders SET status = ? WHERE reference = ?"
+
+
+@pytest.mark.case(point="Bound parameters are redacted to type and length unless redaction is off")
+def test_v2_redact_params():
+    args = ("5555555555554444", b"\x00" * 16, 42, None, ["a", "b"])
+
+    assert querylog.redact_params(args) == ["<str:16>", "<bytes:16>", "<int>", None, "<2 values>"]
+    assert querylog.redact_params({"card": "5555"}) == {"card": "<str:4>"}
+    assert querylog.redact_params(("x" * 100, 3), redact=False) == ["x" * 61 + "...", 3]
+
+
+def lookup_orders(cursor) -> None:
+    cursor.execute("SELECT id FROM v2_orders WHERE reference = %s", ("5555555555554444",))
+
+
+def _mark_shipped(cursor) -> None:
+    cursor.executemany("UPDATE v2_order_products SET status = 'SHIPPED' WHERE id = %s", [(1,), (2,)])
+
+
+def apply_transitions(cursor) -> None:
+    _mark_shipped(cursor)
+
+
+@pytest.mark.case(point="Instrumented cursors record latency, rows and call site, and log slow statements redacted")
+def test_v2_instrumented_cursor_slow_log(tmp_path):
+    log = querylog.QueryLog(slow_query_ms=5, size=10, path=str(tmp_path / "slow.jsonl"))
+    conn = querylog.InstrumentedConnection(_FakeConnection(delay=0.01), log)
+    results = {"SELECT": (3, [("id",)]), "UPDATE": (2, None)}
+
+    with conn.cursor() as cursor:
+        cursor._cursor.results = results
+        lookup_orders(cursor)
+        apply_transitions(cursor)
+
+    select_id, _ = querylog.fingerprint("SELECT id FROM v2_orders WHERE reference = %s")
+    update_id, _ = querylog.fingerprint("UPDATE v2_order_products SET status = 'SHIPPED' WHERE id = %s")
+    entries = log.entries()
+    assert [entry["site"] for entry in entries] == ["apply_transitions", "lookup_orders"]
+    select = entries[1]
+    assert select["statement"] == select_id
+    assert select["sql"] == "SELECT id FROM v2_orders WHERE reference = ?"
+    assert select["params"] == ["<str:16>"]
+    assert select["rows"] == 3
+    assert select["rowsExamined"] == 3
+    assert entries[0]["params"] == {"rows": 2, "first": ["<int>"]}
+    assert "5555555555554444" not in (tmp_path / "slow.jsonl").read_text()
+
+    stats = {item["statement"]: item for item in querylog.statement_stats(log.fingerprints())}
+    assert stats[select_id]["site"] == "lookup_orders"
+    assert stats[select_id]["count"] >= 1
+    assert stats[select_id]["p50Ms"] > 0
+    assert stats[select_id]["rowsReturned"] >= 3
+    assert stats[update_id]["rowsAffected"] >= 2
+    assert REGISTRY.value("qwire_db_slow_queries_total", site="lookup_orders") >= 1
+
+
+@pytest.mark.case(point="Histograms render cumulative Prometheus buckets with sum and count")
+def test_v2_registry_histogram_render():
+    registry = Registry()
+    registry.histogram("qwire_test_seconds", "Test latency", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        registry.observe("qwire_test_seconds", value, site="a")
+
+    lines = registry.render().splitlines()
+    assert "# TYPE qwire_test_seconds histogram" in lines
+    assert 'qwire_test_seconds_bucket{site="a",le="0.1"} 1' in lines
+    assert 'qwire_test_seconds_bucket{site="a",le="1"} 3' in lines
+    assert 'qwire_test_seconds_bucket{site="a",le="+Inf"} 4' in lines
+    assert 'qwire_test_seconds_sum{site="a"} 4.05' in lines
+    assert 'qwire_test_seconds_count{site="a"} 4' in lines
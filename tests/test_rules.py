@@ -0,0 +1,63 @@
+import pytest
+
+from qwire_mock import rules
+
+
+def _rule(name: str, action: dict | None = None, **match) -> dict:
+    return {"name": name, "match": match, "action": action or {"fail_reason": name}}
+
+
+@pytest.mark.case(point="BIN trie matches every configured prefix along the card number, shortest to longest")
+def test_v2_rules_bin_prefix_trie():
+    ruleset = rules.compile_rules(
+        [
+            _rule("visa", bin_prefix="4"),
+            _rule("visa-test", bin_prefix=["411111", "400000"]),
+            _rule("amex", bin_prefix=["34", "37"]),
+        ]
+    )
+
+    assert ruleset.evaluate("4111111111111111", 10, "USD").rules == ("visa", "visa-test")
+    assert ruleset.evaluate(" 4000000000000002 ", 10, "USD").fail_reason == "visa"
+    assert ruleset.evaluate("371449635398431", 10, "USD").rules == ("amex",)
+    assert ruleset.evaluate("5555555555554444", 10, "USD") is rules.NO_MATCH
+    # Masked stored cards still match prefixes up to the visible six digits.
+    assert ruleset.evaluate("411111******1111", 10, "USD").rules == ("visa", "visa-test")
+
+
+@pytest.mark.case(point="Amount bands are half-open, combine with currency and product keys, and honour table order")
+def test_v2_rules_amount_currency_product_priority():
+    ruleset = rules.compile_rules(
+        [
+            _rule("eur-mid", amount_gte=100, amount_lt=500, currency="eur"),
+            _rule("slow-product", {"callback_delay_ms": 250}, product_id=["P-9"]),
+            _rule("large", {"suppress_callback": True, "fail_reason": "Amount too large"}, amount_gte=400),
+        ]
+    )
+
+    assert ruleset.evaluate("5555", 99.99, "EUR") is rules.NO_MATCH
+    assert ruleset.evaluate("5555", 100, "EUR").fail_reason == "eur-mid"
+    assert ruleset.evaluate("5555", 500, "EUR").rules == ("large",)
+    assert ruleset.evaluate("5555", 200, "USD") is rules.NO_MATCH
+
+    outcome = ruleset.evaluate("5555", 450, "EUR", ["P-1", "P-9"])
+    assert outcome == rules.Outcome(
+        fail_reason="eur-mid",
+        suppress_callback=True,
+        callback_delay=0.25,
+        rules=("eur-mid", "slow-product", "large"),
+    )
+
+
+@pytest.mark.case(point="Legacy callback_skip_amount_gte compiles to a lowest-priority suppression rule")
+def test_v2_rules_builtin_callback_skip_and_validation():
+    ruleset = rules.compile_rules([_rule("visa", bin_prefix="4")], callback_skip_amount_gte=1000)
+
+    assert ruleset.evaluate("4111", 1000, "USD").rules == ("visa", "callback_skip_amount_gte")
+    assert ruleset.evaluate("5555", 999.99, "USD") is rules.NO_MATCH
+    assert ruleset.evaluate("5555", 1000, "USD").suppress_callback is True
+
+    with pytest.raises(ValueError, match="Unknown match keys"):
+        rules.compile_rules([_rule("typo", bins="4")])
+    with pytest.raises(ValueError, match="has no action"):
+        rules.compile_rules([{"name": "empty", "match": {"currency": "USD"}}])
@@ -0,0 +1,25 @@
+import random
+
+import pytest
+
+from qwire_mock import seeder
+
+
+@pytest.mark.case(point="Seeder parses the status mix and generates consistent order/product rows")
+def test_v2_seed_generates_consistent_rows(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(seeder.order_db, "schema_mode", lambda: "standard")
+    mix = seeder.parse_mix("success=1,completed=1,fail=1")
+
+    rows = list(seeder._generate(10, 30, 2, mix, 120, random.Random(7)))
+
+    assert [order[0] for order, _ in rows] == list(range(10, 40))
+    for order, products in rows:
+        status, pending, age = order[8], order[11], order[12]
+        assert order[2] == f"PX{order[0]}"
+        assert 0 <= age <= 120
+        assert pending == (0 if status == "COMPLETED" else 2)
+        assert {product[4] for product in products} == {seeder.PRODUCT_STATUS[status]}
+        assert (order[9] is not None) == (status == "FAIL")
+
+    with pytest.raises(ValueError):
+        seeder.parse_mix("SHIPPED=1")
@@ -0,0 +1,72 @@
+import json
+from datetime import datetime, timezone
+from uuid import uuid4
+
+import pytest
+
+from qwire_mock.order_db import OrderRecord, ProductRecord
+from qwire_mock.schemas import OrderResponse, ProductResponse
+from qwire_mock.serialization import model_bytes, record_bytes
+
+
+def _order(reference: str, fail_reason: str | None = None) -> OrderResponse:
+    return OrderResponse.model_construct(
+        reference=reference,
+        orderId="PX3001",
+        name="Serialization Order",
+        orderDate=datetime(2026, 2, 28, 10, 0, tzinfo=timezone.utc),
+        amount=12.5,
+        currency="USD",
+        status="FAIL" if fail_reason else "SUCCESS",
+        cardNumber="555555******4444",
+        products=[ProductResponse.model_construct(productId="P1", count=1, spec="S", status="PROCESSING")],
+        fail_reason=fail_reason,
+    )
+
+
+@pytest.mark.case(point="Fast serialization omits empty fail_reason and matches the pydantic JSON payload")
+def test_v2_model_bytes_matches_model_dump(record_order_keyword):
+    ref = uuid4()
+    record_order_keyword(str(ref))
+    order = _order(ref)
+
+    body = json.loads(model_bytes(order))
+
+    expected = order.model_dump(mode="json")
+    expected.pop("fail_reason")
+    assert body == expected
+
+
+@pytest.mark.case(point="Fast serialization appends callback eventType to the order payload bytes")
+def test_v2_model_bytes_appends_extra_fields(record_order_keyword):
+    ref = uuid4()
+    record_order_keyword(str(ref))
+
+    body = json.loads(model_bytes(_order(ref, fail_reason="Unsupported card type"), eventType="ORDER_SUCCESS"))
+
+    assert body["eventType"] == "ORDER_SUCCESS"
+    assert body["fail_reason"] == "Unsupported card type"
+    assert body["reference"] == str(ref)
+
+
+@pytest.mark.case(point="Tuple order records serialize to the same callback payload as the pydantic model")
+def test_v2_record_bytes_matches_model_bytes(record_order_keyword):
+    ref = uuid4()
+    record_order_keyword(str(ref))
+    order = _order(ref)
+    record = OrderRecord(
+        ref,
+        order.orderId,
+        order.name,
+        order.orderDate,
+        order.amount,
+        order.currency,
+        order.status,
+        order.cardNumber,
+        (ProductRecord("P1", 1, "S", "PROCESSING"),),
+    )
+
+    assert json.loads(record_bytes(record, eventType="ORDER_SHIPPED")) == json.loads(
+        model_bytes(order, eventType="ORDER_SHIPPED")
+    )
+    assert model_bytes(record.to_response()) == model_bytes(order)
@@ -0,0 +1,37 @@
+import gzip
+import json
+from uuid import uuid4
+
+import pytest
+
+from qwire_mock import snapshot
+
+
+@pytest.mark.case(point="Snapshot file round-trips tagged order, product and dead-letter rows")
+def test_v2_snapshot_file_round_trip(tmp_path, record_order_keyword):
+    ref = str(uuid4())
+    record_order_keyword(ref)
+    path = str(tmp_path / "state.jsonl.gz")
+    rows = [
+        ["o", 1, ref, "PX1", "Snapshot Order", "http://127.0.0.1:8100/callback", "555555******4444",
+         12.5, "USD", "SUCCESS", None, 1, 1, "AB" * 32, 35],
+        ["p", 1, 1, "P1", 2, "M", "SHIPPED"],
+        ["d", {"reference": ref, "eventType": "SHIPPED", "attempts": 5}],
+    ]
+
+    counts = snapshot.write_snapshot(path, {"version": snapshot.SNAPSHOT_VERSION}, rows)
+    header, restored = snapshot.read_snapshot(path)
+
+    assert counts == {"o": 1, "p": 1, "d": 1}
+    assert header["version"] == snapshot.SNAPSHOT_VERSION
+    assert list(restored) == rows
+
+
+@pytest.mark.case(point="Snapshot restore rejects files written with an unknown format version")
+def test_v2_snapshot_rejects_unknown_version(tmp_path):
+    path = tmp_path / "future.jsonl.gz"
+    with gzip.open(path, "wb") as f:
+        f.write(json.dumps({"version": 99}).encode() + b"\n")
+
+    with pytest.raises(ValueError):
+        snapshot.read_snapshot(str(path))
@@ -0,0 +1,150 @@
+import json
+import logging
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import qwire_mock.callback_sender as callback_sender
+from qwire_mock import tracing
+from qwire_mock.callback_sender import CallbackSender
+
+logger = logging.getLogger(__name__)
+INCOMING = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+SENDER_CONFIG = {
+    "timeout_seconds": 1,
+    "retry": {
+        "max_attempts": 1,
+        "backoff_base_seconds": 1,
+        "backoff_max_seconds": 8,
+        "jitter": False,
+        "max_pending": 10,
+        "poll_seconds": 0.1,
+    },
+    "circuit_breaker": {"window": 4, "min_requests": 2, "failure_rate": 0.5, "open_seconds": 30, "half_open_probes": 1},
+    "dead_letter": {"max_entries": 10, "file": None},
+}
+
+
+class _Response:
+    status = 200
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+    def read(self) -> bytes:
+        return b""
+
+
+class _ListExporter:
+    def __init__(self) -> None:
+        self.spans: list[tracing.Span] = []
+
+    def export(self, spans: list[tracing.Span]) -> None:
+        self.spans.extend(spans)
+
+    def by_name(self) -> dict[str, tracing.Span]:
+        return {span.name: span for span in self.spans}
+
+
+def _tracer(monkeypatch: pytest.MonkeyPatch, sample_ratio: float) -> _ListExporter:
+    exporter = _ListExporter()
+    monkeypatch.setattr(tracing, "_tracer", tracing.Tracer({"sample_ratio": sample_ratio}, exporter))
+    return exporter
+
+
+@pytest.mark.case(point="W3C traceparent headers are parsed, and malformed ones start a new trace")
+def test_v2_traceparent_parse_and_format():
+    context = tracing.parse_traceparent(INCOMING)
+
+    assert context == tracing.SpanContext("4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7", True)
+    assert context.traceparent == INCOMING
+    assert tracing.parse_traceparent(b"00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-00").sampled is False
+    assert tracing.parse_traceparent("00-" + "0" * 32 + "-00f067aa0ba902b7-01") is None
+    assert tracing.parse_traceparent("ff-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01") is None
+    assert tracing.parse_traceparent("garbage") is None
+
+
+@pytest.mark.case(point="Sampling follows the parent, and a span linked to a sampled order trace is always recorded")
+def test_v2_parent_based_sampling_and_links(monkeypatch: pytest.MonkeyPatch):
+    exporter = _tracer(monkeypatch, sample_ratio=0.0)
+
+    with tracing.span("unsampled root") as root:
+        with tracing.span("child") as child:
+            pass
+    assert not root.recording and not child.recording
+    assert child.context.trace_id == root.context.trace_id
+
+    with tracing.span("order", parent=tracing.parse_traceparent(INCOMING)):
+        tracing.remember("ref-1")
+    with tracing.span("scheduler.tick") as tick:
+        with tracing.span("callback.send", links=tracing.linked("ref-1")) as callback:
+            pass
+    tracing.flush()
+
+    assert not tick.recording
+    assert callback.recording and callback.parent_id is None
+    assert callback.context.trace_id != tick.context.trace_id
+    assert [link.span_id for link in callback.links] == [exporter.by_name()["order"].context.span_id]
+    assert set(exporter.by_name()) == {"order", "callback.send"}
+
+
+@pytest.mark.case(point="A request trace covers handler, database and callback spans and propagates to the receiver")
+def test_v2_trace_propagates_through_request_and_callback(monkeypatch: pytest.MonkeyPatch):
+    exporter = _tracer(monkeypatch, sample_ratio=1.0)
+    sent_headers: list[dict] = []
+
+    def _urlopen(request, timeout=None):
+        sent_headers.append({key.lower(): value for key, value in request.header_items()})
+        return _Response()
+
+    monkeypatch.setattr(callback_sender.urllib.request, "urlopen", _urlopen)
+    sender = CallbackSender(SENDER_CONFIG, logger)
+    app = FastAPI()
+
+    @app.post("/order")
+    def create() -> dict:
+        tracing.set_attribute("order.reference", "ref-2")
+        tracing.record("db.create_order", 0.002, {"db.system": "mysql", "db.statement": "INSERT INTO v2_orders ..."})
+        sender.send("http://receiver:8100/callback", b"{}", "ref-2", "ORDER_SUCCESS")
+        return {"ok": True}
+
+    app.add_middleware(tracing.TracingMiddleware, service="qwire-order")
+    response = TestClient(app).post("/order", headers={"traceparent": INCOMING})
+    tracing.flush()
+
+    spans = exporter.by_name()
+    server, db, callback = spans["POST /order"], spans["db.create_order"], spans["callback.send"]
+    assert server.context.trace_id == "4bf92f3577b34da6a3ce929d0e0e4736"
+    assert server.parent_id == "00f067aa0ba902b7"
+    assert server.attributes["http.status_code"] == 200
+    assert db.parent_id == callback.parent_id == server.context.span_id
+    assert sent_headers[0]["traceparent"] == callback.traceparent
+    assert response.headers["traceresponse"] == server.traceparent
+
+    request = tracing.otlp_request(exporter.spans)
+    [resource] = request["resourceSpans"]
+    assert resource["resource"]["attributes"] == [{"key": "service.name", "value": {"stringValue": "qwire-order"}}]
+    exported = {span["name"]: span for span in resource["scopeSpans"][0]["spans"]}
+    assert exported["POST /order"]["kind"] == tracing.SERVER
+    assert {"key": "order.reference", "value": {"stringValue": "ref-2"}} in exported["POST /order"]["attributes"]
+    json.dumps(request)
+
+
+@pytest.mark.case(point="The file exporter writes one OTLP/JSON export request per line")
+def test_v2_file_exporter_writes_otlp_lines(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    span = tracing.Span("scheduler.tick", tracing.SpanContext("a" * 32, "b" * 16, True), None, tracing.INTERNAL, "qwire-order")
+    span.end_ns = span.start_ns + 1000
+
+    tracing.FileExporter(str(path)).export([span])
+    tracing.FileExporter(str(path)).export([span])
+
+    lines = path.read_text().splitlines()
+    assert len(lines) == 2
+    exported = json.loads(lines[0])["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+    assert exported["traceId"] == "a" * 32
+    assert int(exported["endTimeUnixNano"]) - int(exported["startTimeUnixNano"]) == 1000